@@ -1,7 +1,15 @@
 from django.contrib import admin
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from . import events
+from .counting import EstimatedCountPaginator
 from .models import (
     FormTemplate, FormField, FormSubmission, FormFile, 
-    NotificationLog, FormValidationRule
+    NotificationLog, FormValidationRule, RequestProfile
 )
 
 
@@ -37,32 +45,123 @@ class FormFieldAdmin(admin.ModelAdmin):
     inlines = [FormValidationRuleInline]
 
 
+class FormTemplateIdFilter(admin.SimpleListFilter):
+    """Filter by a typed-in template id instead of listing every template."""
+    title = 'form template'
+    parameter_name = 'form_template'
+    template = 'admin/forms/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # The filter is only shown when it has choices; the template ignores them
+        return [(None, '')]
+
+    def choices(self, changelist):
+        # "All", plus the rest of the query string to keep when submitting the input
+        choice = next(super().choices(changelist))
+        choice['query_parts'] = [(key, value) for key, value in changelist.params.items()
+                                 if key != self.parameter_name]
+        yield choice
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value is None:
+            return queryset
+        return queryset.filter(form_template_id=value) if value.isdigit() else queryset.none()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelists for tables with millions of rows: no COUNT(*) of the whole
+    table, and list columns loaded with the page instead of a query per row.
+    `list_defer` names the large columns the list doesn't show.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_defer = []
+
+    def get_changelist(self, request, **kwargs):
+        ChangeList = super().get_changelist(request, **kwargs)
+        list_defer = self.list_defer
+
+        class DeferringChangeList(ChangeList):
+            def get_queryset(self, request, exclude_parameters=None):
+                return super().get_queryset(request, exclude_parameters).defer(*list_defer)
+
+        return DeferringChangeList
+
+
 @admin.register(FormSubmission)
-class FormSubmissionAdmin(admin.ModelAdmin):
-    list_display = ['form_template', 'submitted_by', 'submitted_at', 'is_processed']
-    list_filter = ['is_processed', 'submitted_at', 'form_template']
-    search_fields = ['submitted_by', 'form_template__name']
+class FormSubmissionAdmin(LargeTableAdmin):
+    list_display = ['id', 'form_template', 'submitted_by', 'submitted_at', 'is_processed']
+    list_filter = ['is_processed', FormTemplateIdFilter]
+    list_select_related = ['form_template']
+    list_defer = ['form_data', 'processing_report']
+    date_hierarchy = 'submitted_at'
+    search_fields = ['=id', '^submitted_by']
+    search_help_text = 'Submission id, or the start of the submitter\'s name or email'
+    autocomplete_fields = ['form_template']
     readonly_fields = ['submitted_at', 'form_data']
+    actions = ['mark_processed']
+    action_batch_size = 1000
     
     def get_readonly_fields(self, request, obj=None):
         if obj:  # editing an existing object
             return self.readonly_fields + ['form_template', 'submitted_by']
         return self.readonly_fields
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Keep the changes feed in step with edits made here
+        if not change:
+            events.record(events.event(obj, 'created'))
+        elif 'is_processed' in form.changed_data and obj.is_processed:
+            events.record(events.event(obj, 'processed'))
+
+    @admin.action(description='Mark selected submissions as processed')
+    def mark_processed(self, request, queryset):
+        """One UPDATE per batch of submissions, not a save per submission."""
+        pending = queryset.filter(is_processed=False).order_by('pk').values_list('pk', 'form_template_id')
+        now = timezone.now()
+        updated = 0
+        last_pk = 0
+        with transaction.atomic():
+            # Keyset batches: "select all" over millions of rows never loads them at once
+            while True:
+                batch = list(pending.filter(pk__gt=last_pk)[:self.action_batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                updated += FormSubmission.objects.filter(pk__in=[pk for pk, _ in batch]).update(
+                    is_processed=True, processed_at=now
+                )
+                events.record(*(
+                    events.event(FormSubmission(pk=pk, form_template_id=form_template_id), 'processed',
+                                 processed_at=now.isoformat())
+                    for pk, form_template_id in batch
+                ))
+        self.message_user(request, f'{updated} submission(s) marked as processed.')
 
 
 @admin.register(FormFile)
 class FormFileAdmin(admin.ModelAdmin):
     list_display = ['submission', 'field_name', 'original_filename', 'file_size', 'uploaded_at']
     list_filter = ['uploaded_at', 'field_name']
+    list_select_related = ['submission__form_template']
     search_fields = ['original_filename', 'submission__submitted_by']
+    raw_id_fields = ['submission']
     readonly_fields = ['uploaded_at', 'file_size']
 
 
 @admin.register(NotificationLog)
-class NotificationLogAdmin(admin.ModelAdmin):
+class NotificationLogAdmin(LargeTableAdmin):
     list_display = ['submission', 'notification_type', 'status', 'sent_at', 'retry_count', 'created_at']
-    list_filter = ['status', 'notification_type', 'created_at']
-    search_fields = ['submission__submitted_by', 'submission__form_template__name']
+    list_filter = ['status']  # notification_type would list its values with a DISTINCT over the table
+    list_select_related = ['submission__form_template']
+    list_defer = ['error_message', 'submission__form_data', 'submission__processing_report']
+    date_hierarchy = 'created_at'
+    search_fields = ['=submission__id']
+    search_help_text = 'Submission id'
+    raw_id_fields = ['submission']
     readonly_fields = ['created_at']
 
 
@@ -70,4 +169,42 @@ class NotificationLogAdmin(admin.ModelAdmin):
 class FormValidationRuleAdmin(admin.ModelAdmin):
     list_display = ['field', 'rule_type', 'rule_value', 'error_message', 'is_active']
     list_filter = ['rule_type', 'is_active', 'field__form_template']
-    search_fields = ['field__label', 'error_message']
\ No newline at end of file
+    search_fields = ['field__label', 'error_message']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['method', 'path', 'status_code', 'duration_ms', 'query_count', 'trigger', 'user', 'created_at', 'download_link']
+    list_filter = ['trigger', 'method', 'view_name', 'created_at']
+    search_fields = ['path', 'view_name']
+    exclude = ['stats']
+    readonly_fields = [
+        'method', 'path', 'view_name', 'status_code', 'duration_ms', 'query_count',
+        'query_time_ms', 'trigger', 'user', 'created_at', 'download_link', 'summary',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path(
+                '<int:profile_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='forms_requestprofile_download',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, profile_id):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile_{profile.id}.prof"'
+        return response
+
+    def download_link(self, obj):
+        url = reverse('admin:forms_requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">.prof</a>', url)
+    download_link.short_description = 'Download'
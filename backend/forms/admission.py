@@ -0,0 +1,150 @@
+"""
+Admission control for public submissions.
+
+Before a submission is parsed and written, the controller checks three
+signals and sheds the request with 503 + Retry-After when any is over its
+threshold:
+
+- recent write latency: the mean time of submission saves over the last
+  FORMS_ADMISSION_WINDOW seconds. On SQLite this is mostly waiting for the
+  write lock, so it climbs as soon as writers queue up;
+- submissions in flight in this process;
+- depth of the Celery queues fed by submissions, sampled from the broker at
+  most every FORMS_ADMISSION_QUEUE_CHECK_INTERVAL seconds.
+
+Refusing early keeps the requests that are admitted fast instead of letting
+every request slow down together. Latency samples expire with the window, so
+after a spike the next submissions are admitted and measure the database
+again. Signals are per process; a broker that can't be reached counts as an
+empty queue, never as overload.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+BROKER_TIMEOUT = 0.5  # seconds
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The service is busy. Please retry shortly.'
+    default_code = 'overloaded'
+
+    def __init__(self, wait, detail=None):
+        super().__init__(detail)
+        self.wait = wait  # DRF turns this into Retry-After
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def queue_depth(queues):
+    """Messages waiting in `queues` on the Celery broker; None when tasks run eagerly."""
+    from onboarding_system.celery import app
+
+    if app.conf.task_always_eager:
+        return None
+    with app.connection_for_read() as connection:
+        connection.ensure_connection(max_retries=1, interval_start=0, timeout=BROKER_TIMEOUT)
+        channel = connection.default_channel
+        return sum(channel.queue_declare(queue=name, passive=True).message_count for name in queues)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = deque()  # (finished at, seconds)
+        self.writes_total = 0.0
+        self.in_flight = 0
+        self.depth = None
+        self.depth_checked = float('-inf')
+        self.broker_failing = False
+
+    def write_latency(self, now):
+        window = _setting('FORMS_ADMISSION_WINDOW', 10)
+        with self.lock:
+            while self.writes and self.writes[0][0] < now - window:
+                self.writes_total -= self.writes.popleft()[1]
+            if not self.writes:
+                self.writes_total = 0.0
+                return None
+            return self.writes_total / len(self.writes)
+
+    def queue_depth(self, now):
+        queues = _setting('FORMS_ADMISSION_QUEUES', [])
+        if not queues or not _setting('FORMS_ADMISSION_MAX_QUEUE_DEPTH', 0):
+            return None
+        if now - self.depth_checked >= _setting('FORMS_ADMISSION_QUEUE_CHECK_INTERVAL', 5):
+            # Concurrent requests keep using the previous sample meanwhile
+            self.depth_checked = now
+            try:
+                self.depth = queue_depth(queues)
+            except Exception as exc:
+                if not self.broker_failing:  # once per outage
+                    logger.warning(f"Admission control can't read the queue depth: {exc}")
+                self.depth = None
+                self.broker_failing = True
+            else:
+                self.broker_failing = False
+        return self.depth
+
+    def overload_reason(self):
+        """Why a new submission should be refused right now, or None."""
+        now = time.monotonic()
+        max_in_flight = _setting('FORMS_ADMISSION_MAX_IN_FLIGHT', 0)
+        if max_in_flight and self.in_flight >= max_in_flight:
+            return 'in_flight'
+        max_latency = _setting('FORMS_ADMISSION_MAX_WRITE_LATENCY', 0)
+        latency = self.write_latency(now)
+        if max_latency and latency is not None and latency > max_latency:
+            return 'write_latency'
+        max_depth = _setting('FORMS_ADMISSION_MAX_QUEUE_DEPTH', 0)
+        depth = self.queue_depth(now)
+        if max_depth and depth is not None and depth > max_depth:
+            return 'queue_depth'
+        return None
+
+    @contextmanager
+    def admit(self):
+        """Run a submission, or raise Overloaded if the service is over a threshold."""
+        if _setting('FORMS_ADMISSION_ENABLED', True):
+            reason = self.overload_reason()
+            if reason:
+                metrics.inc('forms_submissions_rejected_total', reason=reason)
+                # Spread retries so shed clients don't come back in lockstep
+                retry_after = _setting('FORMS_ADMISSION_RETRY_AFTER', 5)
+                raise Overloaded(wait=random.randint(retry_after, 2 * retry_after))
+        with self.lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    @contextmanager
+    def timed_write(self):
+        """Record how long the enclosed database write took."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            with self.lock:
+                self.writes.append((end, end - start))
+                self.writes_total += end - start
+
+
+controller = AdmissionController()
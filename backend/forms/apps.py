@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class FormsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'forms'
+
+    def ready(self):
+        # Register the built-in submission pipeline stages
+        from . import stages  # noqa: F401
+        # Connect the Celery signal handlers that time tasks
+        from . import metrics  # noqa: F401
+        # Cache invalidation on template changes
+        from . import signals  # noqa: F401
@@ -2,10 +2,11 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
+from .authentication import revoke_token
 from .serializers import UserSerializer
 
 
@@ -122,13 +123,15 @@ def refresh_token_view(request):
 @api_view(['POST'])
 def logout_view(request):
     """
-    Logout user by blacklisting refresh token
+    Logout user by blacklisting refresh token and revoking the access token
     """
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
             token = RefreshToken(refresh_token)
             token.blacklist()
+        if isinstance(request.auth, AccessToken):
+            revoke_token(request.auth)
         
         return Response({'message': 'Successfully logged out'})
     except Exception as e:
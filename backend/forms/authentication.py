@@ -0,0 +1,91 @@
+"""
+API authentication without a user query per request.
+
+CachedJWTAuthentication verifies the token exactly like simplejwt (signature,
+expiry, token type) but reads the user from the cache instead of the
+database; only a miss loads the row. Entries are dropped whenever a user is
+saved or deleted (deactivation, password change, last_login) and when one of
+their refresh tokens is blacklisted, see signals.py. Logging out also
+revokes the access token it was made with, until that token expires.
+
+The user entry and the revocation marker are read with one get_many, so an
+authenticated request costs a single cache round trip. Like the public form
+cache, invalidation only reaches every worker process through a shared
+backend (REDIS_CACHE_URL); with the default per-process cache a change can
+take up to FORMS_AUTH_USER_CACHE_TIMEOUT to be seen by other processes.
+QuerySet.update() on users sends no signals; call invalidate_user() after it.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_cache_key(user_id):
+    return f'forms:auth:user:{user_id}'
+
+
+def revoked_cache_key(jti):
+    return f'forms:auth:revoked:{jti}'
+
+
+def invalidate_user(user_id):
+    """Drop the cached user so the next request reloads it."""
+    cache.delete(user_cache_key(user_id))
+
+
+def revoke_token(token):
+    """Reject a validated access token from now until it expires."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return
+    remaining = int(token.get('exp', 0) - time.time())
+    if remaining > 0:
+        cache.set(revoked_cache_key(jti), 1, remaining)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication reading the user from the cache."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user_key = user_cache_key(user_id)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        revoked_key = revoked_cache_key(jti) if jti else None
+        found = cache.get_many([key for key in (user_key, revoked_key) if key])
+
+        if revoked_key in found:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+        user = found.get(user_key)
+        if user is None:
+            # Missing or inactive users raise here and are never cached
+            user = super().get_user(validated_token)
+            cache.set(user_key, user, getattr(settings, 'FORMS_AUTH_USER_CACHE_TIMEOUT', 300))
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        # Password changes save the user, so the CHECK_REVOKE_TOKEN hash check
+        # already ran against the current password when this entry was cached
+        return user
+
+
+class BrowserSessionAuthentication(SessionAuthentication):
+    """
+    SessionAuthentication that ignores requests carrying an Authorization
+    header. Those are API clients: they authenticate with their token or not
+    at all, and never cost a session lookup or fall back to a stale cookie.
+    """
+
+    def authenticate(self, request):
+        if request.META.get(api_settings.AUTH_HEADER_NAME):
+            return None
+        return super().authenticate(request)
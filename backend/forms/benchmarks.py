@@ -0,0 +1,282 @@
+"""
+Benchmark suite for the hot API paths and the notification task.
+
+`seed()` fills an empty database with synthetic templates and submissions,
+and each benchmark times one operation through the full Django stack (test
+client, middleware, DRF, ORM). Results are plain dicts so the
+`run_benchmarks` command can write them as JSON and compare them against a
+stored baseline.
+"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+
+from .caching import bump_generation
+from .datagen import SubmissionPlan, build_fields, build_rules, generate_submissions
+from .file_serving import compute_sha256
+from .metrics import QueryTimer
+from .models import FormTemplate, FormField, FormSubmission, FormFile, FormValidationRule
+from .tasks import send_form_submission_notification
+
+SCALES = {
+    'small': {'field_counts': [10, 50, 200], 'submissions': 5_000, 'by_form_submissions': 200, 'files': 20},
+    'medium': {'field_counts': [10, 50, 200, 500], 'submissions': 200_000, 'by_form_submissions': 500, 'files': 100},
+    'large': {'field_counts': [10, 50, 200, 500], 'submissions': 2_000_000, 'by_form_submissions': 1_000, 'files': 500},
+}
+
+TEMPLATE_PREFIX = 'bench-'
+BENCHMARK_USER = 'benchmark'
+BATCH_SIZE = 5_000
+UPLOAD = b'%PDF-1.4\n' + b'0' * 100_000
+
+
+def _create_template(user, field_count):
+    form_template = FormTemplate.objects.create(
+        name=f'{TEMPLATE_PREFIX}{field_count}-fields',
+        description=f'Benchmark template with {field_count} fields',
+        created_by=user,
+    )
+    fields = FormField.objects.bulk_create(build_fields(form_template, field_count))
+    FormValidationRule.objects.bulk_create(build_rules(fields))
+    bump_generation()
+    return form_template, [(field.field_name, field.field_type) for field in fields]
+
+
+def _create_submissions(form_template, specs, count):
+    generate_submissions(SubmissionPlan([(form_template, specs)], count), batch_size=BATCH_SIZE)
+
+
+def seed(config, stdout=None):
+    """
+    Create the benchmark dataset described by a SCALES entry.
+    Returns the ids the benchmarks need.
+    """
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USER, defaults={'is_staff': True})
+    templates = {}
+    for field_count in config['field_counts']:
+        templates[field_count] = _create_template(user, field_count)
+        if stdout:
+            stdout.write(f'Seeded template with {field_count} fields')
+
+    smallest = min(config['field_counts'])
+    bulk_template, bulk_specs = templates[smallest]
+    _create_submissions(bulk_template, bulk_specs, config['submissions'])
+    if stdout:
+        stdout.write(f"Seeded {config['submissions']} submissions")
+
+    # A mid-sized template with a moderate number of submissions, some with files
+    mid = sorted(config['field_counts'])[len(config['field_counts']) // 2]
+    by_form_template, by_form_specs = templates[mid]
+    _create_submissions(by_form_template, by_form_specs, config['by_form_submissions'])
+    upload_sha256 = compute_sha256(ContentFile(UPLOAD))
+    for submission in FormSubmission.objects.filter(form_template=by_form_template)[:config['files']]:
+        FormFile.objects.create(
+            submission=submission,
+            field_name='document',
+            file=ContentFile(UPLOAD, name='document.pdf'),
+            original_filename='document.pdf',
+            file_size=len(UPLOAD),
+            sha256=upload_sha256,
+        )
+
+    return describe(config)
+
+
+def describe(config):
+    """Look up the ids of an already seeded dataset."""
+    largest = max(config['field_counts'])
+    mid = sorted(config['field_counts'])[len(config['field_counts']) // 2]
+    by_name = {
+        template.name: template
+        for template in FormTemplate.objects.filter(name__startswith=TEMPLATE_PREFIX)
+    }
+    return {
+        'user_id': User.objects.get(username=BENCHMARK_USER).id,
+        'largest_template_id': by_name[f'{TEMPLATE_PREFIX}{largest}-fields'].id,
+        'by_form_template_id': by_name[f'{TEMPLATE_PREFIX}{mid}-fields'].id,
+        'submission_count': FormSubmission.objects.count(),
+    }
+
+
+def is_seeded(config):
+    expected = {f'{TEMPLATE_PREFIX}{count}-fields' for count in config['field_counts']}
+    names = set(FormTemplate.objects.filter(name__startswith=TEMPLATE_PREFIX).values_list('name', flat=True))
+    total = config['submissions'] + config['by_form_submissions']
+    return names == expected and FormSubmission.objects.count() >= total
+
+
+# Benchmarks
+
+BENCHMARKS = []
+
+
+class Benchmark:
+    def __init__(self, name, func, iterations, warmup):
+        self.name = name
+        self.func = func
+        self.iterations = iterations
+        self.warmup = warmup
+
+
+def benchmark(name, iterations=50, warmup=3):
+    """Register a function taking a BenchmarkContext and performing one operation."""
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name, func, iterations, warmup))
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    def __init__(self, ids):
+        self.ids = ids
+        self.anonymous = Client()
+        self.staff = Client()
+        self.staff.force_login(User.objects.get(id=ids['user_id']))
+        self.counter = 0
+
+    def next_index(self):
+        self.counter += 1
+        return self.counter
+
+    def check(self, response, expected=200):
+        if response.status_code != expected:
+            raise AssertionError(f'{response.status_code} from {response.request["PATH_INFO"]}')
+        return response
+
+
+@benchmark('public_form_fetch')
+def public_form_fetch(context):
+    context.check(context.anonymous.get(f"/api/public/{context.ids['largest_template_id']}/"))
+
+
+@benchmark('public_form_list', iterations=20)
+def public_form_list(context):
+    context.check(context.anonymous.get('/api/public/'))
+
+
+@benchmark('template_list', iterations=20)
+def template_list(context):
+    context.check(context.anonymous.get('/api/forms/'))
+
+
+@benchmark('template_list_expanded', iterations=20)
+def template_list_expanded(context):
+    # Full field trees: mostly JSON rendering (compare FORMS_ORJSON_ENABLED on and off)
+    context.check(context.anonymous.get('/api/forms/?expand=fields,configuration'))
+
+
+@benchmark('submit')
+def submit(context):
+    template_id = context.ids['by_form_template_id']
+    context.check(context.anonymous.post(
+        f'/api/public/{template_id}/submit/',
+        {'submitted_by': 'bench@example.com', 'form_data': {'field_0': f'Value {context.next_index()}'}},
+        content_type='application/json',
+    ), expected=201)
+
+
+@benchmark('submit_with_files', iterations=20)
+def submit_with_files(context):
+    template_id = context.ids['by_form_template_id']
+    context.check(context.anonymous.post(f'/api/public/{template_id}/submit/', {
+        'submitted_by': 'bench@example.com',
+        'files': SimpleUploadedFile('document.pdf', UPLOAD, content_type='application/pdf'),
+    }), expected=201)
+
+
+@benchmark('submissions_list_first_page', iterations=20)
+def submissions_list_first_page(context):
+    context.check(context.staff.get('/api/submissions/'))
+
+
+@benchmark('submissions_list_expanded', iterations=20)
+def submissions_list_expanded(context):
+    context.check(context.staff.get(
+        f"/api/submissions/by_form/?form_template={context.ids['by_form_template_id']}&expand=form_data"
+    ))
+
+
+@benchmark('submissions_list_deep_page', iterations=10)
+def submissions_list_deep_page(context):
+    page = max(1, int(context.ids['submission_count'] * 0.9) // 20)
+    context.check(context.staff.get(f'/api/submissions/?page={page}'))
+
+
+@benchmark('submissions_by_form', iterations=10)
+def submissions_by_form(context):
+    context.check(context.staff.get(
+        f"/api/submissions/by_form/?form_template={context.ids['by_form_template_id']}"
+    ))
+
+
+@benchmark('export_files_zip', iterations=5, warmup=1)
+def export_files_zip(context):
+    response = context.check(context.staff.get(
+        f"/api/submissions/files_zip/?form_template={context.ids['by_form_template_id']}"
+    ))
+    for _ in response.streaming_content:
+        pass
+
+
+@benchmark('notification_task', iterations=100, warmup=5)
+def notification_task(context):
+    submission_id = context.ids.setdefault(
+        'notification_submission_id',
+        FormSubmission.objects.filter(form_template_id=context.ids['by_form_template_id']).values_list('id', flat=True).first(),
+    )
+    send_form_submission_notification.apply(args=[submission_id], throw=True)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_benchmark(bench, context, iterations=None, warmup=None):
+    """Time one benchmark; returns latency stats in milliseconds."""
+    iterations = iterations or bench.iterations
+    for _ in range(bench.warmup if warmup is None else warmup):
+        bench.func(context)
+
+    timings = []
+    queries = QueryTimer().install()
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            start = time.perf_counter()
+            bench.func(context)
+            timings.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - started
+    finally:
+        queries.uninstall()
+
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(timings) * 1000, 3),
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+        'min_ms': round(min(timings) * 1000, 3),
+        'ops_per_sec': round(iterations / elapsed, 2),
+        'queries_per_op': round(queries.count / iterations, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare p50 latencies against a baseline.
+    Returns a list of (name, baseline_ms, current_ms, ratio) for regressions
+    beyond `threshold` (0.25 = 25% slower).
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('p50_ms'):
+            continue
+        ratio = current['p50_ms'] / previous['p50_ms']
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['p50_ms'], current['p50_ms'], round(ratio, 2)))
+    return regressions
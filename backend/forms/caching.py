@@ -0,0 +1,145 @@
+"""
+Response caching for the public form endpoints.
+
+Cached entries are keyed by a generation number that is bumped whenever a
+template, field or validation rule changes (see signals.py), so invalidation
+never has to enumerate keys: old entries simply stop being read and expire.
+A miss is recomputed by a single request (single-flight via cache.add), while
+concurrent requests for the same key wait briefly for its result instead of
+all hitting the database at once.
+
+The generation lives in the cache, so every worker process must share one
+cache backend (REDIS_CACHE_URL) for invalidation to reach all of them.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+from .metrics import record_cache
+
+GENERATION_KEY = 'forms:public:generation'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so an evicted counter never reuses old numbers
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Invalidate every cached public response."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def response_cache_key(request, namespace):
+    renderer = getattr(request, 'accepted_renderer', None)
+    parts = [
+        request.path,
+        '&'.join(f'{key}={value}' for key, value in sorted(request.GET.lists())),
+        getattr(renderer, 'format', '') or '',
+    ]
+    digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    return f'forms:{namespace}:{get_generation()}:{digest}'
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    Return the cached value for `key`, computing it at most once at a time.
+    `compute` returns (value, cacheable).
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+
+    lock_key = f'{key}:lock'
+    lock_timeout = _setting('FORMS_CACHE_LOCK_TIMEOUT', 10)
+    if not cache.add(lock_key, 1, lock_timeout):
+        # Someone else is computing it; wait for their result
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value, True
+            if cache.get(lock_key) is None:
+                break
+        value, _ = compute()
+        return value, False
+
+    try:
+        value, cacheable = compute()
+        if cacheable:
+            cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock_key)
+    return value, False
+
+
+def cached_value(namespace, name, compute):
+    """
+    A small value kept for the current generation, such as the validators of
+    a public template. `compute` returns the value, or None to not cache it.
+    """
+    if not _setting('FORMS_PUBLIC_CACHE_ENABLED', True):
+        return compute()
+    digest = hashlib.sha1(str(name).encode()).hexdigest()
+    key = f'forms:{namespace}:{get_generation()}:value:{digest}'
+
+    def compute_cacheable():
+        value = compute()
+        return value, value is not None
+
+    value, _ = get_or_compute(key, compute_cacheable, _setting('FORMS_PUBLIC_CACHE_TIMEOUT', 300))
+    return value
+
+
+def add_public_cache_headers(response):
+    """Let browsers and CDNs cache public responses briefly."""
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=_setting('FORMS_PUBLIC_CACHE_MAX_AGE', 60),
+        s_maxage=_setting('FORMS_PUBLIC_CACHE_S_MAXAGE', 300),
+        stale_while_revalidate=_setting('FORMS_PUBLIC_CACHE_STALE_WHILE_REVALIDATE', 30),
+    )
+    patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+    return response
+
+
+def cached_public_response(request, view, namespace='public'):
+    """
+    Serve a public read-only view from the response cache.
+    `view` builds the uncached Response; only 200 responses are stored.
+    """
+    if not _setting('FORMS_PUBLIC_CACHE_ENABLED', True):
+        return add_public_cache_headers(view())
+
+    key = response_cache_key(request, namespace)
+    built = []
+
+    def compute():
+        response = view()
+        built.append(response)
+        return (response.status_code, response.data), response.status_code == 200
+
+    (status_code, data), hit = get_or_compute(key, compute, _setting('FORMS_PUBLIC_CACHE_TIMEOUT', 300))
+    record_cache(namespace, hit)
+    response = built[0] if built else Response(data, status=status_code)
+    if response.status_code == 200:
+        add_public_cache_headers(response)
+    return response
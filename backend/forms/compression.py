@@ -0,0 +1,122 @@
+"""
+Response compression.
+
+The encoding is negotiated from Accept-Encoding among the available
+encoders: zstd (`zstandard` package) and brotli (`brotli` package) when
+installed, gzip always. Only textual content types are compressed; files,
+archives and range responses pass through untouched. Streaming responses
+are compressed chunk by chunk as they are sent, never buffered whole.
+
+gzip output carries Django's random-length filename to blunt BREACH-style
+length attacks; endpoints returning secrets (tokens) are excluded by path
+instead, see FORMS_COMPRESSION_EXCLUDE_PATHS.
+"""
+import re
+
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BROTLI_QUALITY = 5  # good ratio at gzip-like speed; 11 is far too slow per request
+ZSTD_LEVEL = 3
+GZIP_MAX_RANDOM_BYTES = 100
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(?!event-stream)|application/([\w.+-]*\+)?(json|x-ndjson|javascript|xml)\b|image/svg\+xml)'
+)
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def compress(self, data):
+        return compress_string(data, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+    def stream(self, chunks):
+        return compress_sequence(chunks, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def compress(self, data):
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_encoders(names):
+    """Encoders for `names` (in preference order) whose packages are installed."""
+    encoders = {'gzip': GzipEncoder}
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder
+    return [encoders[name]() for name in names if name in encoders]
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                quality = float(match.group(1))
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, encoders):
+    """The acceptable encoder with the highest q; ties go to the earlier encoder."""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoder in encoders:
+        quality = accepted.get(encoder.name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+def is_compressible(response):
+    if response.has_header('Content-Encoding') or response.has_header('Accept-Ranges'):
+        return False
+    if response.status_code in (204, 206, 304):
+        return False
+    return bool(COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')))
@@ -0,0 +1,66 @@
+"""
+Conditional GET for detail endpoints.
+
+Validators (ETag, Last-Modified) come from a cheap query for the object's
+updated_at, so an unchanged resource answers 304 before its field tree is
+loaded, serialized or rendered. Field and rule edits touch the template's
+updated_at (see signals.py), so it covers the whole nested representation.
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
+
+
+def object_state(queryset, pk, *fields):
+    """Values of `fields` for one row, or None if it doesn't exist or `pk` is malformed."""
+    try:
+        return queryset.filter(pk=pk).values_list(*fields).first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag for one representation of a resource: `parts` identify its
+    state; the query string (?fields=, ?expand=) and format pick the variant.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = '|'.join([
+        *(str(part) for part in parts),
+        '&'.join(f'{key}={value}' for key, value in sorted(request.GET.lists())),
+        getattr(renderer, 'format', '') or '',
+    ])
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def private_revalidate(response):
+    # Browsers keep the response but check with the server before reusing it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, etag, last_modified, view, cache_headers=private_revalidate):
+    """
+    304 (or 412) if the request's preconditions say the client's copy is
+    current; otherwise `view()` with the validators added to a 200.
+    `cache_headers` is applied to both so a 304 carries the same caching policy.
+    """
+    timestamp = int(last_modified.timestamp())
+    validators = HttpResponse()
+    validators['ETag'] = etag
+    validators['Last-Modified'] = http_date(timestamp)
+    cache_headers(validators)
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp, response=validators)
+    if response is not validators:
+        return response
+
+    response = view()
+    if response.status_code == 200:
+        response['ETag'] = etag
+        response['Last-Modified'] = validators['Last-Modified']
+        cache_headers(response)
+    return response
@@ -0,0 +1,213 @@
+"""
+Row counts for large tables without COUNT(*).
+
+Counting every row of a table with millions of submissions or notification
+logs scans all of them, and paginated lists did that on every request.
+`count(queryset)` only counts exactly what is cheap to count:
+
+- Unfiltered: the database's own row estimate (PostgreSQL's
+  pg_class.reltuples, refreshed by autovacuum and summed over partitions;
+  SQLite's sqlite_stat1, after
+  ANALYZE; otherwise the span of ids, which append-mostly tables keep close
+  to the row count). Tables below FORMS_EXACT_COUNT_LIMIT rows are counted.
+- Filtered: an exact count that stops after FORMS_EXACT_COUNT_LIMIT + 1
+  rows. A selective filter is counted exactly. When more rows match, the
+  count is estimated: on PostgreSQL from the planner's row estimate, elsewhere
+  by scaling the table estimate by the share of the most recent
+  FORMS_COUNT_SAMPLE_SIZE rows that match.
+
+Table estimates are kept per process for FORMS_COUNT_ESTIMATE_TTL seconds.
+EstimatedCountPagination reports `count_is_estimate` next to `count` in
+API responses; the admin changelists use EstimatedCountPaginator.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Min
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+_estimates = {}  # (database, table) -> (expires, estimate)
+_estimates_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _statistics_estimate(model, using):
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The table itself, or the partitions of a partitioned one
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relkind = 'r' AND (oid = to_regclass(%s) "
+                    "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s)))",
+                    [table, table]
+                )
+            elif connection.vendor == 'sqlite':
+                # The first number of a table's or index's stat is its row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            else:
+                return None
+            rows = cursor.fetchall()
+    except DatabaseError:  # no sqlite_stat1 until the database has been analyzed
+        return None
+    estimates = [int(str(row[0]).split()[0]) for row in rows if row[0] is not None]
+    if not estimates or min(estimates) < 0:  # -1: never analyzed (PostgreSQL 14+)
+        return None
+    return sum(estimates)
+
+
+def _id_span(model, using):
+    if model._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField'):
+        return None
+    span = model._default_manager.using(using).aggregate(first=Min('pk'), last=Max('pk'))
+    if span['first'] is None:
+        return 0
+    return span['last'] - span['first'] + 1
+
+
+def table_estimate(model, using='default'):
+    """An estimate of the number of rows in `model`'s table, or None."""
+    key = (using, model._meta.db_table)
+    cached = _estimates.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    estimate = _statistics_estimate(model, using)
+    if estimate is None:
+        estimate = _id_span(model, using)
+    with _estimates_lock:
+        _estimates[key] = (time.monotonic() + _setting('FORMS_COUNT_ESTIMATE_TTL', 60), estimate)
+    return estimate
+
+
+def _planner_estimate(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _sampled_estimate(queryset):
+    model = queryset.model
+    rows = table_estimate(model, queryset.db)
+    if not rows:
+        return None
+    sample_size = min(_setting('FORMS_COUNT_SAMPLE_SIZE', 10_000), rows)
+    recent = model._default_manager.using(queryset.db).order_by('-pk').values('pk')[:sample_size]
+    matched = queryset.filter(pk__in=recent).count()
+    return round(rows * matched / sample_size)
+
+
+def filtered_estimate(queryset):
+    """An estimate of the number of rows matching a filtered queryset, or None."""
+    if connections[queryset.db].vendor == 'postgresql':
+        try:
+            return _planner_estimate(queryset)
+        except (DatabaseError, KeyError, IndexError, TypeError, ValueError):
+            return None
+    return _sampled_estimate(queryset)
+
+
+def count(queryset):
+    """(number of rows in `queryset`, whether that number is an estimate)."""
+    limit = _setting('FORMS_EXACT_COUNT_LIMIT', 100_000)
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        estimate = table_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate > limit:
+            return estimate, True
+        return queryset.count(), False
+    # Stops scanning once the limit is passed; selecting only ids keeps
+    # annotations out of the subquery
+    capped = queryset.values('pk')[:limit + 1].count()
+    if capped <= limit:
+        return capped, False
+    return max(filtered_estimate(queryset) or 0, capped), True
+
+
+def reset():
+    """Forget cached table estimates (tests)."""
+    with _estimates_lock:
+        _estimates.clear()
+
+
+class EstimatedPage(Page):
+    """A page of an estimated count: whether more rows follow was read, not computed."""
+
+    def __init__(self, object_list, number, paginator, more):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A Paginator counting with `count`; `count_is_estimate` says how exact that
+    was. An estimate can be off either way, so estimated pages aren't checked
+    against num_pages: a page reads one row past its end to know whether
+    another follows.
+    """
+
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        number, self.count_is_estimate = count(self.object_list)
+        return number
+
+    def validate_number(self, number):
+        self.count  # sets count_is_estimate
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        # Rows past an estimate that was too low still count
+        self.count = max(self.count, bottom + len(rows[:self.per_page]))
+        return EstimatedPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Page number pagination for large tables: responses carry `count_is_estimate`."""
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_estimate': self.page.paginator.count_is_estimate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_estimate'] = {'type': 'boolean', 'example': False}
+        return response_schema
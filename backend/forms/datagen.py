@@ -0,0 +1,327 @@
+"""
+Synthetic data for load and performance environments.
+
+Rows are built as plain values and written with bulk_create in large
+batches. Submission generation can be spread over worker processes, each
+building and inserting its own batches; most of the cost is the ORM preparing
+values, which runs in parallel even on SQLite where the writes themselves
+take turns. Timestamps are explicit so data spans a realistic period instead
+of "now".
+"""
+import hashlib
+import multiprocessing
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from .caching import bump_generation
+from .models import FormTemplate, FormField, FormSubmission, FormFile, FormValidationRule
+
+FIELD_TYPE_CYCLE = ['text', 'email', 'number', 'date', 'dropdown', 'checkbox', 'radio', 'textarea', 'phone']
+OPTIONS = ['alpha', 'beta', 'gamma', 'delta']
+FIRST_NAMES = ['Amina', 'Brian', 'Chen', 'Daniela', 'Emeka', 'Fatima', 'George', 'Hana', 'Ivan', 'Joy']
+LAST_NAMES = ['Okello', 'Smith', 'Nakamura', 'Garcia', 'Mensah', 'Kowalski', 'Ndlovu', 'Rossi', 'Haddad', 'Lee']
+# Distinct form_data payloads built per template and reused across rows;
+# building ~100 values per row would otherwise dominate generation time
+FORM_DATA_VARIANTS = 256
+
+# Journal in memory and no fsync: several times faster, but a crash mid-load
+# can corrupt the database. Only for throwaway perf environments.
+SQLITE_FAST_PRAGMAS = [
+    'PRAGMA journal_mode = MEMORY',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA cache_size = -262144',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA busy_timeout = 60000',  # parallel workers wait for the write lock
+]
+
+DUMMY_FILES = [
+    ('document.pdf', b'%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF\n'),
+    ('notes.txt', b'Synthetic upload generated for load testing.\n' * 20),
+    ('scan.png', bytes.fromhex(
+        '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+        '1f15c4890000000d49444154789c6360000002000001e221bc330000000049454e44ae426082'
+    )),
+]
+
+
+def field_value(field_type, index):
+    """A plausible value for a field of the given type."""
+    if field_type == 'email':
+        return f'user{index}@example.com'
+    if field_type == 'number':
+        return index % 1000
+    if field_type == 'date':
+        return (date(2024, 1, 1) + timedelta(days=index % 365)).isoformat()
+    if field_type in ('dropdown', 'radio'):
+        return OPTIONS[index % len(OPTIONS)]
+    if field_type == 'checkbox':
+        return index % 2 == 0
+    if field_type == 'phone':
+        return f'+2567{index % 100_000_000:08d}'
+    if field_type == 'textarea':
+        return f'Notes for record {index}. ' * 4
+    return f'Value {index}'
+
+
+def build_fields(form_template, count):
+    """Unsaved fields for a template; every fifth field depends on the previous one."""
+    fields = []
+    for order in range(count):
+        field_type = FIELD_TYPE_CYCLE[order % len(FIELD_TYPE_CYCLE)]
+        configuration = {'options': OPTIONS} if field_type in ('dropdown', 'radio') else {}
+        conditional_logic = {}
+        if order and order % 5 == 0:
+            conditional_logic = {'show_if': {'field': f'field_{order - 1}', 'operator': 'not_empty'}}
+        fields.append(FormField(
+            form_template=form_template,
+            field_name=f'field_{order}',
+            field_type=field_type,
+            label=f'Field {order}',
+            placeholder=f'Enter field {order}',
+            help_text='Synthetic field',
+            is_required=order % 3 == 0,
+            order=order,
+            configuration=configuration,
+            conditional_logic=conditional_logic,
+        ))
+    return fields
+
+
+def build_rules(fields):
+    """Unsaved validation rules for text and number fields."""
+    rules = []
+    for field in fields:
+        if field.field_type == 'text':
+            rules.append(FormValidationRule(field=field, rule_type='max_length', rule_value='200',
+                                            error_message='Too long'))
+        elif field.field_type == 'number':
+            rules.append(FormValidationRule(field=field, rule_type='min_value', rule_value='0',
+                                            error_message='Must be positive'))
+    return rules
+
+
+def form_data_for(field_specs, index):
+    """form_data for a submission; `field_specs` is a list of (field_name, field_type)."""
+    return {name: field_value(field_type, index) for name, field_type in field_specs}
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the values set on auto_now_add fields."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+def _apply_sqlite_pragmas(sender=None, connection=None, **kwargs):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma in SQLITE_FAST_PRAGMAS:
+                cursor.execute(pragma)
+
+
+@contextmanager
+def sqlite_fast_load(enabled=True):
+    """Apply SQLITE_FAST_PRAGMAS to the current and any reopened connection."""
+    if not enabled or connection.vendor != 'sqlite':
+        yield
+        return
+    connection.ensure_connection()
+    _apply_sqlite_pragmas(connection=connection)
+    connection_created.connect(_apply_sqlite_pragmas)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(_apply_sqlite_pragmas)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = DELETE')
+            cursor.execute('PRAGMA synchronous = FULL')
+
+
+def create_templates(user, count, min_fields, max_fields, seed=0, prefix='load'):
+    """
+    Create `count` templates with between min_fields and max_fields fields each.
+    Returns [(template, [(field_name, field_type), ...])].
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:6]
+    templates = FormTemplate.objects.bulk_create([
+        FormTemplate(
+            name=f'{prefix}-{run}-{index}',
+            description=f'Synthetic template {index}',
+            created_by=user,
+        )
+        for index in range(count)
+    ])
+    fields = []
+    for template in templates:
+        fields.extend(build_fields(template, rng.randint(min_fields, max_fields)))
+    fields = FormField.objects.bulk_create(fields, batch_size=5_000)
+    FormValidationRule.objects.bulk_create(build_rules(fields), batch_size=5_000)
+    # bulk_create sends no signals
+    bump_generation()
+
+    specs = {template.id: [] for template in templates}
+    for field in fields:
+        specs[field.form_template_id].append((field.field_name, field.field_type))
+    return [(template, specs[template.id]) for template in templates]
+
+
+class SubmissionPlan:
+    """
+    What to generate: templates (with weights), total rows and time span.
+    Picklable, so worker processes can build their share from a chunk index.
+    """
+
+    def __init__(self, templates, total, days=365, seed=0, processed_ratio=0.3):
+        # Popular templates get most submissions (weights 1, 1/2, 1/3, ...)
+        self.templates = [(template.id, specs) for template, specs in templates]
+        self.weights = [1 / (rank + 1) for rank in range(len(self.templates))]
+        self.total = total
+        self.end = timezone.now()
+        self.span = days * 24 * 60 * 60
+        self.seed = seed
+        self.processed_ratio = processed_ratio
+        self._variants = None
+
+    def variants(self):
+        if self._variants is None:
+            self._variants = {
+                template_id: [form_data_for(specs, index) for index in range(FORM_DATA_VARIANTS)]
+                for template_id, specs in self.templates
+            }
+        return self._variants
+
+    def chunks(self, batch_size):
+        return [(start, min(batch_size, self.total - start)) for start in range(0, self.total, batch_size)]
+
+    def rows(self, start, count):
+        """Rows start..start+count as plain tuples, deterministic per chunk."""
+        rng = random.Random(self.seed * 1_000_003 + start)
+        variants = self.variants()
+        picks = rng.choices([template_id for template_id, _ in self.templates], weights=self.weights, k=count)
+        rows = []
+        for offset, template_id in enumerate(picks):
+            index = start + offset
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+            submitted_at = self.end - timedelta(seconds=rng.random() * self.span)
+            processed = rng.random() < self.processed_ratio
+            rows.append((
+                template_id,
+                name,
+                variants[template_id][index % FORM_DATA_VARIANTS],
+                submitted_at,
+                processed,
+                submitted_at + timedelta(minutes=rng.randint(1, 600)) if processed else None,
+            ))
+        return rows
+
+
+def insert_submissions(rows, batch_size):
+    submitted_at = FormSubmission._meta.get_field('submitted_at')
+    with explicit_timestamps(submitted_at):
+        FormSubmission.objects.bulk_create([
+            FormSubmission(
+                form_template_id=template_id,
+                submitted_by=submitted_by,
+                form_data=form_data,
+                submitted_at=submitted_at_value,
+                is_processed=is_processed,
+                processed_at=processed_at,
+            )
+            for template_id, submitted_by, form_data, submitted_at_value, is_processed, processed_at in rows
+        ], batch_size=batch_size)
+    return len(rows)
+
+
+# Worker process entry points (module level so they pickle)
+
+_worker_plan = None
+
+
+def _init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+
+def _insert_chunk(chunk):
+    return insert_submissions(_worker_plan.rows(*chunk), chunk[1])
+
+
+def generate_submissions(plan, batch_size=10_000, workers=1, progress=None):
+    """
+    Generate and insert `plan.total` submissions.
+    `progress` is called with the running total after each batch.
+    """
+    chunks = plan.chunks(batch_size)
+    done = 0
+    in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    if workers <= 1 or in_memory or 'fork' not in multiprocessing.get_all_start_methods():
+        for chunk in chunks:
+            done += insert_submissions(plan.rows(*chunk), batch_size)
+            if progress:
+                progress(done)
+        return done
+
+    # Children must not share the parent's database connection
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        for inserted in pool.imap_unordered(_insert_chunk, chunks):
+            done += inserted
+            if progress:
+                progress(done)
+    return done
+
+
+def store_dummy_files():
+    """Save the dummy upload files once; returns [(name, original_filename, size, sha256)]."""
+    stored = []
+    for original_filename, content in DUMMY_FILES:
+        name = f'form_uploads/loadtest/{original_filename}'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        stored.append((name, original_filename, len(content), hashlib.sha256(content).hexdigest()))
+    return stored
+
+
+def attach_files(submission_ids, count, seed=0, batch_size=10_000):
+    """
+    Attach `count` FormFile rows to random submissions among `submission_ids`
+    (a range or list). All rows point at a handful of shared dummy files.
+    """
+    if not count or not submission_ids:
+        return 0
+    rng = random.Random(seed)
+    dummies = store_dummy_files()
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        files = []
+        for _ in range(size):
+            name, original_filename, file_size, sha256 = rng.choice(dummies)
+            files.append(FormFile(
+                submission_id=rng.choice(submission_ids),
+                field_name='document',
+                file=name,
+                original_filename=original_filename,
+                file_size=file_size,
+                sha256=sha256,
+            ))
+        FormFile.objects.bulk_create(files, batch_size=batch_size)
+        created += size
+    return created
+
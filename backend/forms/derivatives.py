@@ -0,0 +1,246 @@
+"""
+Derivatives of uploaded documents: thumbnails, first-page previews,
+extracted text and metadata (dimensions, page count).
+
+`build_derivatives` is a pure function of a local file path so it can run in
+a separate process. The Celery task hands the CPU-heavy work to a process pool
+when the worker allows child processes (threads/solo pools); prefork children
+are daemonic and run it inline instead.
+"""
+import io
+import os
+import re
+import shutil
+import tempfile
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from xml.etree import ElementTree
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png'}
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _render_image(image, max_size, quality):
+    """Downscale a PIL image into JPEG bytes."""
+    image = image.copy()
+    image.thumbnail((max_size, max_size))
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _image_derivatives(path, sizes):
+    with Image.open(path) as image:
+        metadata = {
+            'format': image.format,
+            'width': image.width,
+            'height': image.height,
+            'mode': image.mode,
+        }
+        image = ImageOps.exif_transpose(image)
+        return {
+            'thumbnail': _render_image(image, sizes['thumbnail'], 80),
+            'preview': _render_image(image, sizes['preview'], 85),
+            'text': '',
+            'metadata': metadata,
+        }
+
+
+def _pdf_derivatives(path, sizes, text_limit):
+    result = {'thumbnail': None, 'preview': None, 'text': '', 'metadata': {'format': 'PDF'}}
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+    if PdfReader is not None:
+        reader = PdfReader(path)
+        result['metadata']['page_count'] = len(reader.pages)
+        if reader.pages:
+            box = reader.pages[0].mediabox
+            result['metadata']['width'] = float(box.width)
+            result['metadata']['height'] = float(box.height)
+        chunks = []
+        length = 0
+        for page in reader.pages:
+            chunk = page.extract_text() or ''
+            chunks.append(chunk)
+            length += len(chunk)
+            if length >= text_limit:
+                break
+        result['text'] = '\n'.join(chunks)[:text_limit]
+    else:
+        # Without a PDF library, count page objects in the raw file
+        with open(path, 'rb') as handle:
+            data = handle.read()
+        result['metadata']['page_count'] = len(re.findall(rb'/Type\s*/Page(?![a-zA-Z])', data))
+
+    try:
+        import pypdfium2
+    except ImportError:
+        return result
+
+    document = pypdfium2.PdfDocument(path)
+    try:
+        if len(document):
+            page = document[0]
+            image = page.render(scale=sizes['preview'] / max(page.get_size())).to_pil()
+            result['preview'] = _render_image(image, sizes['preview'], 85)
+            result['thumbnail'] = _render_image(image, sizes['thumbnail'], 80)
+    finally:
+        document.close()
+    return result
+
+
+def _docx_derivatives(path, text_limit):
+    metadata = {'format': 'DOCX'}
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read('word/document.xml'))
+        paragraphs = []
+        length = 0
+        for paragraph in root.iter(f'{WORD_NAMESPACE}p'):
+            text = ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NAMESPACE}t'))
+            paragraphs.append(text)
+            length += len(text)
+            if length >= text_limit:
+                break
+        try:
+            app_properties = ElementTree.fromstring(archive.read('docProps/app.xml'))
+        except KeyError:
+            app_properties = None
+    if app_properties is not None:
+        for node in app_properties:
+            if node.tag.endswith('}Pages') and (node.text or '').isdigit():
+                metadata['page_count'] = int(node.text)
+    return {
+        'thumbnail': None,
+        'preview': None,
+        'text': '\n'.join(paragraphs)[:text_limit],
+        'metadata': metadata,
+    }
+
+
+def _text_derivatives(path, text_limit):
+    with open(path, 'rb') as handle:
+        raw = handle.read(text_limit * 4)
+    text = raw.decode('utf-8', errors='replace')[:text_limit]
+    return {
+        'thumbnail': None,
+        'preview': None,
+        'text': text,
+        'metadata': {'format': 'TXT', 'line_count': text.count('\n') + 1 if text else 0},
+    }
+
+
+def build_derivatives(path, extension, sizes=None, text_limit=None):
+    """
+    Build derivatives for the file at `path`.
+    Returns a dict with `thumbnail`/`preview` JPEG bytes (or None), extracted
+    `text` and a `metadata` dict. Returns None for unsupported types.
+    """
+    sizes = sizes or {'thumbnail': 256, 'preview': 1024}
+    text_limit = text_limit or 100_000
+    extension = extension.lower().lstrip('.')
+
+    if extension in IMAGE_EXTENSIONS:
+        return _image_derivatives(path, sizes)
+    if extension == 'pdf':
+        return _pdf_derivatives(path, sizes, text_limit)
+    if extension == 'docx':
+        return _docx_derivatives(path, text_limit)
+    if extension == 'txt':
+        return _text_derivatives(path, text_limit)
+    return None
+
+
+def get_process_pool():
+    """
+    Lazily create the process pool used for derivative generation. Workers
+    start from a forkserver: forking a threaded Celery worker would copy locks
+    other threads hold (logging, database drivers) into the child, locked.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=_setting('FORMS_DERIVATIVE_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('forkserver'),
+                )
+    return _pool
+
+
+def shutdown_process_pool():
+    """Stop the pool's worker processes (e.g. on worker shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def can_use_process_pool():
+    # Prefork Celery children are daemonic and may not start processes
+    return not multiprocessing.current_process().daemon
+
+
+@contextmanager
+def local_path(field_file):
+    """Yield a filesystem path for a stored file, copying it locally if needed."""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        yield path
+        return
+
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as handle:
+        with field_file.open('rb') as source:
+            shutil.copyfileobj(source, handle)
+        handle.flush()
+        yield handle.name
+
+
+def generate(form_file, use_pool=None):
+    """
+    Build derivatives for a FormFile, in the process pool when possible.
+    Returns the same structure as `build_derivatives`.
+    """
+    extension = os.path.splitext(form_file.original_filename or form_file.file.name)[1]
+    sizes = {
+        'thumbnail': _setting('FORMS_THUMBNAIL_SIZE', 256),
+        'preview': _setting('FORMS_PREVIEW_SIZE', 1024),
+    }
+    text_limit = _setting('FORMS_DERIVATIVE_TEXT_LIMIT', 100_000)
+    if use_pool is None:
+        use_pool = _setting('FORMS_DERIVATIVE_USE_PROCESS_POOL', True) and can_use_process_pool()
+
+    with local_path(form_file.file) as path:
+        if use_pool:
+            future = get_process_pool().submit(build_derivatives, path, extension, sizes, text_limit)
+            return future.result(timeout=_setting('FORMS_DERIVATIVE_TIMEOUT', 120))
+        return build_derivatives(path, extension, sizes, text_limit)
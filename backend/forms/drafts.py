@@ -0,0 +1,186 @@
+"""
+Draft submissions with delta autosave.
+
+A draft's answers change through JSON merge patches (RFC 7396): the client
+sends only the keys that changed, `null` removes a key, nested objects
+merge. On SQLite the patch is applied inside the UPDATE with json_patch(),
+so the stored answers are never read back into Python and concurrent saves
+of different keys don't overwrite each other. Other databases merge under a
+row lock instead.
+
+Every saved change increments `version`, exposed as the draft's ETag;
+sending it as If-Match turns a save into a conditional one that fails with
+412 if another tab saved first.
+
+Finalizing creates the FormSubmission and re-points the draft's uploaded
+files at it. It happens once: the draft keeps a link to its submission, and
+finalizing again returns that submission.
+"""
+import json
+
+from django.db import connections, models, transaction
+from django.db.models import F, Func, Value
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .fastjson import ORJSONParser
+from . import events, snapshots
+from .file_serving import compute_sha256
+from .models import FormDraft, FormDraftFile, FormFile, FormSubmission
+
+
+class MergePatchParser(ORJSONParser):
+    """Bodies sent as `application/merge-patch+json`."""
+    media_type = 'application/merge-patch+json'
+
+
+class DraftFinalized(Exception):
+    """The draft was already turned into a submission."""
+
+
+class VersionMismatch(Exception):
+    """The draft changed since the version the client based its patch on."""
+
+
+class JSONPatch(Func):
+    """SQLite's json_patch(target, patch): RFC 7396 merge in SQL."""
+    function = 'json_patch'
+    output_field = models.JSONField()
+
+
+def merge_patch(target, patch):
+    """Apply a JSON merge patch to `target` (RFC 7396) and return the result."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def parse_patch(data):
+    """Split a draft patch into (form_data patch, changed draft fields)."""
+    if not isinstance(data, dict):
+        raise ValidationError({'non_field_errors': ['Expected a JSON object.']})
+    unknown = set(data) - {'form_data', 'submitted_by'}
+    if unknown:
+        raise ValidationError({name: ['This field cannot be changed.'] for name in sorted(unknown)})
+    form_data = data.get('form_data', {})
+    if not isinstance(form_data, dict):
+        raise ValidationError({'form_data': ['Expected a JSON object.']})
+    changes = {}
+    if 'submitted_by' in data:
+        changes['submitted_by'] = str(data['submitted_by'] or '')[:200]
+    return form_data, changes
+
+
+def apply_patch(draft_id, form_data_patch, changes=None, expected_version=None):
+    """
+    Merge `form_data_patch` into the draft's answers and set `changes`.
+    Returns (version, updated_at) after the save; raises FormDraft.DoesNotExist,
+    DraftFinalized or VersionMismatch.
+    """
+    changes = dict(changes or {})
+    now = timezone.now()
+    drafts = FormDraft.objects.filter(pk=draft_id, submission__isnull=True)
+    if expected_version is not None:
+        drafts = drafts.filter(version=expected_version)
+
+    with transaction.atomic():
+        if connections[drafts.db].vendor == 'sqlite':
+            if form_data_patch:
+                changes['form_data'] = JSONPatch(F('form_data'), Value(json.dumps(form_data_patch)))
+            updated = drafts.update(version=F('version') + 1, updated_at=now, **changes)
+        else:
+            draft = drafts.select_for_update().first()
+            updated = 0
+            if draft is not None:
+                changes['form_data'] = merge_patch(draft.form_data, form_data_patch)
+                updated = drafts.update(version=F('version') + 1, updated_at=now, **changes)
+        if not updated:
+            _raise_for_missing(draft_id)
+        version = FormDraft.objects.filter(pk=draft_id).values_list('version', flat=True).get()
+    return version, now
+
+
+def _raise_for_missing(draft_id):
+    state = FormDraft.objects.filter(pk=draft_id).values_list('submission_id', flat=True)
+    if not state:
+        raise FormDraft.DoesNotExist
+    if state[0] is not None:
+        raise DraftFinalized
+    raise VersionMismatch
+
+
+def add_files(draft, uploads):
+    """Store uploaded files on a draft."""
+    if draft.submission_id is not None:
+        raise DraftFinalized
+    return [
+        FormDraftFile.objects.create(
+            draft=draft,
+            field_name=upload.name,
+            file=upload,
+            original_filename=upload.name,
+            file_size=upload.size,
+            sha256=compute_sha256(upload),
+        )
+        for upload in uploads
+    ]
+
+
+def finalize(draft_id):
+    """
+    Turn a draft into a FormSubmission. Returns (submission, created); a
+    draft finalized before returns its existing submission.
+    """
+    with transaction.atomic():
+        draft = FormDraft.objects.select_related('form_template').get(pk=draft_id)
+        if draft.submission_id is not None:
+            return draft.submission, False
+        submission = FormSubmission.objects.create(
+            form_template_id=draft.form_template_id,
+            submitted_by=draft.submitted_by or 'Anonymous',
+            form_data=draft.form_data,
+            snapshot_id=snapshots.current_hash(draft.form_template),
+        )
+        # Claim the draft; a concurrent finalize that got here first wins
+        # and this transaction rolls back
+        claimed = FormDraft.objects.filter(pk=draft_id, submission__isnull=True).update(
+            submission=submission, form_data={}, version=F('version') + 1, updated_at=timezone.now(),
+        )
+        if claimed:
+            draft_files = list(draft.files.all())
+            form_files = FormFile.objects.bulk_create([
+                FormFile(
+                    submission=submission,
+                    field_name=draft_file.field_name,
+                    file=draft_file.file.name,  # same stored file, not a copy
+                    original_filename=draft_file.original_filename,
+                    file_size=draft_file.file_size,
+                    sha256=draft_file.sha256,
+                )
+                for draft_file in draft_files
+            ])
+            FormDraftFile.objects.filter(pk__in=[draft_file.pk for draft_file in draft_files]).delete()
+            changes = [events.event(submission, 'created')]
+            if form_files:
+                changes.append(events.event(submission, 'files_attached', files=[form_file.id for form_file in form_files]))
+            events.record(*changes)
+        else:
+            transaction.set_rollback(True)
+    if not claimed:
+        # Read the winner's submission once this block has rolled back
+        return FormDraft.objects.get(pk=draft_id).submission, False
+    return submission, True
+
+
+def delete_stale_drafts(cutoff):
+    """Delete drafts untouched since `cutoff`, with the files of unfinished ones."""
+    stale = FormDraft.objects.filter(updated_at__lt=cutoff)
+    for draft_file in FormDraftFile.objects.filter(draft__in=stale).iterator():
+        draft_file.file.delete(save=False)
+    return stale.delete()[1].get(FormDraft._meta.label, 0)
@@ -0,0 +1,153 @@
+"""
+Change feed of submissions.
+
+Every change a downstream system cares about appends a SubmissionEvent:
+`created`, `processed` and `files_attached`. The event id is a sequence
+number that only grows (SQLite AUTOINCREMENT and PostgreSQL sequences never
+reuse ids), so a consumer remembers the last id it handled and asks for
+what came after:
+
+    GET /api/submissions/changes/?since=1042&limit=1000&wait=20
+
+The response is NDJSON, one event per line, streamed straight from the
+database cursor. With `wait`, a request finding nothing new holds on for up
+to that many seconds and returns as soon as events arrive (long-poll). Each
+poll is an index range scan past `since`, so its cost depends on the
+number of new events, not on the number of submissions.
+
+Events are recorded explicitly where those changes are made, not through
+model signals, so bulk loaders (generate_data) don't produce any. Events
+older than FORMS_CHANGES_RETENTION_DAYS are deleted by
+cleanup_submission_events. A consumer whose cursor is older than that gets
+410 and has to resync from the submissions API.
+
+With concurrent writers an id could become visible after a higher one, and
+a consumer would move past it for good. SQLite has a single writer. On
+PostgreSQL, recording takes a transaction-level advisory lock before drawing
+ids, so event-recording transactions commit in id order; events are
+recorded last in their transactions, so the lock is held only until commit.
+On other databases FORMS_CHANGES_SETTLE_SECONDS holds back events younger
+than that many seconds.
+
+Recorded events are also pushed to open admin streams once their
+transaction commits (see pubsub.py).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import fastjson, pubsub
+from .models import SubmissionEvent
+
+POLL_INTERVAL = 0.5  # seconds between checks while long-polling
+CHUNK_SIZE = 500
+ORDER_LOCK = 0x466f726d  # pg_advisory_xact_lock key serializing event ids
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CursorExpired(Exception):
+    """Events after the requested sequence number were already deleted."""
+
+
+def event(submission, kind, **data):
+    """An unsaved event for `submission`; pass it to `record`."""
+    return SubmissionEvent(
+        submission_id=submission.pk, form_template_id=submission.form_template_id, kind=kind, data=data,
+    )
+
+
+def record(*events):
+    """Append events to the log in one statement."""
+    if not _setting('FORMS_CHANGES_ENABLED', True) or not events:
+        return
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(savepoint=False):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ORDER_LOCK])
+            SubmissionEvent.objects.bulk_create(events)
+    elif len(events) == 1:
+        # A plain INSERT; bulk_create would wrap it in its own transaction
+        events[0].save(force_insert=True)
+    else:
+        SubmissionEvent.objects.bulk_create(events)
+    if _setting('FORMS_STREAM_ENABLED', True):
+        messages = [pubsub.message(e.pk, e.kind, e.submission_id, e.form_template_id) for e in events]
+        transaction.on_commit(lambda: pubsub.get_broker().publish(messages))
+
+
+def pending(since):
+    """Events after `since` that consumers may see now."""
+    events = SubmissionEvent.objects.filter(pk__gt=since)
+    settle = _setting('FORMS_CHANGES_SETTLE_SECONDS', 0)
+    if settle:
+        events = events.filter(created_at__lte=timezone.now() - timedelta(seconds=settle))
+    return events.order_by('pk')
+
+
+def check_cursor(since):
+    """Raise CursorExpired if events after `since` may have been deleted."""
+    oldest = SubmissionEvent.objects.order_by('pk').values_list('pk', flat=True).first()
+    # The consumer's last event is gone, and so are the ones after it
+    if since and oldest is not None and oldest > since + 1:
+        raise CursorExpired
+
+
+def wait_for(since, seconds):
+    """Block up to `seconds` until there are events after `since`."""
+    deadline = time.monotonic() + seconds
+    while not pending(since).exists():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(POLL_INTERVAL, remaining))
+    return True
+
+
+def ndjson(since, limit):
+    """Lines of the events after `since`, at most `limit` of them."""
+    rows = (
+        pending(since)
+        .values_list('pk', 'kind', 'submission_id', 'form_template_id', 'created_at', 'data')[:limit]
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    lines = []
+    for seq, kind, submission_id, form_template_id, created_at, data in rows:
+        lines.append(fastjson.dumps({
+            'seq': seq,
+            'type': kind,
+            'submission': submission_id,
+            'form_template': form_template_id,
+            'at': created_at.isoformat(),
+            'data': data,
+        }) + b'\n')
+        if len(lines) == CHUNK_SIZE:
+            yield b''.join(lines)
+            lines = []
+    if lines:
+        yield b''.join(lines)
+
+
+def stream_backlog(since, limit):
+    """
+    (seq, frame) pairs of the events after `since` for a reconnecting
+    stream; None if there are more than `limit` or they were deleted.
+    """
+    try:
+        check_cursor(since)
+    except CursorExpired:
+        return None
+    rows = list(pending(since).values_list('pk', 'kind', 'submission_id', 'form_template_id')[:limit + 1])
+    if len(rows) > limit:
+        return None
+    return [(row[0], pubsub.frame(pubsub.message(*row))) for row in rows]
+
+
+def delete_before(cutoff):
+    """Delete events recorded before `cutoff`."""
+    return SubmissionEvent.objects.filter(created_at__lt=cutoff).delete()[0]
@@ -0,0 +1,77 @@
+"""
+JSON encoding and decoding through orjson when it is installed.
+
+Template payloads with hundreds of fields, submission pages and stored
+form_data spend much of their time in the json module; orjson does the same
+work several times faster. It is optional: without it, or with
+FORMS_ORJSON_ENABLED off, everything goes through the stdlib as before.
+
+Output matches DRF's compact JSON: types orjson leaves to `default`
+(datetimes, Decimals, lazy strings) go through DRF's encoder. Unlike DRF,
+U+2028 / U+2029 are left unescaped (valid JSON; scanning megabyte payloads
+for them cost more than the encoding itself). Values orjson rejects, such
+as non-string keys or integers beyond 64 bits, fall back to the stdlib.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+
+def enabled():
+    return orjson is not None and getattr(settings, 'FORMS_ORJSON_ENABLED', True)
+
+
+def dumps(value, default=None):
+    """Serialize to compact UTF-8 JSON bytes; `default` handles unsupported types."""
+    if enabled():
+        try:
+            return orjson.dumps(value, default=default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(value, default=default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Parse JSON from str or bytes; raises ValueError on invalid input."""
+    if enabled():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson. Indented output (browsable API,
+    `Accept: application/json; indent=4`) still goes through the stdlib.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not enabled() or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data, default=self.encoder_class().default)
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser decoding UTF-8 bodies with orjson."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if not enabled() or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
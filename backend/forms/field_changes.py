@@ -0,0 +1,192 @@
+"""
+Batched field editing for a template.
+
+The form builder saves a whole template at once: a list of operations
+
+    {"op": "create", "field": {"field_name": "email", "field_type": "email", "label": "Email"}}
+    {"op": "update", "id": 12, "field": {"label": "Work email"}}
+    {"op": "delete", "id": 13}
+    {"op": "reorder", "fields": ["email", "name", "phone"]}
+
+applied in order to the template's fields. The fields are loaded once and
+every operation is checked against that in-memory state, so validation
+costs no queries. Field names must be unique once the whole batch is
+applied; in between they may clash, so two fields can swap names. Nothing is
+written unless every operation is valid. Then deletes (rules, then fields),
+updates and creates are each done with one statement (plus batches) inside a
+single transaction, whatever the number of fields. `reorder` numbers the named fields 0, 1, ... in the given order.
+
+bulk_create and bulk_update don't send signals, and deletes skip them too
+(each would touch the template and bump the cache on its own), so `apply`
+bumps the template's updated_at and the public cache generation once itself.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .caching import bump_generation
+from .models import FormField, FormTemplate, FormValidationRule
+
+OPERATIONS = ('create', 'update', 'delete', 'reorder')
+
+
+def _field_serializer(*args, **kwargs):
+    from .serializers import FormFieldCreateSerializer
+
+    return FormFieldCreateSerializer(*args, **kwargs)
+
+
+class FieldChanges:
+    """The template's fields with a batch of operations applied in memory."""
+
+    def __init__(self, form_template, fields):
+        self.form_template = form_template
+        self.by_id = {field.pk: field for field in fields}
+        self.by_name = {field.field_name: field for field in fields}
+        self.created = []
+        self.changed = {}  # field id -> names of changed attributes
+        self.renamed = set()
+        self.deleted = set()
+        self.named_by = {}  # id(field) -> index of the operation that gave it its name
+        self.next_order = max((field.order for field in fields), default=-1) + 1
+
+    def _existing(self, operation):
+        field = self.by_id.get(operation.get('id'))
+        if field is None:
+            raise ValidationError({'id': ['No such field in this template.']})
+        return field
+
+    def _name(self, field, name, index):
+        if self.by_name.get(field.field_name) is field:
+            del self.by_name[field.field_name]
+        field.field_name = name
+        self.by_name[name] = field
+        self.named_by[id(field)] = index
+
+    def _validated(self, data, instance=None):
+        if not isinstance(data, dict):
+            raise ValidationError({'field': ['Expected a JSON object.']})
+        serializer = _field_serializer(instance, data=data, partial=instance is not None)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def create(self, operation, index):
+        values = self._validated(operation.get('field'))
+        name = values.pop('field_name')
+        field = FormField(form_template=self.form_template, **values)
+        if 'order' not in values:
+            field.order = self.next_order
+        self.next_order = max(self.next_order, field.order + 1)
+        self._name(field, name, index)
+        self.created.append(field)
+
+    def update(self, operation, index):
+        field = self._existing(operation)
+        values = self._validated(operation.get('field'), instance=field)
+        name = values.pop('field_name', field.field_name)
+        if name != field.field_name:
+            self._name(field, name, index)
+            self.renamed.add(field.pk)
+        for attribute, value in values.items():
+            setattr(field, attribute, value)
+        self.changed.setdefault(field.pk, set()).update(values)
+
+    def delete(self, operation, index):
+        field = self._existing(operation)
+        del self.by_id[field.pk]
+        if self.by_name.get(field.field_name) is field:
+            del self.by_name[field.field_name]
+        self.changed.pop(field.pk, None)
+        self.renamed.discard(field.pk)
+        self.deleted.add(field.pk)
+
+    def reorder(self, operation, index):
+        names = operation.get('fields')
+        if not isinstance(names, list):
+            raise ValidationError({'fields': ['Expected a list of field names.']})
+        unknown = [name for name in names if name not in self.by_name]
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown fields: {", ".join(map(str, unknown))}.']})
+        for position, name in enumerate(names):
+            field = self.by_name[name]
+            field.order = position
+            if field.pk is not None:
+                self.changed.setdefault(field.pk, set()).add('order')
+        self.next_order = max(self.next_order, len(names))
+
+    def validate(self, operations):
+        """Apply `operations` in memory; raises ValidationError naming the failing ones."""
+        if not isinstance(operations, list):
+            raise ValidationError({'operations': ['Expected a list of operations.']})
+        errors = {}
+        for index, operation in enumerate(operations):
+            op = operation.get('op') if isinstance(operation, dict) else None
+            if op not in OPERATIONS:
+                errors[index] = {'op': [f'Expected one of: {", ".join(OPERATIONS)}.']}
+                continue
+            try:
+                getattr(self, op)(operation, index)
+            except ValidationError as exc:
+                errors[index] = exc.detail
+        for index, error in self.duplicate_names().items():
+            errors.setdefault(index, error)
+        if errors:
+            raise ValidationError({'operations': errors})
+
+    def duplicate_names(self):
+        """Errors for the operations that left two fields with the same name."""
+        fields_by_name = {}
+        for field in [*self.by_id.values(), *self.created]:
+            fields_by_name.setdefault(field.field_name, []).append(field)
+        errors = {}
+        for fields in fields_by_name.values():
+            if len(fields) > 1:
+                for field in fields:
+                    if id(field) in self.named_by:
+                        errors[self.named_by[id(field)]] = {
+                            'field_name': ['Field name must be unique within the form template.']
+                        }
+        return errors
+
+    def save(self):
+        if self.deleted:
+            # Raw deletes: a signal per field and rule would cost a query each.
+            # Rules are the only rows that reference fields.
+            rules = FormValidationRule.objects.filter(field_id__in=self.deleted)
+            rules._raw_delete(rules.db)
+            fields = FormField.objects.filter(pk__in=self.deleted)
+            fields._raw_delete(fields.db)
+        changed = {pk: names for pk, names in self.changed.items() if pk in self.by_id}
+        for pk in self.renamed:
+            changed[pk].add('field_name')
+        if changed:
+            if self.renamed:
+                # Free the old names first so swapping two names doesn't trip
+                # the unique constraint halfway through the update
+                renamed = [self.by_id[pk] for pk in self.renamed]
+                final_names = [field.field_name for field in renamed]
+                for field in renamed:
+                    field.field_name = f'__renaming_{field.pk}'
+                FormField.objects.bulk_update(renamed, ['field_name'])
+                for field, name in zip(renamed, final_names):
+                    field.field_name = name
+            attributes = sorted(set().union(*changed.values()))
+            FormField.objects.bulk_update([self.by_id[pk] for pk in changed], attributes)
+        if self.created:
+            FormField.objects.bulk_create(self.created)
+
+
+def apply(form_template_id, operations):
+    """
+    Validate and apply a batch of field operations to a template in one
+    transaction. Returns the template's fields afterwards, in order; raises
+    FormTemplate.DoesNotExist or ValidationError.
+    """
+    with transaction.atomic():
+        form_template = FormTemplate.objects.select_for_update().get(pk=form_template_id)
+        changes = FieldChanges(form_template, list(form_template.fields.all()))
+        changes.validate(operations)
+        changes.save()
+        FormTemplate.objects.filter(pk=form_template.pk).update(updated_at=timezone.now())
+        transaction.on_commit(bump_generation)
+    return form_template.fields.prefetch_related('validation_rules')
@@ -0,0 +1,296 @@
+"""
+Serving uploaded files.
+
+Single downloads support HTTP Range and conditional requests with strong ETags
+derived from the stored SHA-256 of each file. In the default `django` mode the
+file is handed to FileResponse, which WSGI servers with a file wrapper
+(gunicorn, uWSGI) stream with os.sendfile; ranges use a window over the file
+so they stay zero-copy too. Behind nginx or Apache, `x-accel` / `x-sendfile`
+modes return an empty response and let the web server stream the file.
+
+Bulk downloads stream a ZIP archive as it is built: entries are written with
+data descriptors, so nothing is buffered beyond one read chunk and no
+temporary file is needed.
+"""
+import csv
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import escape_uri_path
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.renderers import BaseRenderer
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+HASH_CHUNK_SIZE = 1024 * 1024
+ZIP_CHUNK_SIZE = 64 * 1024
+MANIFEST_SPOOL_SIZE = 1024 * 1024  # manifest bytes kept in memory before spilling to disk
+
+# Already-compressed formats are stored as-is; deflating them costs CPU for nothing
+STORED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'pdf', 'docx'}
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Lets DRF actions return raw file responses whatever the Accept header.
+    """
+    media_type = '*/*'
+    format = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def compute_sha256(file_obj):
+    """Hash a Django File/UploadedFile in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ensure_sha256(form_file):
+    """Return the stored hash, computing it for files uploaded before hashes were recorded."""
+    if not form_file.sha256:
+        with form_file.file.open('rb'):
+            form_file.sha256 = compute_sha256(form_file.file)
+        form_file.save(update_fields=['sha256'])
+    return form_file.sha256
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range `Range` header.
+    Returns (start, end) inclusive, None when the header should be ignored,
+    or raises ValueError when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, min(end, size - 1)
+
+
+class RangeFile(io.RawIOBase):
+    """
+    A window over an open file, exposed as a file object of its own.
+    read()/tell()/seek() are relative to the window, while fileno() stays the
+    underlying descriptor so servers can still sendfile() the range: they
+    start at the current descriptor offset and stop at Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        self._file = file
+        self._start = start
+        self._length = length
+        self._position = 0
+        self._file.seek(start)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._position = min(max(offset, 0), self._length)
+        self._file.seek(self._start + self._position)
+        return self._position
+
+    def read(self, size=-1):
+        remaining = self._length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size) if size else b''
+        self._position += len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Weak validators never match If-Range
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    # Exactly the Last-Modified sent, at its one-second resolution (RFC 9110 13.1.5)
+    return date is not None and date == last_modified
+
+
+def _base_headers(response, form_file, etag, last_modified, content_type):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = (
+        f"attachment; filename*=UTF-8''{escape_uri_path(form_file.original_filename)}"
+    )
+    # Private documents: browsers may revalidate, shared caches must not store
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def serve_form_file(request, form_file):
+    """Build the download response for a FormFile."""
+    etag = f'"{ensure_sha256(form_file)}"'
+    last_modified = int(form_file.uploaded_at.timestamp())
+    content_type = mimetypes.guess_type(form_file.original_filename)[0] or 'application/octet-stream'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    mode = getattr(settings, 'FORMS_FILE_SERVE_MODE', 'django')
+    if mode == 'x-accel':
+        # nginx serves the internal location, including Range handling
+        response = HttpResponse()
+        prefix = getattr(settings, 'FORMS_X_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = escape_uri_path(prefix.rstrip('/') + '/' + form_file.file.name)
+        return _base_headers(response, form_file, etag, last_modified, content_type)
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = form_file.file.path
+        return _base_headers(response, form_file, etag, last_modified, content_type)
+
+    size = form_file.file.size
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    handle = form_file.file.storage.open(form_file.file.name, 'rb')
+    if byte_range is None:
+        response = FileResponse(handle, content_type=content_type)
+        return _base_headers(response, form_file, etag, last_modified, content_type)
+
+    start, end = byte_range
+    response = FileResponse(RangeFile(handle, start, end - start + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _base_headers(response, form_file, etag, last_modified, content_type)
+
+
+class _ZipOutput:
+    """
+    Write-only, non-seekable sink for ZipFile.
+    Written bytes are collected until the streaming generator drains them.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _archive_name(form_file, used_names):
+    submission = form_file.submission
+    name = os.path.basename(form_file.original_filename) or f'file_{form_file.id}'
+    arcname = f'submission_{submission.id}/{name}'
+    if arcname in used_names:
+        stem, extension = os.path.splitext(name)
+        arcname = f'submission_{submission.id}/{stem}_{form_file.id}{extension}'
+    used_names.add(arcname)
+    return arcname
+
+
+def stream_files_zip(form_files, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Yield a ZIP archive of the given FormFiles chunk by chunk.
+    `form_files` can be a lazy iterator (e.g. queryset.iterator()); memory
+    stays constant regardless of file sizes. A manifest.csv with submission,
+    size and SHA-256 of each entry is appended at the end; it is spooled to a
+    temporary file once it outgrows MANIFEST_SPOOL_SIZE.
+    """
+    output = _ZipOutput()
+    used_names = set()
+    manifest = tempfile.SpooledTemporaryFile(MANIFEST_SPOOL_SIZE, mode='w+', encoding='utf-8', newline='')
+    writer = csv.writer(manifest)
+    writer.writerow(['path', 'submission_id', 'submitted_by', 'submitted_at', 'field_name', 'size', 'sha256', 'status'])
+
+    with manifest, zipfile.ZipFile(output, 'w', allowZip64=True) as archive:
+        for form_file in form_files:
+            submission = form_file.submission
+            arcname = _archive_name(form_file, used_names)
+            row = [arcname, submission.id, submission.submitted_by, submission.submitted_at.isoformat(),
+                   form_file.field_name, form_file.file_size, form_file.sha256]
+
+            try:
+                source = form_file.file.storage.open(form_file.file.name, 'rb')
+            except (FileNotFoundError, OSError):
+                writer.writerow(row + ['missing'])
+                continue
+
+            extension = os.path.splitext(arcname)[1].lower().lstrip('.')
+            info = zipfile.ZipInfo(arcname, date_time=timezone.localtime(form_file.uploaded_at).timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    yield from output.drain()
+            yield from output.drain()
+            writer.writerow(row + ['ok'])
+
+        manifest.seek(0)
+        info = zipfile.ZipInfo('manifest.csv', date_time=timezone.localtime().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with archive.open(info, 'w', force_zip64=True) as entry:
+            while True:
+                chunk = manifest.read(chunk_size)
+                if not chunk:
+                    break
+                entry.write(chunk.encode())
+                yield from output.drain()
+    yield from output.drain()
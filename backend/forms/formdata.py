@@ -0,0 +1,156 @@
+"""
+Compact storage of FormSubmission.form_data.
+
+With FORMS_COMPACT_FORM_DATA on, form_data is stored as a positional array
+instead of an object, so field names aren't repeated in every row:
+
+    ["#fd1", <schema id>, <value 0>, ..., <value n-1>]
+    ["#fd1", <schema id>, <value 0>, ..., <value n-1>, {"m": [...], "x": {...}}]
+
+The FormDataSchema row holds the field names in template order, recorded
+once per distinct field list. Schema ids are only memoized once the
+transaction that saw them commits. The optional trailing object lists positions
+whose key was absent (`m`, stored as null) and keys the schema doesn't know
+(`x`). Encoding is therefore lossless whatever schema is used, and a schema
+a few seconds out of date only costs some compactness. That's why the
+current schema of a template is memoized per process without invalidation.
+
+Decoding happens in the model field, so everything reading form_data
+(serializers, exports, the pipeline) still sees a dict. Plain-object rows
+keep working side by side with encoded ones; `encode_form_data` converts
+existing rows either way. JSON key lookups in queries (`form_data__email`)
+only match plain rows.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+FORMAT_TAG = '#fd1'
+HEADER_LENGTH = 2
+SCHEMA_MEMO_SECONDS = 60
+
+_names_by_schema = {}
+_name_sets = {}
+_current = {}  # template id -> (expires, schema id, names)
+
+
+def enabled():
+    return getattr(settings, 'FORMS_COMPACT_FORM_DATA', False)
+
+
+def is_encoded(value):
+    return type(value) is list and len(value) >= HEADER_LENGTH and value[0] == FORMAT_TAG
+
+
+def encode(data, schema_id, names):
+    """Positional form of `data` for the schema (`names` in schema order)."""
+    values = [FORMAT_TAG, schema_id]
+    missing = []
+    for index, name in enumerate(names):
+        if name in data:
+            values.append(data[name])
+        else:
+            values.append(None)
+            missing.append(index)
+    meta = {}
+    if missing:
+        meta['m'] = missing
+    if len(data) > len(names) - len(missing):
+        known = _name_set(schema_id, names)
+        meta['x'] = {key: value for key, value in data.items() if key not in known}
+    if meta:
+        values.append(meta)
+    return values
+
+
+def decode(value):
+    """The dict an encoded value stands for."""
+    names = _names_by_schema.get(value[1]) or schema_names(value[1])
+    count = len(names)
+    data = dict(zip(names, value[HEADER_LENGTH:HEADER_LENGTH + count]))
+    if len(value) > HEADER_LENGTH + count:
+        meta = value[-1]
+        for index in meta.get('m', ()):
+            del data[names[index]]
+        data.update(meta.get('x', {}))
+    return data
+
+
+def _name_set(schema_id, names):
+    name_set = _name_sets.get(schema_id)
+    if name_set is None:
+        name_set = _name_sets[schema_id] = frozenset(names)
+    return name_set
+
+
+def schema_names(schema_id):
+    """Field names of a schema. Schemas never change, so they're kept for the process lifetime."""
+    names = _names_by_schema.get(schema_id)
+    if names is None:
+        from .models import FormDataSchema
+
+        # Load them all: there are few, and a scan usually meets many
+        loaded = {pk: tuple(field_names) for pk, field_names in FormDataSchema.objects.values_list('pk', 'field_names')}
+        # Kept only once committed: a rolled back schema's id can be reused
+        transaction.on_commit(lambda: _names_by_schema.update(loaded))
+        names = loaded.get(schema_id)
+        if names is None:
+            raise LookupError(f'Unknown form_data schema {schema_id}')
+    return names
+
+
+def schema_for_fields(form_template_id, names):
+    """The FormDataSchema id for these field names, recording a new version if needed."""
+    from .models import FormDataSchema
+
+    digest = hashlib.sha256('\x1f'.join(names).encode()).hexdigest()
+    for _ in range(5):
+        existing = FormDataSchema.objects.filter(form_template_id=form_template_id, digest=digest).first()
+        if existing is not None:
+            return existing.pk
+        latest = FormDataSchema.objects.filter(form_template_id=form_template_id).aggregate(v=Max('version'))['v']
+        try:
+            with transaction.atomic():
+                schema = FormDataSchema.objects.create(
+                    form_template_id=form_template_id, version=(latest or 0) + 1,
+                    digest=digest, field_names=list(names),
+                )
+            return schema.pk
+        except IntegrityError:
+            continue  # another process recorded a schema at the same time
+    raise IntegrityError(f'Could not record a form_data schema for template {form_template_id}')
+
+
+def current_schema(form_template_id):
+    """(schema id, names) for the template's fields now, memoized briefly."""
+    now = time.monotonic()
+    memo = _current.get(form_template_id)
+    if memo is not None and memo[0] > now:
+        return memo[1], memo[2]
+    from .models import FormField
+
+    names = tuple(
+        FormField.objects.filter(form_template_id=form_template_id)
+        .order_by('order', 'id').values_list('field_name', flat=True)
+    )
+    schema_id = schema_for_fields(form_template_id, names)
+    memo = (now + SCHEMA_MEMO_SECONDS, schema_id, names)
+    transaction.on_commit(lambda: _current.__setitem__(form_template_id, memo))
+    return schema_id, names
+
+
+def encode_for_template(form_template_id, data):
+    schema_id, names = current_schema(form_template_id)
+    if not names:
+        return data
+    return encode(data, schema_id, names)
+
+
+def reset():
+    """Forget memoized schemas (tests)."""
+    _names_by_schema.clear()
+    _name_sets.clear()
+    _current.clear()
@@ -0,0 +1,154 @@
+"""
+Idempotency keys for endpoints that create submissions.
+
+A client that may retry a POST sends `Idempotency-Key: <unique value>`. The
+first request with a key inserts an IdempotencyRecord, runs, and stores its
+response there; later requests with the same key get that response back
+(with `Idempotent-Replayed: true`) without creating another submission,
+storing files again or queueing another notification.
+
+The unique (scope, key) row is also the lock: a duplicate arriving while
+the first request still runs polls for its result for up to
+FORMS_IDEMPOTENCY_WAIT seconds and then gets 409. A lock whose request died
+is taken over after FORMS_IDEMPOTENCY_LOCK_TIMEOUT seconds, which must be
+longer than any request can run. Reusing a key for a different
+request is refused with 422. Responses of 5xx or raised errors aren't
+stored, so the client's retry runs again. Records are kept for
+FORMS_IDEMPOTENCY_TTL seconds and deleted by cleanup_idempotency_records.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+class KeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_key_in_use'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class KeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _describe(value):
+    # Uploads are identified by name and size; hashing their content would
+    # mean reading every upload twice
+    if hasattr(value, 'read'):
+        return [getattr(value, 'name', ''), getattr(value, 'size', None)]
+    return value
+
+
+def request_fingerprint(request):
+    """SHA-256 over the method, path and parsed body."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {key: [_describe(value) for value in values] for key, values in data.lists()}
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def acquire(scope, key, fingerprint):
+    """
+    Claim `key` for a new request, or find the stored outcome of an earlier one.
+    Returns (record, claimed): run the request and call `complete` if claimed,
+    otherwise replay `record`.
+    """
+    lock_timeout = _setting('FORMS_IDEMPOTENCY_LOCK_TIMEOUT', 120)
+    wait = _setting('FORMS_IDEMPOTENCY_WAIT', 10)
+    deadline = time.monotonic() + wait
+    while True:
+        now = timezone.now()
+        claim = {
+            'fingerprint': fingerprint,
+            'status_code': None,
+            'response_data': None,
+            'locked_until': now + timedelta(seconds=lock_timeout),
+            'expires_at': now + timedelta(seconds=_setting('FORMS_IDEMPOTENCY_TTL', 24 * 60 * 60)),
+        }
+        try:
+            with transaction.atomic():
+                return IdempotencyRecord.objects.create(scope=scope, key=key, **claim), True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyRecord.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            continue  # deleted in between; try to claim it again
+        abandoned = record.status_code is None and record.locked_until <= now
+        if record.expires_at <= now or abandoned:
+            # Take it over unless another request just did
+            taken = IdempotencyRecord.objects.filter(
+                pk=record.pk, expires_at=record.expires_at, locked_until=record.locked_until,
+            ).update(**claim)
+            if taken:
+                record.refresh_from_db()
+                return record, True
+            continue
+
+        if record.fingerprint != fingerprint:
+            raise KeyReused()
+        if record.status_code is not None:
+            return record, False
+        if time.monotonic() >= deadline:
+            raise KeyInUse(wait=max(1, wait))
+        time.sleep(POLL_INTERVAL)
+
+
+def complete(record, response):
+    """Store a finished response for replay, or release the key if it shouldn't be replayed."""
+    if response.status_code >= 500 or not isinstance(response, Response):
+        record.delete()
+        return
+    record.status_code = response.status_code
+    record.response_data = response.data
+    record.locked_until = None
+    record.save(update_fields=['status_code', 'response_data', 'locked_until'])
+
+
+def idempotent_response(request, scope, view):
+    """
+    `view()`, run at most once per Idempotency-Key within `scope` (the
+    endpoint and whoever owns the key); requests without the header just run.
+    """
+    key = request.headers.get(HEADER)
+    if not key or not _setting('FORMS_IDEMPOTENCY_ENABLED', True):
+        return view()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({HEADER: f'Must be at most {MAX_KEY_LENGTH} characters.'})
+
+    record, claimed = acquire(scope, key, request_fingerprint(request))
+    if not claimed:
+        return Response(record.response_data, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+    try:
+        response = view()
+    except BaseException:
+        record.delete()
+        raise
+    complete(record, response)
+    return response
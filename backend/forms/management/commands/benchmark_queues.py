@@ -0,0 +1,160 @@
+"""
+Benchmark notification latency while a bulk cleanup run is in progress.
+
+Runs entirely in-process on Celery's in-memory broker, so no Redis is needed.
+The routing/queue settings of the real tasks are applied to stand-in tasks
+that sleep for a configurable time (SMTP round trip, cleanup batch).
+Two topologies are compared:
+
+* shared: every task goes to one queue consumed by one worker
+* routed: CELERY_TASK_ROUTES applied, one worker per queue
+"""
+import json
+import statistics
+import threading
+import time
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+NOTIFICATION_TASK = 'forms.tasks.send_form_submission_notification'
+CLEANUP_TASK = 'forms.tasks.cleanup_old_notifications'
+
+# Stand-ins get their own names; shared tasks register on every app and
+# would otherwise replace them with the real, database-backed tasks.
+STAND_INS = {
+    'forms.benchmark.notify': NOTIFICATION_TASK,
+    'forms.benchmark.cleanup': CLEANUP_TASK,
+}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Measure notification queue latency while cleanup tasks run (in-memory broker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cleanup-tasks', type=int, default=20,
+                            help='Number of cleanup tasks enqueued up front')
+        parser.add_argument('--cleanup-seconds', type=float, default=0.2,
+                            help='Simulated duration of one cleanup task')
+        parser.add_argument('--notifications', type=int, default=50,
+                            help='Number of notifications sent during the cleanup run')
+        parser.add_argument('--notification-seconds', type=float, default=0.01,
+                            help='Simulated SMTP time of one notification')
+        parser.add_argument('--interval', type=float, default=0.02,
+                            help='Seconds between notifications')
+        parser.add_argument('--max-latency', type=float, default=None,
+                            help='Fail if routed p95 notification latency exceeds this many seconds')
+        parser.add_argument('--json', action='store_true', help='Emit results as JSON')
+
+    def _build_app(self, routed, latencies):
+        app = Celery('forms-queue-benchmark', broker='memory://', backend='cache+memory://', set_as_current=False)
+        app.conf.update(
+            task_acks_late=settings.CELERY_TASK_ACKS_LATE,
+            worker_prefetch_multiplier=settings.CELERY_WORKER_PREFETCH_MULTIPLIER,
+            broker_transport_options={'polling_interval': 0.005},
+            task_default_queue=settings.CELERY_TASK_DEFAULT_QUEUE,
+        )
+        if routed:
+            app.conf.update(
+                task_queues=settings.CELERY_TASK_QUEUES,
+                task_routes={
+                    stand_in: settings.CELERY_TASK_ROUTES[real]
+                    for stand_in, real in STAND_INS.items()
+                },
+            )
+
+        notification_seconds = self.options['notification_seconds']
+        cleanup_seconds = self.options['cleanup_seconds']
+        lock = threading.Lock()
+
+        # shared=False: a shared task would be registered on every app created
+        # afterwards and capture this run's latency list in the next run
+        @app.task(name='forms.benchmark.notify', shared=False)
+        def notify(enqueued_at):
+            with lock:
+                latencies.append(time.time() - enqueued_at)
+            time.sleep(notification_seconds)
+
+        @app.task(name='forms.benchmark.cleanup', shared=False)
+        def cleanup():
+            time.sleep(cleanup_seconds)
+
+        return app, notify, cleanup
+
+    def _run(self, routed):
+        latencies = []
+        app, notify, cleanup = self._build_app(routed, latencies)
+        if routed:
+            queue_sets = [
+                [route['queue']] for route in (
+                    settings.CELERY_TASK_ROUTES[NOTIFICATION_TASK],
+                    settings.CELERY_TASK_ROUTES[CLEANUP_TASK],
+                )
+            ]
+        else:
+            queue_sets = [[settings.CELERY_TASK_DEFAULT_QUEUE]]
+
+        workers = [
+            start_worker(
+                app, pool='solo', concurrency=1, queues=queues,
+                hostname=f'bench-{index}@localhost',
+                perform_ping_check=False, loglevel='WARNING',
+            )
+            for index, queues in enumerate(queue_sets)
+        ]
+        for worker in workers:
+            worker.__enter__()
+        try:
+            for _ in range(self.options['cleanup_tasks']):
+                cleanup.delay()
+            for _ in range(self.options['notifications']):
+                notify.delay(time.time())
+                time.sleep(self.options['interval'])
+
+            total = self.options['notifications']
+            deadline = time.time() + self.options['cleanup_tasks'] * self.options['cleanup_seconds'] + 30
+            while len(latencies) < total and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            for worker in reversed(workers):
+                worker.__exit__(None, None, None)
+
+        if not latencies:
+            raise CommandError('No notifications were processed')
+        return {
+            'processed': len(latencies),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+        }
+
+    def handle(self, *args, **options):
+        self.options = options
+        results = {
+            'shared': self._run(routed=False),
+            'routed': self._run(routed=True),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for name, stats in results.items():
+                self.stdout.write(
+                    f"{name:>7}: {stats['processed']} notifications, "
+                    f"p50 {stats['p50_ms']}ms, p95 {stats['p95_ms']}ms, max {stats['max_ms']}ms"
+                )
+
+        max_latency = options['max_latency']
+        if max_latency is not None and results['routed']['p95_ms'] > max_latency * 1000:
+            raise CommandError(
+                f"Routed p95 notification latency {results['routed']['p95_ms']}ms "
+                f"exceeds {max_latency * 1000}ms"
+            )
@@ -0,0 +1,126 @@
+"""
+Convert stored form_data between plain objects and the compact positional
+encoding (see forms/formdata.py), and measure the difference.
+
+    python manage.py encode_form_data                  # encode every plain row
+    python manage.py encode_form_data --decode         # back to plain objects
+    python manage.py encode_form_data --measure-only   # just report sizes and scan time
+
+Rows are rewritten in primary key batches, each in its own transaction, so
+the command can be stopped and rerun; rows already in the target format are
+skipped. Before and after, it reports the bytes of form_data, the size of
+the submissions table (SQLite dbstat / PostgreSQL) and the time to load and
+decode every row's form_data.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from forms import fastjson, formdata
+from forms.models import FormSubmission
+
+
+def storage_stats():
+    """(form_data bytes, table bytes); either is None where the database can't tell."""
+    table = connection.ops.quote_name(FormSubmission._meta.db_table)
+    column = connection.ops.quote_name('form_data')
+    data_bytes = table_bytes = None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'SELECT SUM(LENGTH({column})) FROM {table}')
+            data_bytes = cursor.fetchone()[0]
+            try:
+                # Used bytes: space freed by shorter rows stays in the file
+                # until VACUUM but is reused before the file grows
+                cursor.execute('SELECT SUM(pgsize - unused) FROM dbstat WHERE name = %s',
+                               [FormSubmission._meta.db_table])
+                table_bytes = cursor.fetchone()[0]
+            except Exception:
+                pass  # SQLite built without dbstat
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'SELECT SUM(pg_column_size({column})) FROM {table}')
+            data_bytes = cursor.fetchone()[0]
+            cursor.execute('SELECT pg_total_relation_size(%s)', [FormSubmission._meta.db_table])
+            table_bytes = cursor.fetchone()[0]
+    return data_bytes, table_bytes
+
+
+def scan_seconds(chunk_size=2_000):
+    """Time to load and decode every row's form_data."""
+    start = time.perf_counter()
+    for _ in FormSubmission.objects.values_list('form_data', flat=True).iterator(chunk_size=chunk_size):
+        pass
+    return time.perf_counter() - start
+
+
+def _size(value):
+    return 'n/a' if value is None else f'{value / 1_048_576:,.1f} MiB'
+
+
+class Command(BaseCommand):
+    help = 'Encode FormSubmission.form_data positionally (or decode it) and measure storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--decode', action='store_true', help='Rewrite encoded rows as plain objects')
+        parser.add_argument('--measure-only', action='store_true', help='Only report sizes and scan time')
+        parser.add_argument('--batch-size', type=int, default=2_000, help='Rows per transaction')
+
+    def measure(self, label):
+        data_bytes, table_bytes = storage_stats()
+        seconds = scan_seconds()
+        self.stdout.write(
+            f'{label:<7} form_data {_size(data_bytes)}, table {_size(table_bytes)}, '
+            f'full scan {seconds:.2f}s'
+        )
+
+    def handle(self, *args, **options):
+        total = FormSubmission.objects.count()
+        self.stdout.write(f'{total:,} submissions')
+        self.measure('before')
+        if options['measure_only']:
+            return
+        if not options['decode'] and not formdata.enabled():
+            self.stdout.write(self.style.WARNING(
+                'FORMS_COMPACT_FORM_DATA is off: new submissions will still be stored as plain objects'
+            ))
+
+        field = FormSubmission._meta.get_field('form_data')
+        table = connection.ops.quote_name(FormSubmission._meta.db_table)
+        sql = f"UPDATE {table} SET {connection.ops.quote_name('form_data')} = %s WHERE id = %s"
+        rewritten = 0
+        last_id = 0
+        started = time.perf_counter()
+        while True:
+            with transaction.atomic():
+                # Raw values: the field would decode them, hiding the stored format
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT id, form_template_id, form_data FROM {table} WHERE id > %s ORDER BY id LIMIT %s',
+                        [last_id, options['batch_size']],
+                    )
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                updates = []
+                for pk, form_template_id, raw in rows:
+                    value = fastjson.loads(raw) if isinstance(raw, (str, bytes)) else raw
+                    if options['decode']:
+                        if formdata.is_encoded(value):
+                            updates.append((formdata.decode(value), pk))
+                    elif type(value) is dict and value:
+                        encoded = formdata.encode_for_template(form_template_id, value)
+                        if encoded is not value:
+                            updates.append((encoded, pk))
+                if updates:
+                    with connection.cursor() as cursor:
+                        cursor.executemany(sql, [
+                            (field.get_db_prep_value(value, connection), pk) for value, pk in updates
+                        ])
+                rewritten += len(updates)
+            self.stdout.write(f'  up to id {last_id}: {rewritten:,} rows rewritten')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rewrote {rewritten:,} rows in {elapsed:.1f}s'))
+        self.measure('after')
@@ -0,0 +1,74 @@
+"""
+Seed a database with synthetic templates, submissions and files.
+
+    python manage.py generate_data --templates 50 --submissions 10000000 --workers 4 --sqlite-fast
+
+See forms/datagen.py for how rows are generated and inserted.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from forms import datagen
+from forms.models import FormSubmission
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate synthetic templates, submissions and files for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=20, help='Number of templates to create')
+        parser.add_argument('--min-fields', type=int, default=10, help='Fewest fields per template')
+        parser.add_argument('--max-fields', type=int, default=200, help='Most fields per template')
+        parser.add_argument('--submissions', type=int, default=100_000, help='Number of submissions')
+        parser.add_argument('--files', type=int, default=0,
+                            help='FormFile rows attached to random new submissions (sharing a few dummy files)')
+        parser.add_argument('--days', type=int, default=365, help='Spread submission times over this many days')
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Rows per bulk_create batch')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes generating submissions')
+        parser.add_argument('--sqlite-fast', action='store_true',
+                            help='Use unsafe SQLite pragmas (no journal file, no fsync) while loading')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed')
+        parser.add_argument('--username', default='loadtest', help='Owner of the generated templates')
+
+    def handle(self, *args, **options):
+        if options['templates'] < 1:
+            raise CommandError('--templates must be at least 1')
+        if options['min_fields'] > options['max_fields']:
+            raise CommandError('--min-fields cannot exceed --max-fields')
+
+        started = time.perf_counter()
+        with datagen.sqlite_fast_load(options['sqlite_fast']):
+            user, _ = User.objects.get_or_create(username=options['username'], defaults={'is_staff': True})
+            templates = datagen.create_templates(
+                user, options['templates'], options['min_fields'], options['max_fields'], seed=options['seed'],
+            )
+            field_count = sum(len(specs) for _, specs in templates)
+            self.stdout.write(f"Created {len(templates)} templates with {field_count} fields")
+
+            first_id = (FormSubmission.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+            plan = datagen.SubmissionPlan(templates, options['submissions'], days=options['days'], seed=options['seed'])
+            total = options['submissions']
+            step = max(total // 10, 1)
+            reported = [0]
+
+            def progress(done):
+                if done - reported[0] >= step or done == total:
+                    reported[0] = done
+                    rate = done / (time.perf_counter() - started)
+                    self.stdout.write(f'  {done:,}/{total:,} submissions ({rate:,.0f} rows/s)')
+
+            created = datagen.generate_submissions(
+                plan, batch_size=options['batch_size'], workers=options['workers'], progress=progress,
+            )
+            last_id = FormSubmission.objects.aggregate(last=Max('id'))['last'] or 0
+
+            files = datagen.attach_files(range(first_id, last_id + 1), options['files'], seed=options['seed'],
+                                         batch_size=options['batch_size']) if created else 0
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {created:,} submissions and {files:,} files in {elapsed:.1f}s'
+        ))
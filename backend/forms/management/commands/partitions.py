@@ -0,0 +1,54 @@
+"""
+Monthly partitioning of submissions and notification logs (see
+forms/partitions.py).
+
+    python manage.py partitions              # show each table's partitions
+    python manage.py partitions --convert    # partition the tables (once, PostgreSQL)
+    python manage.py partitions --maintain   # create upcoming partitions, detach expired ones
+
+--convert requires FORMS_PARTITIONING_ENABLED and locks each table while it
+runs; expect it to take about as long as reading the table once.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from forms import partitions
+
+
+class Command(BaseCommand):
+    help = 'Show, create or maintain the monthly partitions of submissions and notification logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Partition the tables that are not yet')
+        parser.add_argument('--maintain', action='store_true', help='Create upcoming and detach expired partitions')
+
+    def show(self):
+        for model, column in partitions.TABLES:
+            table = model._meta.db_table
+            if not partitions.is_partitioned(table):
+                self.stdout.write(f'{table}: not partitioned')
+                continue
+            self.stdout.write(f'{table}: partitioned by month on {column}')
+            for partition in partitions.partitions(table):
+                upper = 'default' if partition.upper is None else f'before {partition.upper:%Y-%m-%d}'
+                self.stdout.write(f'  {partition.name} ({upper})')
+
+    def handle(self, *args, **options):
+        if not partitions.supported():
+            if options['convert'] or options['maintain']:
+                raise CommandError(f'Partitioning needs PostgreSQL; this database is {connection.vendor}')
+            self.stdout.write(f'Partitioning needs PostgreSQL; on {connection.vendor} retention deletes in batches')
+            return
+        if options['convert']:
+            if not getattr(settings, 'FORMS_PARTITIONING_ENABLED', False):
+                raise CommandError('Set FORMS_PARTITIONING_ENABLED before converting')
+            ahead = getattr(settings, 'FORMS_PARTITION_MONTHS_AHEAD', 3)
+            for model, column in partitions.TABLES:
+                if not partitions.is_partitioned(model._meta.db_table):
+                    self.stdout.write(f'Partitioning {model._meta.db_table}...')
+                    partitions.convert(model, column, ahead)
+        if options['maintain']:
+            for change in partitions.maintain():
+                self.stdout.write(change)
+        self.show()
@@ -0,0 +1,149 @@
+"""
+Run the benchmark suite on a throwaway database and compare with a baseline.
+
+    python manage.py run_benchmarks --scale small
+    python manage.py run_benchmarks --scale large --keepdb        # reuse the seeded database
+    python manage.py run_benchmarks --scale small --update-baseline
+
+The database is created like a test database (`test_<name>`), seeded with
+forms.benchmarks.seed() and destroyed afterwards unless --keepdb is given.
+Submit benchmarks don't enqueue Celery tasks, so no broker is needed; the
+notification task is timed on its own with the locmem email backend.
+"""
+import json
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+
+from forms import benchmarks
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway database, time the key API paths and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(benchmarks.SCALES), default='small',
+                            help='Dataset size preset')
+        parser.add_argument('--submissions', type=int, default=None,
+                            help='Override the number of bulk submissions of the preset')
+        parser.add_argument('--only', nargs='+', default=None, metavar='NAME',
+                            help='Run only these benchmarks')
+        parser.add_argument('--iterations', type=int, default=None,
+                            help='Override iterations of every benchmark')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the benchmark database (and reuse it if already seeded)')
+        parser.add_argument('--output', default=None, help='Write results JSON to this file')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON to compare with')
+        parser.add_argument('--no-compare', action='store_true', help='Skip the baseline comparison')
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results to the baseline file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed p50 slowdown before a benchmark counts as a regression')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        config = dict(benchmarks.SCALES[options['scale']])
+        if options['submissions'] is not None:
+            config['submissions'] = options['submissions']
+        selected = benchmarks.BENCHMARKS
+        if options['only']:
+            unknown = set(options['only']) - {bench.name for bench in selected}
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            selected = [bench for bench in selected if bench.name in options['only']]
+
+        verbosity = options['verbosity']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if options['keepdb'] and connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # SQLite test databases are in-memory by default; keep this one on disk
+            test_settings['NAME'] = str(Path(settings.BASE_DIR) / 'benchmark.sqlite3')
+        media_root = tempfile.mkdtemp(prefix='formflow-bench-')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            # One client submits far faster than any rate limit allows, and
+            # tasks aren't queued, so there's no broker queue to watch
+            with override_settings(MEDIA_ROOT=media_root, FORMS_THROTTLE_ENABLED=False,
+                                   FORMS_ADMISSION_MAX_QUEUE_DEPTH=0), \
+                    mock.patch('forms.views.queue_submission_tasks'):
+                if options['keepdb'] and benchmarks.is_seeded(config):
+                    ids = benchmarks.describe(config)
+                else:
+                    ids = benchmarks.seed(config, stdout=self.stdout if verbosity > 1 else None)
+                context = benchmarks.BenchmarkContext(ids)
+                results = {}
+                for bench in selected:
+                    if verbosity > 1:
+                        self.stdout.write(f'Running {bench.name}...')
+                    results[bench.name] = benchmarks.run_benchmark(bench, context, options['iterations'])
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'meta': {
+                'scale': options['scale'],
+                'dataset': config,
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': platform.machine(),
+                'created_at': timezone.now().isoformat(),
+            },
+            'results': results,
+        }
+        self._write(report, options)
+
+        if options['update_baseline']:
+            baseline_path = Path(options['baseline'])
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2) + '\n')
+            self.stdout.write(f'Baseline written to {baseline_path}')
+        elif not options['no_compare']:
+            self._compare(report, Path(options['baseline']), options['threshold'])
+
+    def _write(self, report, options):
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2) + '\n')
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{'benchmark':<30} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>10} {'queries':>8}")
+        for name, stats in report['results'].items():
+            self.stdout.write(
+                f"{name:<30} {stats['p50_ms']:>10} {stats['p95_ms']:>10} "
+                f"{stats['ops_per_sec']:>10} {stats['queries_per_op']:>8}"
+            )
+
+    def _compare(self, report, baseline_path, threshold):
+        if not baseline_path.exists():
+            self.stdout.write(f'No baseline at {baseline_path}; run with --update-baseline to create one')
+            return
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['meta'].get('dataset') != report['meta']['dataset']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline was recorded on a different dataset ({baseline['meta'].get('scale')}); not comparing"
+            ))
+            return
+
+        regressions = benchmarks.compare(report['results'], baseline['results'], threshold)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regressions beyond {threshold:.0%} against {baseline_path}'))
+            return
+        for name, before, after, ratio in regressions:
+            self.stderr.write(f'{name}: p50 {before}ms -> {after}ms ({ratio}x)')
+        raise CommandError(f'{len(regressions)} benchmark(s) regressed beyond {threshold:.0%}')
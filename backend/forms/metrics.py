@@ -0,0 +1,449 @@
+"""
+Request and task instrumentation exposed in Prometheus text format.
+
+Recording is lock-free: every thread writes to its own shard (a plain dict
+only that thread mutates), and readers merge copies of all shards. Shards of
+finished threads are folded into a retired total so short-lived threads don't
+accumulate.
+
+Several worker processes (gunicorn, Celery prefork) each hold their own
+shards. With FORMS_METRICS_DIR set, every process periodically writes its
+totals to its own file in that directory and `/metrics` sums all files, so
+any worker can answer a scrape for the whole deployment. Without it, a scrape
+only sees the process that served it. Scrapes fold the files of this host's
+exited processes into one archive file, so restarts and forks don't leave a
+growing number of files to read.
+"""
+import atexit
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+PUBLISHED_AT_HEADER = 'forms_published_at'
+
+
+class Metric:
+    """Definition of a counter or histogram."""
+
+    def __init__(self, name, kind, help_text, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.buckets = tuple(buckets or ())
+
+
+METRICS = {metric.name: metric for metric in (
+    Metric('forms_http_request_duration_seconds', 'histogram',
+           'Request latency by route', LATENCY_BUCKETS),
+    Metric('forms_http_db_queries', 'histogram',
+           'Database queries per request by route', QUERY_COUNT_BUCKETS),
+    Metric('forms_http_db_query_seconds_total', 'counter',
+           'Time spent in database queries by route'),
+    Metric('forms_http_cache_requests_total', 'counter',
+           'Application cache lookups by route and result'),
+    Metric('forms_http_upload_bytes_total', 'counter',
+           'Bytes received in multipart uploads by route'),
+    Metric('forms_cache_requests_total', 'counter',
+           'Application cache lookups by cache and result'),
+    Metric('forms_submissions_rejected_total', 'counter',
+           'Public submissions refused by rate limiting or admission control, by reason'),
+    Metric('forms_task_queue_wait_seconds', 'histogram',
+           'Time between publishing a task and a worker starting it', TASK_BUCKETS),
+    Metric('forms_task_run_seconds', 'histogram',
+           'Task execution time by task and final state', TASK_BUCKETS),
+    Metric('forms_task_db_queries_total', 'counter',
+           'Database queries run by tasks'),
+    Metric('forms_task_db_query_seconds_total', 'counter',
+           'Time tasks spent in database queries'),
+)}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting('FORMS_METRICS_ENABLED', True)
+
+
+# Per-thread shards
+
+class _Shards:
+    def __init__(self):
+        self.live = []
+        self.retired = {}
+        self.lock = threading.Lock()  # taken when a shard is created or retired, never per sample
+        self.local = threading.local()
+        self.token = uuid.uuid4().hex
+        self.last_flush = 0.0
+
+
+class _ShardOwner:
+    """Held in thread-local storage; folds the shard into the retired totals when the thread ends."""
+
+    def __init__(self, shards):
+        self.shards = shards
+        self.data = {}
+        with shards.lock:
+            shards.live.append(self.data)
+
+    def __del__(self):
+        shards = self.shards
+        with shards.lock:
+            _merge_into(shards.retired, self.data)
+            shards.live = [data for data in shards.live if data is not self.data]
+
+
+_shards = _Shards()
+
+
+def _reset_after_fork():
+    # A forked child starts with empty totals and its own metrics file
+    global _shards
+    _shards = _Shards()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _shard():
+    shards = _shards
+    owner = getattr(shards.local, 'owner', None)
+    if owner is None:
+        owner = shards.local.owner = _ShardOwner(shards)
+    return owner.data
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter."""
+    if not enabled():
+        return
+    data = _shard()
+    key = _key(name, labels)
+    data[key] = data.get(key, 0) + amount
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    """Record one sample in a histogram."""
+    if not enabled():
+        return
+    buckets = METRICS[name].buckets
+    data = _shard()
+    key = _key(name, labels)
+    values = data.get(key)
+    if values is None:
+        # One slot per bucket, then +Inf, then the sum of samples
+        values = data[key] = [0] * (len(buckets) + 2)
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            values[index] += 1
+            break
+    else:
+        values[len(buckets)] += 1
+    values[-1] += value
+    _maybe_flush()
+
+
+def _merge_into(target, source):
+    for key, value in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(current, value)]
+        else:
+            target[key] = current + value
+
+
+def snapshot():
+    """Totals recorded by this process."""
+    shards = _shards
+    totals = {}
+    with shards.lock:
+        _merge_into(totals, shards.retired)
+        live = list(shards.live)
+    for data in live:
+        # dict.copy() is atomic under the GIL, so the owning thread can keep writing
+        _merge_into(totals, data.copy())
+    return totals
+
+
+# Per-process files
+
+def _metrics_dir():
+    return _setting('FORMS_METRICS_DIR', '')
+
+
+def _process_file(directory):
+    return os.path.join(directory, f'metrics_{socket.gethostname()}_{os.getpid()}_{_shards.token}.json')
+
+
+def _read_entries(path):
+    with open(path) as handle:
+        return {
+            (name, tuple(tuple(pair) for pair in labels)): value
+            for name, labels, value in json.load(handle)
+        }
+
+
+def _write_entries(path, totals):
+    entries = [[name, list(labels), value] for (name, labels), value in totals.items()]
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as handle:
+        json.dump(entries, handle)
+    os.replace(temporary, path)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fold_exited(directory):
+    """
+    Add the files of this host's exited processes to archive.json and delete
+    them, the way prometheus_client's mark_process_dead retires them. Only
+    this host's files: pids of other hosts sharing the directory mean nothing here.
+    """
+    prefix = f'metrics_{socket.gethostname()}_'
+    exited = []
+    for filename in os.listdir(directory):
+        if not (filename.startswith(prefix) and filename.endswith('.json')):
+            continue
+        pid = filename[len(prefix):].split('_', 1)[0]
+        if pid.isdigit() and not _is_running(int(pid)):
+            exited.append(os.path.join(directory, filename))
+    if not exited:
+        return
+    archive = os.path.join(directory, 'archive.json')
+    with open(os.path.join(directory, 'archive.lock'), 'w') as lock:
+        # One process folds at a time; another may have folded these files already
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            totals = _read_entries(archive)
+        except FileNotFoundError:
+            totals = {}
+        folded = []
+        for path in exited:
+            try:
+                _merge_into(totals, _read_entries(path))
+            except (OSError, ValueError):
+                continue
+            folded.append(path)
+        if not folded:
+            return
+        _write_entries(archive, totals)
+        for path in folded:
+            os.remove(path)
+
+
+def flush():
+    """Write this process's totals to its file in FORMS_METRICS_DIR."""
+    directory = _metrics_dir()
+    if not directory:
+        return
+    _shards.last_flush = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    _write_entries(_process_file(directory), snapshot())
+
+
+def _maybe_flush():
+    if not _metrics_dir():
+        return
+    interval = _setting('FORMS_METRICS_FLUSH_INTERVAL', 5)
+    if time.monotonic() - _shards.last_flush >= interval:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(lambda: _metrics_dir() and flush())
+
+
+def collect():
+    """Totals for the whole deployment: every process file plus this process's live values."""
+    directory = _metrics_dir()
+    totals = snapshot()
+    if not directory or not os.path.isdir(directory):
+        return totals
+    try:
+        _fold_exited(directory)
+    except OSError:
+        pass
+    own = os.path.basename(_process_file(directory))
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename == own:
+            continue
+        try:
+            _merge_into(totals, _read_entries(os.path.join(directory, filename)))
+        except (OSError, ValueError):
+            continue
+    return totals
+
+
+# Exposition
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_prometheus(totals=None):
+    """Render totals in the Prometheus text exposition format."""
+    totals = collect() if totals is None else totals
+    by_metric = {}
+    for (name, labels), value in totals.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_metric):
+        metric = METRICS.get(name)
+        if metric is None:
+            continue
+        lines.append(f'# HELP {name} {metric.help_text}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for labels, value in sorted(by_metric[name]):
+            if metric.kind == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            bounds = [str(bound) for bound in metric.buckets] + ['+Inf']
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+# Database queries
+
+class QueryTimer:
+    """Counts and times queries on every connection of the current thread."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+    def install(self):
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+            self._connections.append(connection)
+        return self
+
+    def uninstall(self):
+        for connection in self._connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self._connections = []
+
+
+# Cache lookups
+
+_request_state = threading.local()
+
+
+def record_cache(cache_name, hit):
+    """Record an application cache lookup; attributed to the current request too."""
+    result = 'hit' if hit else 'miss'
+    inc('forms_cache_requests_total', cache=cache_name, result=result)
+    lookups = getattr(_request_state, 'cache_lookups', None)
+    if lookups is not None:
+        lookups[result] += 1
+
+
+@contextmanager
+def track_request_cache():
+    """Collect cache hits/misses recorded while handling a request."""
+    lookups = _request_state.cache_lookups = {'hit': 0, 'miss': 0}
+    try:
+        yield lookups
+    finally:
+        _request_state.cache_lookups = None
+
+
+# Celery
+
+_task_state = threading.local()
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    if not enabled():
+        return
+    request = task.request
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None)
+    delivery_info = getattr(request, 'delivery_info', None) or {}
+    queue = delivery_info.get('routing_key') or 'unknown'
+    if published_at is not None and not getattr(request, 'is_eager', False):
+        observe('forms_task_queue_wait_seconds', max(time.time() - float(published_at), 0),
+                task=task.name, queue=queue)
+    timers = getattr(_task_state, 'timers', None)
+    if timers is None:
+        timers = _task_state.timers = {}
+    timers[task_id] = (time.perf_counter(), QueryTimer().install())
+
+
+@task_postrun.connect
+def stop_task_timer(task_id=None, task=None, state=None, **kwargs):
+    timers = getattr(_task_state, 'timers', None) or {}
+    started = timers.pop(task_id, None)
+    if started is None:
+        return
+    start, queries = started
+    queries.uninstall()
+    observe('forms_task_run_seconds', time.perf_counter() - start, task=task.name, state=state or 'UNKNOWN')
+    inc('forms_task_db_queries_total', queries.count, task=task.name)
+    inc('forms_task_db_query_seconds_total', queries.duration, task=task.name)
@@ -0,0 +1,161 @@
+"""
+Request middleware for the forms app.
+"""
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics, profiling
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Records latency, database queries, cache lookups and upload bytes per
+    route. Routes are URL names (e.g. `formsubmission-detail`) so the label
+    set stays small. Place it first in MIDDLEWARE so the latency covers the
+    whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.enabled():
+            return self.get_response(request)
+
+        queries = metrics.QueryTimer().install()
+        start = time.perf_counter()
+        try:
+            with metrics.track_request_cache() as cache_lookups:
+                response = self.get_response(request)
+        finally:
+            queries.uninstall()
+        duration = time.perf_counter() - start
+
+        route = _route(request)
+        metrics.observe('forms_http_request_duration_seconds', duration,
+                        method=request.method, route=route, status=response.status_code)
+        metrics.observe('forms_http_db_queries', queries.count, route=route)
+        if queries.count:
+            metrics.inc('forms_http_db_query_seconds_total', queries.duration, route=route)
+        for result, count in cache_lookups.items():
+            if count:
+                metrics.inc('forms_http_cache_requests_total', count, route=route, result=result)
+        if request.content_type == 'multipart/form-data':
+            try:
+                upload_bytes = int(request.META.get('CONTENT_LENGTH') or 0)
+            except ValueError:
+                upload_bytes = 0
+            if upload_bytes:
+                metrics.inc('forms_http_upload_bytes_total', upload_bytes, route=route)
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Profiles requests on demand; see forms/profiling.py. Must come after
+    AuthenticationMiddleware. When a request is neither flagged nor sampled
+    the only cost is a header lookup (and a random draw if sampling is on).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FORMS_PROFILE_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'FORMS_PROFILE_SAMPLE_RATE', 0.0)
+        self.sample_paths = [re.compile(pattern) for pattern in getattr(settings, 'FORMS_PROFILE_SAMPLE_PATHS', [])]
+
+    def _trigger(self, request):
+        if request.META.get(profiling.PROFILE_HEADER):
+            user = profiling.requesting_staff_user(request)
+            if user is not None:
+                return 'header', user
+        if self.sample_rate and random.random() < self.sample_rate:
+            if any(pattern.search(request.path) for pattern in self.sample_paths):
+                return 'sampled', None
+        return None, None
+
+    def __call__(self, request):
+        if not request.META.get(profiling.PROFILE_HEADER) and not self.sample_rate:
+            return self.get_response(request)
+        trigger, user = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        queries = metrics.QueryTimer().install()
+        start = time.perf_counter()
+        try:
+            with profiling.Profile() as profile:
+                response = self.get_response(request)
+        finally:
+            queries.uninstall()
+        duration = time.perf_counter() - start
+
+        saved = profile.save(request, response, trigger, user, duration, queries)
+        if trigger == 'header':
+            response['X-Profile-Id'] = str(saved.id)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses textual responses with the best encoding the client accepts;
+    see forms/compression.py. Place it right after MetricsMiddleware so it
+    sees the final response body.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'FORMS_COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.encoders = compression.available_encoders(
+            getattr(settings, 'FORMS_COMPRESSION_ENCODINGS', ['zstd', 'br', 'gzip'])
+        )
+        self.min_size = getattr(settings, 'FORMS_COMPRESSION_MIN_SIZE', 1024)
+        self.exclude_paths = [re.compile(pattern) for pattern in getattr(settings, 'FORMS_COMPRESSION_EXCLUDE_PATHS', [])]
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not compression.is_compressible(response):
+            return response
+        if response.streaming:
+            if response.is_async:
+                return response
+        elif len(response.content) < self.min_size:
+            return response
+        if any(pattern.search(request.path) for pattern in self.exclude_paths):
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoder = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encoders)
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = encoder.stream(response.streaming_content)
+            # The compressed length isn't known until the stream ends
+            del response.headers['Content-Length']
+        else:
+            compressed = encoder.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag names exact bytes; the compressed body only matches weakly
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = f'W/{etag}'
+        response.headers['Content-Encoding'] = encoder.name
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0002_formsubmission_processing_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formfile',
+            name='derivatives_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('unsupported', 'Unsupported'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='formfile',
+            name='extracted_text',
+            field=models.TextField(blank=True, help_text='Text extracted from the document for search'),
+        ),
+        migrations.AddField(
+            model_name='formfile',
+            name='metadata',
+            field=models.JSONField(blank=True, default=dict, help_text='Document metadata such as page count and dimensions'),
+        ),
+        migrations.AddField(
+            model_name='formfile',
+            name='preview',
+            field=models.ImageField(blank=True, upload_to='form_derivatives/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='formfile',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='form_derivatives/%Y/%m/%d/'),
+        ),
+    ]
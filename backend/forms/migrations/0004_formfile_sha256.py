@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0003_formfile_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formfile',
+            name='sha256',
+            field=models.CharField(blank=True, help_text='Content hash, used as the download ETag', max_length=64),
+        ),
+    ]
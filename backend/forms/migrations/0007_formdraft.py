@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:41
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0006_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormDraft',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('submitted_by', models.CharField(blank=True, max_length=200)),
+                ('form_data', models.JSONField(blank=True, default=dict, help_text='Answers saved so far')),
+                ('version', models.PositiveIntegerField(default=1, help_text='Incremented by every saved change')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('form_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drafts', to='forms.formtemplate')),
+                ('submission', models.OneToOneField(blank=True, help_text='Set once the draft is finalized', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='draft', to='forms.formsubmission')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FormDraftFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=100)),
+                ('file', models.FileField(upload_to='form_uploads/%Y/%m/%d/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png', 'txt'])])),
+                ('original_filename', models.CharField(max_length=255)),
+                ('file_size', models.PositiveIntegerField()),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('draft', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='forms.formdraft')),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+            },
+        ),
+    ]
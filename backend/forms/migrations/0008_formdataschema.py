@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0007_formdraft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormDataSchema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('digest', models.CharField(help_text='SHA-256 of the field names', max_length=64)),
+                ('field_names', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('form_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_schemas', to='forms.formtemplate')),
+            ],
+            options={
+                'ordering': ['form_template', 'version'],
+                'constraints': [models.UniqueConstraint(fields=('form_template', 'version'), name='unique_schema_version'), models.UniqueConstraint(fields=('form_template', 'digest'), name='unique_schema_digest')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0008_formdataschema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormTemplateSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('definition', models.JSONField(help_text='Template and fields as serialized when the snapshot was taken')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('form_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='forms.formtemplate')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='formsubmission',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='submissions', to='forms.formtemplatesnapshot', to_field='content_hash'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0009_formtemplatesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('processed', 'Processed'), ('files_attached', 'Files attached')], max_length=20)),
+                ('data', models.JSONField(blank=True, default=dict, help_text='What changed, e.g. the ids of attached files')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('form_template', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='forms.formtemplate')),
+                ('submission', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='forms.formsubmission')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
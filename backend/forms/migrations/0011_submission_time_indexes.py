@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0010_submissionevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='formsubmission',
+            name='submitted_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='notificationlog',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -1,7 +1,57 @@
 from django.db import models
+from django.db.models.fields.json import KeyTransform
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
+from django.core.serializers.json import DjangoJSONEncoder
+from . import fastjson, formdata
 import json
+import uuid
+
+
+class FastJSONField(models.JSONField):
+    """
+    JSONField that encodes and decodes dicts and lists with orjson when it's
+    installed (see fastjson.py). Fields with a custom encoder or decoder, and
+    writes on PostgreSQL (adapted by psycopg), keep Django's stdlib path.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if self.decoder is None and isinstance(value, str):
+            try:
+                return fastjson.loads(value)
+            except ValueError:
+                pass  # e.g. NaN written by the stdlib encoder
+        return super().from_db_value(value, expression, connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if (type(value) in (dict, list) and self.encoder is None
+                and connection.vendor != 'postgresql' and fastjson.enabled()):
+            return fastjson.dumps(value).decode()
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def deconstruct(self):
+        # Same column as JSONField; migrations (and SQLite table rebuilds) needn't know
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.JSONField', args, kwargs
+
+
+class FormDataField(FastJSONField):
+    """
+    FastJSONField for submission answers: dicts are stored positionally when
+    FORMS_COMPACT_FORM_DATA is on and decoded back on load (see formdata.py).
+    """
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if formdata.enabled() and type(value) is dict and value:
+            return formdata.encode_for_template(model_instance.form_template_id, value)
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        value = super().from_db_value(value, expression, connection)
+        if formdata.is_encoded(value) and not isinstance(expression, KeyTransform):
+            return formdata.decode(value)
+        return value
 
 
 class FormTemplate(models.Model):
@@ -18,7 +68,7 @@ class FormTemplate(models.Model):
     
     # JSON field to store form configuration - this is the key to flexibility
     # This allows for unlimited field types, validation rules, and configurations
-    configuration = models.JSONField(default=dict, help_text="Form configuration including fields, validation rules, etc.")
+    configuration = FastJSONField(default=dict, help_text="Form configuration including fields, validation rules, etc.")
     
     class Meta:
         ordering = ['-created_at']
@@ -57,10 +107,10 @@ class FormField(models.Model):
     order = models.PositiveIntegerField(default=0)
     
     # JSON field for field-specific configuration (options for dropdowns, validation rules, etc.)
-    configuration = models.JSONField(default=dict, help_text="Field-specific configuration like options, validation rules")
+    configuration = FastJSONField(default=dict, help_text="Field-specific configuration like options, validation rules")
     
     # Conditional logic - allows fields to show/hide based on other field values
-    conditional_logic = models.JSONField(default=dict, blank=True, help_text="Rules for when this field should be visible")
+    conditional_logic = FastJSONField(default=dict, blank=True, help_text="Rules for when this field should be visible")
     
     class Meta:
         ordering = ['order', 'id']
@@ -70,6 +120,48 @@ class FormField(models.Model):
         return f"{self.form_template.name} - {self.label}"
 
 
+class FormDataSchema(models.Model):
+    """
+    A template's field names in order at one point in time. Compactly
+    stored form_data refers to one of these by id (see formdata.py); rows
+    are never changed, a new field list records a new version.
+    """
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='data_schemas')
+    version = models.PositiveIntegerField()
+    digest = models.CharField(max_length=64, help_text="SHA-256 of the field names")
+    field_names = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['form_template', 'version']
+        constraints = [
+            models.UniqueConstraint(fields=['form_template', 'version'], name='unique_schema_version'),
+            models.UniqueConstraint(fields=['form_template', 'digest'], name='unique_schema_digest'),
+        ]
+
+    def __str__(self):
+        return f"{self.form_template.name} v{self.version}"
+
+
+class FormTemplateSnapshot(models.Model):
+    """
+    A template frozen as submitted against: its fields, validation rules and
+    conditional logic, identified by the SHA-256 of that definition. Rows
+    are never changed; changing the template records a new snapshot the
+    next time it's published or submitted (see snapshots.py).
+    """
+    content_hash = models.CharField(max_length=64, unique=True)
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='snapshots')
+    definition = FastJSONField(help_text="Template and fields as serialized when the snapshot was taken")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.form_template.name} @ {self.content_hash[:12]}"
+
+
 class FormSubmission(models.Model):
     """
     Represents a client's submission of a form.
@@ -77,12 +169,20 @@ class FormSubmission(models.Model):
     """
     form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='submissions')
     submitted_by = models.CharField(max_length=200, blank=True)  # Client name/email
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(auto_now_add=True, db_index=True)
     is_processed = models.BooleanField(default=False)
     processed_at = models.DateTimeField(null=True, blank=True)
     
     # JSON field to store all form data - flexible for any form structure
-    form_data = models.JSONField(default=dict, help_text="All form submission data")
+    form_data = FormDataField(default=dict, help_text="All form submission data")
+    
+    # The template as it was when submitted; null for submissions older than snapshots
+    snapshot = models.ForeignKey(FormTemplateSnapshot, to_field='content_hash', on_delete=models.RESTRICT,
+                                 null=True, blank=True, related_name='submissions')
+    
+    # Result of the last processing pipeline run: stage statuses, timings and outputs
+    processing_report = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder,
+                                         help_text="Per-stage results and timings of the processing pipeline")
     
     class Meta:
         ordering = ['-submitted_at']
@@ -91,6 +191,34 @@ class FormSubmission(models.Model):
         return f"{self.form_template.name} - {self.submitted_by} - {self.submitted_at}"
 
 
+class SubmissionEvent(models.Model):
+    """
+    Append-only log of changes to submissions, read by downstream systems
+    through the changes feed (see events.py). The id is the feed's sequence
+    number. Submissions and templates aren't foreign-key constrained so the
+    log outlives them.
+    """
+    KINDS = [
+        ('created', 'Created'),
+        ('processed', 'Processed'),
+        ('files_attached', 'Files attached'),
+    ]
+
+    submission = models.ForeignKey(FormSubmission, on_delete=models.DO_NOTHING, db_constraint=False,
+                                   related_name='events')
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.DO_NOTHING, db_constraint=False,
+                                      related_name='+')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    data = FastJSONField(default=dict, blank=True, help_text="What changed, e.g. the ids of attached files")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} submission {self.submission_id}"
+
+
 class FormFile(models.Model):
     """
     Stores uploaded files associated with form submissions.
@@ -105,6 +233,20 @@ class FormFile(models.Model):
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Content hash, used as the download ETag")
+    
+    # Derivatives generated in the background so list views don't download originals
+    DERIVATIVE_STATUSES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('unsupported', 'Unsupported'),
+        ('failed', 'Failed'),
+    ]
+    thumbnail = models.ImageField(upload_to='form_derivatives/%Y/%m/%d/', blank=True)
+    preview = models.ImageField(upload_to='form_derivatives/%Y/%m/%d/', blank=True)
+    extracted_text = models.TextField(blank=True, help_text="Text extracted from the document for search")
+    metadata = FastJSONField(default=dict, blank=True, help_text="Document metadata such as page count and dimensions")
+    derivatives_status = models.CharField(max_length=20, choices=DERIVATIVE_STATUSES, default='pending')
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -129,7 +271,7 @@ class NotificationLog(models.Model):
     sent_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     retry_count = models.PositiveIntegerField(default=0)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     class Meta:
         ordering = ['-created_at']
@@ -157,4 +299,103 @@ class FormValidationRule(models.Model):
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
-        return f"{self.field.label} - {self.rule_type}"
\ No newline at end of file
+        return f"{self.field.label} - {self.rule_type}"
+
+class RequestProfile(models.Model):
+    """
+    A cProfile capture of a single request, taken on demand (staff
+    `X-Profile` header) or by sampling. `stats` holds the marshalled pstats
+    data, the same format as a `.prof` file.
+    """
+    TRIGGERS = [
+        ('header', 'Requested by header'),
+        ('sampled', 'Sampled'),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    query_time_ms = models.FloatField(default=0)
+    trigger = models.CharField(max_length=10, choices=TRIGGERS)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    summary = models.TextField(blank=True, help_text="Top functions by cumulative time")
+    stats = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The outcome of a request sent with an `Idempotency-Key` header, replayed
+    to retries of that request until `expires_at`. While the first request
+    is still running `status_code` is null and the row doubles as a lock
+    held until `locked_until` (see idempotency.py).
+    """
+    scope = models.CharField(max_length=200, help_text="Endpoint and owner the key belongs to")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
+class FormDraft(models.Model):
+    """
+    A submission in progress. Clients autosave by sending JSON merge patches
+    of the keys that changed, upload files as they go, and finalize the
+    draft into a FormSubmission once (see drafts.py). The UUID is the only
+    credential for a draft, so drafts are never listed.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='drafts')
+    submitted_by = models.CharField(max_length=200, blank=True)
+    form_data = FastJSONField(default=dict, blank=True, help_text="Answers saved so far")
+    version = models.PositiveIntegerField(default=1, help_text="Incremented by every saved change")
+    submission = models.OneToOneField(FormSubmission, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='draft', help_text="Set once the draft is finalized")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Draft of {self.form_template.name} ({self.id})"
+
+
+class FormDraftFile(models.Model):
+    """
+    A file uploaded to a draft. Finalizing the draft turns it into a
+    FormFile pointing at the same stored file, so nothing is uploaded twice.
+    """
+    draft = models.ForeignKey(FormDraft, on_delete=models.CASCADE, related_name='files')
+    field_name = models.CharField(max_length=100)
+    file = models.FileField(
+        upload_to='form_uploads/%Y/%m/%d/',
+        validators=[FileExtensionValidator(allowed_extensions=['pdf', 'doc', 'docx', 'jpg', 'jpeg', 'png', 'txt'])]
+    )
+    original_filename = models.CharField(max_length=255)
+    file_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['uploaded_at']
+
+    def __str__(self):
+        return f"{self.draft_id} - {self.original_filename}"
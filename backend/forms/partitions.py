@@ -0,0 +1,257 @@
+"""
+Monthly partitions of submissions and notification logs (PostgreSQL).
+
+Submissions and notification logs are appended to and read mostly by
+recency. With FORMS_PARTITIONING_ENABLED, `manage.py partitions --convert`
+turns forms_formsubmission (by submitted_at) and forms_notificationlog (by
+created_at) into range-partitioned tables with one partition per month:
+
+- The existing table becomes the first partition, holding everything before
+  next month, so converting copies no rows; it reads the table once to
+  check the range, under an exclusive lock.
+- Queries bounded by submitted_at / created_at (date filters, the admin
+  date drilldown) only read the partitions in range.
+- maintain_partitions creates partitions FORMS_PARTITION_MONTHS_AHEAD months
+  ahead, and detaches submission partitions older than
+  FORMS_SUBMISSION_RETENTION_MONTHS when that is set. Detached partitions
+  stay as plain tables to archive: their files and notification logs still
+  point at them. cleanup_old_notifications drops whole log partitions past
+  FORMS_NOTIFICATION_RETENTION_DAYS instead of deleting their rows.
+
+PostgreSQL can't enforce a foreign key to a partitioned table whose primary
+key (id, submitted_at) includes the partition key, so converting drops the
+database constraints of foreign keys to submissions; Django still cascades
+deletes itself. A lookup by id alone probes each partition's index.
+
+On other databases nothing is partitioned and retention deletes in batches,
+each in its own short transaction. SQLite can't route rows to per-period
+tables behind one table name while files and notification logs keep
+foreign keys to submissions.
+"""
+import logging
+import re
+from collections import namedtuple
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import FormSubmission, NotificationLog
+
+logger = logging.getLogger(__name__)
+
+# Converted in this order: logs reference submissions
+TABLES = ((FormSubmission, 'submitted_at'), (NotificationLog, 'created_at'))
+
+# A partition and the exclusive upper bound of its range; None for the
+# default partition, which catches rows no monthly partition covers
+Partition = namedtuple('Partition', 'name upper')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def supported():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(value):
+    """The first instant (UTC) of the month `value` falls in."""
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def upcoming_months(now, ahead):
+    """Starts of the month of `now` and of the `ahead` months after it."""
+    first = month_start(now)
+    return [add_months(first, count) for count in range(ahead + 1)]
+
+
+def expired(partitions, cutoff):
+    """The partitions holding only rows older than `cutoff`."""
+    return [partition for partition in partitions if partition.upper is not None and partition.upper <= cutoff]
+
+
+def upper_bound(bound):
+    """The upper bound of a pg_get_expr(relpartbound) expression; None for DEFAULT or MAXVALUE."""
+    match = re.search(r"TO \('([^']+)'\)", bound)
+    return parse_datetime(match.group(1)) if match else None
+
+
+def is_partitioned(table):
+    if not supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [table])
+        return cursor.fetchone() is not None
+
+
+def partitions(table):
+    """The partitions of `table`, oldest first, default last."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)',
+            [table]
+        )
+        found = [Partition(name, upper_bound(bound)) for name, bound in cursor.fetchall()]
+    return sorted(found, key=lambda partition: (partition.upper is None, partition.upper))
+
+
+def create_partition(table, month):
+    """Create the partition of `table` for `month`; False if it already exists or can't be created."""
+    name = partition_name(table, month)
+    if name in {partition.name for partition in partitions(table)}:
+        return False
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {_quote(name)} PARTITION OF {_quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)]
+            )
+    except DatabaseError as exc:
+        # The default partition already holds rows of that month
+        logger.warning(f"Could not create partition {name}: {exc}")
+        return False
+    return True
+
+
+def convert(model, column, ahead):
+    """Turn `model`'s table into a table partitioned by month on `column`."""
+    table = model._meta.db_table
+    legacy = f'{table}_p_legacy'
+    sequence = f'{table}_partitioned_id_seq'
+    boundary = add_months(month_start(timezone.now()), 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {_quote(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE contype = 'f' AND confrelid = to_regclass(%s)",
+            [table]
+        )
+        for referencing, constraint in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {_quote(constraint)}')
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {_quote(table)}')
+        next_id = cursor.fetchone()[0] + 1
+
+        # A partition can't have an identity of its own; the parent gets a sequence
+        cursor.execute(f'ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}')
+        cursor.execute(f'ALTER TABLE {_quote(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {_quote(legacy)} ALTER COLUMN id DROP DEFAULT')
+        cursor.execute(
+            f'CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} INCLUDING DEFAULTS INCLUDING STORAGE) '
+            f'PARTITION BY RANGE ({_quote(column)})'
+        )
+        cursor.execute(f'CREATE SEQUENCE {_quote(sequence)} OWNED BY {_quote(table)}.id START WITH {next_id}')
+        cursor.execute(f"ALTER TABLE {_quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f'ALTER TABLE {_quote(table)} ADD PRIMARY KEY (id, {_quote(column)})')
+
+        # The validated CHECK lets ATTACH skip its own scan of the table
+        check = f'{legacy}_range'
+        cursor.execute(
+            f'ALTER TABLE {_quote(legacy)} ADD CONSTRAINT {_quote(check)} '
+            f'CHECK ({_quote(column)} IS NOT NULL AND {_quote(column)} < %s)',
+            [boundary]
+        )
+        cursor.execute(
+            f'ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(legacy)} FOR VALUES FROM (MINVALUE) TO (%s)',
+            [boundary]
+        )
+        cursor.execute(f'ALTER TABLE {_quote(legacy)} DROP CONSTRAINT {_quote(check)}')
+
+        # Indexes and foreign keys on the parent; the legacy partition's
+        # matching ones are attached rather than built again
+        for field in model._meta.local_fields:
+            if field.primary_key:
+                continue
+            if field.db_index:
+                cursor.execute(
+                    f'CREATE INDEX {_quote(f"{table}_{field.column}_idx")} ON {_quote(table)} ({_quote(field.column)})'
+                )
+            if field.remote_field and field.db_constraint and not is_partitioned(field.related_model._meta.db_table):
+                target = field.target_field
+                cursor.execute(
+                    f'ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(f"{table}_{field.column}_fk")} '
+                    f'FOREIGN KEY ({_quote(field.column)}) '
+                    f'REFERENCES {_quote(target.model._meta.db_table)} ({_quote(target.column)}) '
+                    f'DEFERRABLE INITIALLY DEFERRED'
+                )
+
+        for count in range(ahead + 1):
+            month = add_months(boundary, count)
+            cursor.execute(
+                f'CREATE TABLE {_quote(partition_name(table, month))} PARTITION OF {_quote(table)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)]
+            )
+        cursor.execute(f'CREATE TABLE {_quote(f"{table}_default")} PARTITION OF {_quote(table)} DEFAULT')
+    logger.info(f"Partitioned {table} by month on {column}")
+
+
+def maintain(now=None):
+    """
+    Create the coming months' partitions and detach expired submission
+    partitions. Returns a line per change made.
+    """
+    now = now or timezone.now()
+    changes = []
+    for model, column in TABLES:
+        table = model._meta.db_table
+        if not is_partitioned(table):
+            continue
+        for month in upcoming_months(now, _setting('FORMS_PARTITION_MONTHS_AHEAD', 3)):
+            if create_partition(table, month):
+                changes.append(f'created {partition_name(table, month)}')
+
+    months = _setting('FORMS_SUBMISSION_RETENTION_MONTHS', None)
+    table = FormSubmission._meta.db_table
+    if months and is_partitioned(table):
+        cutoff = add_months(month_start(now), -months)
+        for partition in expired(partitions(table), cutoff):
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(partition.name)}')
+            changes.append(f'detached {partition.name}')
+    for change in changes:
+        logger.info(f"Partition maintenance: {change}")
+    return changes
+
+
+def drop_before(model, cutoff):
+    """Drop the partitions of `model`'s table holding only rows older than `cutoff`; returns their names."""
+    table = model._meta.db_table
+    if not is_partitioned(table):
+        return []
+    dropped = []
+    for partition in expired(partitions(table), cutoff):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {_quote(partition.name)}')
+        dropped.append(partition.name)
+    return dropped
+
+
+def delete_in_batches(queryset, batch_size=None):
+    """Delete `queryset` a batch of rows per transaction; returns the number deleted."""
+    batch_size = batch_size or _setting('FORMS_RETENTION_DELETE_BATCH', 5_000)
+    model = queryset.model
+    deleted = 0
+    while True:
+        batch = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=batch).delete()[0]
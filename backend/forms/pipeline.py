@@ -0,0 +1,282 @@
+"""
+Submission processing pipeline.
+
+A pipeline is a set of named stages (validation, enrichment, document checks,
+export hooks, ...) that run against a single FormSubmission. Stages declare the
+stages they depend on; stages whose dependencies are satisfied run together in
+a thread pool, so slow I/O-bound stages (export hooks calling other systems)
+don't serialize behind each other.
+
+Stages never touch the database. Everything they need (the submission data,
+template fields with their rules, uploaded files) is loaded once up front into
+a StageContext, which keeps the worker threads free of per-thread connections.
+Fields come from the template snapshot the submission was made against, so
+reprocessing an old submission checks it against the fields it answered.
+"""
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import metrics, snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class StageError(Exception):
+    """
+    Raised by a stage to report an expected failure (e.g. invalid data).
+    The message and optional details are recorded in the processing report.
+    """
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+
+class Stage:
+    """
+    A single unit of work in the submission pipeline.
+    """
+
+    def __init__(self, name, func, depends_on=(), templates=None, memoize=True, version=1):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        # None means the stage applies to every template; otherwise a set of
+        # template ids and/or names the stage is registered for.
+        self.templates = set(templates) if templates is not None else None
+        self.memoize = memoize
+        self.version = version
+
+    def applies_to(self, form_template):
+        if self.templates is None:
+            return True
+        return form_template.id in self.templates or form_template.name in self.templates
+
+    def __repr__(self):
+        return f"<Stage {self.name}>"
+
+
+class PipelineRegistry:
+    """
+    Registry of pipeline stages.
+    Stages are registered globally and selected per template, either by the
+    `templates` argument at registration time or by listing stage names in the
+    template's `configuration['pipeline']`.
+    """
+
+    def __init__(self):
+        self._stages = {}
+
+    def register(self, name=None, depends_on=(), templates=None, memoize=True, version=1):
+        """Decorator registering a stage function."""
+        def decorator(func):
+            stage_name = name or func.__name__
+            self._stages[stage_name] = Stage(
+                stage_name, func,
+                depends_on=depends_on,
+                templates=templates,
+                memoize=memoize,
+                version=version,
+            )
+            return func
+        return decorator
+
+    def unregister(self, name):
+        self._stages.pop(name, None)
+
+    def get(self, name):
+        return self._stages[name]
+
+    def __contains__(self, name):
+        return name in self._stages
+
+    def stages_for(self, form_template):
+        """Return the stages that apply to a template, dependencies included."""
+        configured = (form_template.configuration or {}).get('pipeline')
+        if configured is not None:
+            wanted = [name for name in configured if name in self._stages]
+        else:
+            wanted = [
+                name for name, stage in self._stages.items()
+                if stage.applies_to(form_template)
+            ]
+
+        selected = {}
+        pending = list(wanted)
+        while pending:
+            name = pending.pop()
+            if name in selected:
+                continue
+            if name not in self._stages:
+                raise KeyError(f"Unknown pipeline stage: {name}")
+            stage = self._stages[name]
+            selected[name] = stage
+            pending.extend(stage.depends_on)
+        return list(selected.values())
+
+
+registry = PipelineRegistry()
+register_stage = registry.register
+
+
+class StageContext:
+    """
+    Read-only view of a submission handed to each stage.
+    """
+
+    def __init__(self, submission, form_template, fields, files):
+        self.submission_id = submission.id
+        self.submitted_by = submission.submitted_by
+        self.form_data = submission.form_data or {}
+        self.form_template = form_template
+        self.snapshot_id = getattr(submission, 'snapshot_id', None)
+        self.fields = fields
+        self.files = files
+        self.results = {}
+
+    @classmethod
+    def for_submission(cls, submission):
+        form_template = submission.form_template
+        # The fields the submission was answered with; live ones for older submissions
+        snapshot = snapshots.get(submission.snapshot_id)
+        if snapshot is not None:
+            fields = snapshot.fields
+        else:
+            fields = list(form_template.fields.prefetch_related('validation_rules'))
+        files = list(submission.files.all())
+        return cls(submission, form_template, fields, files)
+
+    def result(self, stage_name):
+        """Output of a stage this stage depends on."""
+        return self.results[stage_name]
+
+    def fingerprint(self):
+        """Stable hash of everything the stages see, used for memoization."""
+        payload = {
+            'template': self.form_template.id,
+            'template_updated': self.snapshot_id or self.form_template.updated_at,
+            'form_data': self.form_data,
+            'files': [(f.id, f.file.name, f.file_size) for f in self.files],
+        }
+        encoded = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def topological_levels(stages):
+    """
+    Group stages into levels; every stage in a level only depends on stages
+    in earlier levels, so a whole level can run concurrently.
+    """
+    remaining = {stage.name: stage for stage in stages}
+    done = set()
+    levels = []
+    while remaining:
+        level = [
+            stage for stage in remaining.values()
+            if all(dep in done for dep in stage.depends_on)
+        ]
+        if not level:
+            raise ValueError(
+                f"Cyclic pipeline stage dependencies: {sorted(remaining)}"
+            )
+        level.sort(key=lambda stage: stage.name)
+        levels.append(level)
+        for stage in level:
+            done.add(stage.name)
+            del remaining[stage.name]
+    return levels
+
+
+def _memo_key(stage, fingerprint):
+    return f"forms:pipeline:{stage.name}:v{stage.version}:{fingerprint}"
+
+
+def _run_stage(stage, context, fingerprint):
+    started = time.perf_counter()
+    entry = {'status': 'ok', 'cached': False}
+
+    key = _memo_key(stage, fingerprint) if stage.memoize else None
+    cached = cache.get(key) if key else None
+    if key:
+        metrics.record_cache('pipeline', cached is not None)
+    if cached is not None:
+        entry['cached'] = True
+        output = cached
+    else:
+        try:
+            output = stage.func(context)
+        except StageError as exc:
+            entry['status'] = 'failed'
+            entry['error'] = str(exc)
+            if exc.details is not None:
+                entry['details'] = exc.details
+            output = None
+        except Exception as exc:
+            logger.exception(f"Pipeline stage {stage.name} crashed for submission {context.submission_id}")
+            entry['status'] = 'error'
+            entry['error'] = str(exc)
+            output = None
+        else:
+            if key:
+                cache.set(key, output, getattr(settings, 'FORMS_PIPELINE_MEMO_TIMEOUT', 60 * 60))
+
+    entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return output, entry
+
+
+def run_pipeline(submission, max_workers=None):
+    """
+    Run every stage registered for the submission's template.
+    Returns the processing report (stage statuses, timings and outputs).
+    """
+    started_at = timezone.now()
+    started = time.perf_counter()
+
+    context = StageContext.for_submission(submission)
+    stages = registry.stages_for(context.form_template)
+    levels = topological_levels(stages)
+    fingerprint = context.fingerprint()
+    max_workers = max_workers or getattr(settings, 'FORMS_PIPELINE_MAX_WORKERS', 4)
+
+    report_stages = {}
+    outputs = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forms-pipeline') as pool:
+        for level in levels:
+            futures = {}
+            for stage in level:
+                failed_deps = [
+                    dep for dep in stage.depends_on
+                    if report_stages[dep]['status'] != 'ok'
+                ]
+                if failed_deps:
+                    report_stages[stage.name] = {
+                        'status': 'skipped',
+                        'cached': False,
+                        'duration_ms': 0.0,
+                        'error': f"Dependencies failed: {', '.join(failed_deps)}",
+                    }
+                    continue
+                futures[stage.name] = pool.submit(_run_stage, stage, context, fingerprint)
+
+            for name, future in futures.items():
+                output, entry = future.result()
+                report_stages[name] = entry
+                if entry['status'] == 'ok':
+                    context.results[name] = output
+                    outputs[name] = output
+
+    return {
+        'started_at': started_at.isoformat(),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+        'succeeded': all(entry['status'] == 'ok' for entry in report_stages.values()),
+        'stages': report_stages,
+        'outputs': outputs,
+    }
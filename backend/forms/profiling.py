@@ -0,0 +1,89 @@
+"""
+On-demand request profiling.
+
+A request is profiled when a staff user sends `X-Profile: 1`, or when it
+matches FORMS_PROFILE_SAMPLE_PATHS and wins the FORMS_PROFILE_SAMPLE_RATE
+draw. The whole view runs under cProfile (serializers, ORM and database
+driver calls included) and the result is stored as a RequestProfile that can
+be downloaded from the admin as a `.prof` file (snakeviz, `python -m pstats`).
+"""
+import cProfile
+import io
+import marshal
+import pstats
+
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .authentication import CachedJWTAuthentication
+from .models import RequestProfile
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+SUMMARY_LINES = 40
+
+
+def requesting_staff_user(request):
+    """
+    The staff user behind a request, or None.
+    Session users are already on the request; API clients send a JWT, which
+    is only decoded here because the profile header is present.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken, TokenError):
+            return None
+        user = result[0] if result else None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+class Profile:
+    """A running cProfile session for one request."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+
+    def stats(self):
+        return pstats.Stats(self.profiler)
+
+    def summary(self, stats):
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        return stream.getvalue()
+
+    def save(self, request, response, trigger, user, duration, queries):
+        """Store the profile and prune old ones beyond FORMS_PROFILE_KEEP."""
+        stats = self.stats()
+        match = getattr(request, 'resolver_match', None)
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view_name=(match.view_name or '') if match else '',
+            status_code=response.status_code,
+            duration_ms=round(duration * 1000, 2),
+            query_count=queries.count,
+            query_time_ms=round(queries.duration * 1000, 2),
+            trigger=trigger,
+            user=user,
+            summary=self.summary(stats),
+            # Same layout as pstats.Stats.dump_stats() writes
+            stats=marshal.dumps(stats.stats),
+        )
+
+        keep = getattr(settings, 'FORMS_PROFILE_KEEP', 200)
+        stale = RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1]
+        if stale:
+            RequestProfile.objects.filter(id__lte=stale[0]).delete()
+        return profile
@@ -0,0 +1,276 @@
+"""
+Live push of submission events to open admin views.
+
+Instead of polling the submission list, the admin UI keeps one request open
+on
+
+    GET /api/submissions/stream/
+
+and receives server-sent events as submissions are created and processed:
+
+    id: 1043
+    event: created
+    data: {"seq":1043,"type":"created","submission":88,"form_template":3}
+
+Events are published once per committed transaction (events.record) and
+fanned out in memory to every open stream of the process, so an open tab
+costs no database queries while it waits. The frame of an event is built
+once per process, whatever the number of subscribers.
+
+With FORMS_PUBSUB_REDIS_URL set, events go through a Redis channel and each
+web process runs one listener thread that fans them out locally; that is
+how `processed` events recorded by Celery workers reach the browser. Without
+Redis, or while it is unreachable, events only reach streams served by the
+process that recorded them.
+
+A reconnecting client sends Last-Event-ID (EventSource does this itself)
+and gets what it missed from the SubmissionEvent log before the live
+events. If that is more than FORMS_STREAM_BACKFILL events, or the log no
+longer has them, it gets a `resync` event and should reload the list. A
+client reading too slowly to keep up is disconnected the same way.
+
+Under WSGI each open stream holds a worker thread, so streams end after
+FORMS_STREAM_MAX_SECONDS and the client reconnects; serve the app through
+the ASGI entry point (onboarding_system/asgi.py) for many open tabs.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+
+from . import fastjson
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'forms:submission-events'
+REDIS_TIMEOUT = 0.1  # seconds; publishing must not hold up the request that commits
+REDIS_RETRY_INTERVAL = 30  # seconds on the in-memory fallback before trying Redis again
+RETRY_FRAME = b'retry: 3000\n\n'
+HEARTBEAT_FRAME = b': keepalive\n\n'
+RESYNC_FRAME = b'event: resync\ndata: {}\n\n'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def message(seq, kind, submission_id, form_template_id):
+    """The compact form of an event pushed to streams."""
+    return {'seq': seq, 'type': kind, 'submission': submission_id, 'form_template': form_template_id}
+
+
+def frame(message):
+    """A server-sent event frame for `message`."""
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (
+        message['seq'], message['type'].encode(), fastjson.dumps(message)
+    )
+
+
+class Subscription:
+    """Frames waiting for one open stream; read from a thread or an event loop."""
+
+    def __init__(self, broker, max_pending):
+        self.broker = broker
+        self.messages = queue.Queue(max_pending)
+        self.overflowed = False
+        self.wakeup = None  # (loop, asyncio.Event) of a reader waiting in aget
+
+    def deliver(self, item):
+        try:
+            self.messages.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+        wakeup = self.wakeup
+        if wakeup is not None:
+            loop, ready = wakeup
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:  # the loop is closed; the stream is gone
+                pass
+
+    def get(self, timeout):
+        """The next (seq, frame), or None after `timeout` seconds."""
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        """`get` without blocking the event loop."""
+        ready = asyncio.Event()
+        self.wakeup = (asyncio.get_running_loop(), ready)
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    return self.messages.get_nowait()
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+                ready.clear()
+        finally:
+            self.wakeup = None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Fans published events out to this process's subscriptions, through Redis when configured."""
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+        self.url = _setting('FORMS_PUBSUB_REDIS_URL', '') if redis is not None else ''
+        self.redis = (
+            redis.Redis.from_url(self.url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+            if self.url else None
+        )
+        self.redis_down_until = 0.0
+        self.listener = None
+
+    def subscribe(self):
+        subscription = Subscription(self, _setting('FORMS_STREAM_MAX_PENDING', 1000))
+        with self.lock:
+            self.subscriptions.add(subscription)
+            if self.redis is not None and self.listener is None:
+                self.listener = threading.Thread(target=self._listen, name='forms-pubsub', daemon=True)
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, messages):
+        """Send committed events to every process's streams."""
+        payload = fastjson.dumps(messages)
+        if self.redis is not None and time.monotonic() >= self.redis_down_until:
+            try:
+                self.redis.publish(CHANNEL, payload)
+                return
+            except redis.RedisError as exc:
+                logger.warning(f"Event push falling back to this process for {REDIS_RETRY_INTERVAL}s: {exc}")
+                self.redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        self.fan_out(payload)
+
+    def fan_out(self, payload):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        if not subscriptions:
+            return
+        items = [(message['seq'], frame(message)) for message in fastjson.loads(payload)]
+        for subscription in subscriptions:
+            for item in items:
+                subscription.deliver(item)
+
+    def _listen(self):
+        # A connection of its own without a read timeout: it waits for messages
+        client = redis.Redis.from_url(self.url, socket_connect_timeout=REDIS_TIMEOUT, health_check_interval=30)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for received in pubsub.listen():
+                    self.fan_out(received['data'])
+            except redis.RedisError as exc:
+                logger.warning(f"Event push listener reconnecting in {REDIS_RETRY_INTERVAL}s: {exc}")
+                time.sleep(REDIS_RETRY_INTERVAL)
+
+
+def _stream_settings():
+    return _setting('FORMS_STREAM_HEARTBEAT', 15), _setting('FORMS_STREAM_MAX_SECONDS', 300)
+
+
+def frames(subscription, backlog, since):
+    """Frames of a stream served by a worker thread (WSGI)."""
+    heartbeat, max_seconds = _stream_settings()
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield RETRY_FRAME
+        yield from backlog
+        while not subscription.overflowed and time.monotonic() < deadline:
+            item = subscription.get(min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if item is None:
+                yield HEARTBEAT_FRAME
+            elif item[0] > since:  # skip what the backlog already sent
+                yield item[1]
+        if subscription.overflowed:
+            yield RESYNC_FRAME
+    finally:
+        subscription.close()
+
+
+class _AsyncFrames:
+    """
+    An async generator with a `close` for the response to call: when the
+    client disconnects, the ASGI handler cancels the stream without closing
+    the generator.
+    """
+
+    def __init__(self, subscription, frames):
+        self.subscription = subscription
+        self.frames = frames
+
+    def __aiter__(self):
+        return self.frames
+
+    def close(self):
+        self.subscription.close()
+
+
+def aframes(subscription, backlog, since):
+    """Frames of a stream served on the event loop (ASGI)."""
+    return _AsyncFrames(subscription, _aframes(subscription, backlog, since))
+
+
+async def _aframes(subscription, backlog, since):
+    heartbeat, max_seconds = _stream_settings()
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield RETRY_FRAME
+        for item in backlog:
+            yield item
+        while not subscription.overflowed and time.monotonic() < deadline:
+            item = await subscription.aget(min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if item is None:
+                yield HEARTBEAT_FRAME
+            elif item[0] > since:
+                yield item[1]
+        if subscription.overflowed:
+            yield RESYNC_FRAME
+    finally:
+        subscription.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = Broker()
+    return _broker
+
+
+def reset():
+    """Drop the broker and its subscriptions and re-read the settings (tests)."""
+    global _broker
+    _broker = None
@@ -1,6 +1,61 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import FormTemplate, FormField, FormSubmission, FormFile, NotificationLog, FormValidationRule
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import (
+    FormTemplate, FormField, FormSubmission, FormFile, NotificationLog, FormValidationRule,
+    FormDraft, FormDraftFile
+)
+from .file_serving import compute_sha256
+from . import events, snapshots
+
+
+def query_param_set(request, name):
+    """Comma separated query parameter as a set of names."""
+    if request is None:
+        return set()
+    return {value.strip() for value in request.query_params.get(name, '').split(',') if value.strip()}
+
+
+def count_subquery(model, fk):
+    """Correlated COUNT of `model` rows pointing at the outer row through `fk`."""
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+class SparseFieldsetsMixin:
+    """
+    Let clients shape responses with query parameters:
+    `?fields=id,name` keeps only the listed fields, and `?expand=a,b` adds
+    fields from `expandable_fields`, which are left out unless asked for.
+    Only applies to the top-level serializer of a read request.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        only = query_param_set(request, 'fields')
+        expand = self.expanded_fields(request)
+        for name in expand:
+            self.fields[name] = self.expandable_fields[name]()
+        if only:
+            for name in set(self.fields) - only:
+                self.fields.pop(name)
+
+    @classmethod
+    def expanded_fields(cls, request):
+        """Expandable fields requested through `expand` (or named in `fields`)."""
+        requested = query_param_set(request, 'expand') | query_param_set(request, 'fields')
+        return [name for name in cls.expandable_fields if name in requested]
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -28,7 +83,7 @@ class FormFieldSerializer(serializers.ModelSerializer):
         ]
 
 
-class FormTemplateSerializer(serializers.ModelSerializer):
+class FormTemplateSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     fields = FormFieldSerializer(many=True, read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     submission_count = serializers.SerializerMethodField()
@@ -43,27 +98,124 @@ class FormTemplateSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_by', 'created_at', 'updated_at']
     
     def get_submission_count(self, obj):
-        return obj.submissions.count()
+        # Querysets from the viewsets annotate the count
+        count = getattr(obj, 'submission_count', None)
+        return obj.submissions.count() if count is None else count
+
+
+class FormTemplateSummarySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Compact template representation for list endpoints: no nested fields
+    tree, just counts. `?expand=fields,configuration` restores the rest.
+    """
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    field_count = serializers.IntegerField(read_only=True)
+    submission_count = serializers.IntegerField(read_only=True)
+    expandable_fields = {
+        'configuration': lambda: serializers.JSONField(read_only=True),
+        'fields': lambda: FormFieldSerializer(many=True, read_only=True),
+    }
+
+    class Meta:
+        model = FormTemplate
+        fields = [
+            'id', 'name', 'description', 'is_active', 'created_by', 'created_by_name',
+            'created_at', 'updated_at', 'field_count', 'submission_count'
+        ]
+        read_only_fields = fields
+
+    @classmethod
+    def prepare_queryset(cls, queryset, request):
+        queryset = queryset.select_related('created_by').annotate(
+            field_count=count_subquery(FormField, 'form_template'),
+            submission_count=count_subquery(FormSubmission, 'form_template'),
+        )
+        if 'fields' in cls.expanded_fields(request):
+            queryset = queryset.prefetch_related('fields__validation_rules')
+        return queryset
+
+
+class SnapshotDefinitionField(serializers.Field):
+    """The definition of a submission's template snapshot, from the snapshot cache."""
+
+    def __init__(self, **kwargs):
+        super().__init__(source='snapshot_id', read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        snapshot = snapshots.get(value)
+        return snapshot.definition if snapshot is not None else None
 
 
 class FormFileSerializer(serializers.ModelSerializer):
+    # Small derivatives for list views and previews; null until generated
+    thumbnail = serializers.ImageField(read_only=True)
+    preview = serializers.ImageField(read_only=True)
+    
     class Meta:
         model = FormFile
-        fields = ['id', 'field_name', 'file', 'original_filename', 'file_size', 'uploaded_at']
-        read_only_fields = ['original_filename', 'file_size', 'uploaded_at']
+        fields = [
+            'id', 'field_name', 'file', 'original_filename', 'file_size', 'uploaded_at',
+            'thumbnail', 'preview', 'metadata', 'derivatives_status'
+        ]
+        read_only_fields = ['original_filename', 'file_size', 'uploaded_at', 'metadata', 'derivatives_status']
 
 
-class FormSubmissionSerializer(serializers.ModelSerializer):
+class FormSubmissionSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     files = FormFileSerializer(many=True, read_only=True)
     form_template_name = serializers.CharField(source='form_template.name', read_only=True)
+    snapshot = serializers.CharField(source='snapshot_id', read_only=True)
+    # The fields the submission was answered with, whatever the template looks like now
+    expandable_fields = {
+        'template_snapshot': SnapshotDefinitionField,
+    }
     
     class Meta:
         model = FormSubmission
         fields = [
             'id', 'form_template', 'form_template_name', 'submitted_by', 
-            'submitted_at', 'is_processed', 'processed_at', 'form_data', 'files'
+            'submitted_at', 'is_processed', 'processed_at', 'form_data', 'files',
+            'processing_report', 'snapshot'
+        ]
+        read_only_fields = ['submitted_at', 'is_processed', 'processed_at', 'processing_report']
+
+
+class FormSubmissionSummarySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Compact submission representation for list endpoints, without form_data
+    or files; `?expand=form_data,files,processing_report,template_snapshot`
+    adds them back.
+    """
+    form_template_name = serializers.CharField(source='form_template.name', read_only=True)
+    file_count = serializers.IntegerField(read_only=True)
+    snapshot = serializers.CharField(source='snapshot_id', read_only=True)
+    expandable_fields = {
+        'form_data': lambda: serializers.JSONField(read_only=True),
+        'files': lambda: FormFileSerializer(many=True, read_only=True),
+        'processing_report': lambda: serializers.JSONField(read_only=True),
+        'template_snapshot': SnapshotDefinitionField,
+    }
+
+    class Meta:
+        model = FormSubmission
+        fields = [
+            'id', 'form_template', 'form_template_name', 'submitted_by',
+            'submitted_at', 'is_processed', 'processed_at', 'file_count', 'snapshot'
         ]
-        read_only_fields = ['submitted_at', 'is_processed', 'processed_at']
+        read_only_fields = fields
+
+    @classmethod
+    def prepare_queryset(cls, queryset, request):
+        expand = cls.expanded_fields(request)
+        # Leave the large JSON columns in the database unless they're wanted
+        deferred = [name for name in ('form_data', 'processing_report') if name not in expand]
+        queryset = (
+            queryset.select_related('form_template')
+            .defer(*deferred, 'form_template__description', 'form_template__configuration')
+            .annotate(file_count=count_subquery(FormFile, 'submission'))
+        )
+        if 'files' in expand:
+            queryset = queryset.prefetch_related('files')
+        return queryset
 
 
 class FormSubmissionCreateSerializer(serializers.ModelSerializer):
@@ -79,21 +231,47 @@ class FormSubmissionCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         files_data = validated_data.pop('files', [])
+        validated_data['snapshot_id'] = snapshots.current_hash(validated_data['form_template'])
         submission = FormSubmission.objects.create(**validated_data)
         
         # Handle file uploads
-        for file_data in files_data:
+        form_files = [
             FormFile.objects.create(
                 submission=submission,
                 field_name=file_data.name,
                 file=file_data,
                 original_filename=file_data.name,
-                file_size=file_data.size
+                file_size=file_data.size,
+                sha256=compute_sha256(file_data)
             )
+            for file_data in files_data
+        ]
         
+        changes = [events.event(submission, 'created')]
+        if form_files:
+            changes.append(events.event(submission, 'files_attached', files=[form_file.id for form_file in form_files]))
+        events.record(*changes)
         return submission
 
 
+class FormDraftFileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FormDraftFile
+        fields = ['id', 'field_name', 'original_filename', 'file_size', 'uploaded_at']
+
+
+class FormDraftSerializer(serializers.ModelSerializer):
+    files = FormDraftFileSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = FormDraft
+        fields = [
+            'id', 'form_template', 'submitted_by', 'form_data', 'files', 'version',
+            'submission', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['form_template', 'version', 'submission']
+
+
 class NotificationLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotificationLog
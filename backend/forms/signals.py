@@ -0,0 +1,47 @@
+"""
+Model signal handlers for the forms app.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import invalidate_user
+from .caching import bump_generation
+from .models import FormTemplate, FormField, FormValidationRule
+
+
+@receiver([post_save, post_delete], sender=FormTemplate)
+@receiver([post_save, post_delete], sender=FormField)
+@receiver([post_save, post_delete], sender=FormValidationRule)
+def invalidate_public_form_cache(sender, instance, **kwargs):
+    """
+    Any change to a template, its fields or their rules invalidates the
+    cached public form responses. QuerySet.update() and bulk_create() don't
+    send these signals; call caching.bump_generation() after using them.
+
+    Field and rule changes also bump the template's updated_at, which the
+    detail endpoints derive their ETag and Last-Modified from. The generation
+    is bumped once the transaction commits: bumped earlier, a concurrent
+    request could cache the old rows under the new generation.
+    """
+    if sender is FormField:
+        FormTemplate.objects.filter(pk=instance.form_template_id).update(updated_at=timezone.now())
+    elif sender is FormValidationRule:
+        FormTemplate.objects.filter(fields__pk=instance.field_id).update(updated_at=timezone.now())
+    transaction.on_commit(bump_generation)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Saving or deleting a user drops their cached copy used by token authentication."""
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_user(sender, instance, **kwargs):
+    """Blacklisting a refresh token makes its user be re-checked on their next request."""
+    if instance.token.user_id is not None:
+        invalidate_user(instance.token.user_id)
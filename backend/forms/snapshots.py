@@ -0,0 +1,159 @@
+"""
+Immutable template snapshots.
+
+Publishing a template serializes it with its fields, validation rules and
+conditional logic, hashes the result (SHA-256 of the canonical JSON) and
+stores it as a FormTemplateSnapshot unless that hash already exists: an
+unchanged template always maps to the same snapshot. Every new submission
+records the snapshot of the template it was submitted against, so rendering,
+exporting or reprocessing it later uses the fields it was answered with, not
+whatever the template looks like now.
+
+Snapshots never change, so they're kept in a per-process LRU by hash
+(FORMS_SNAPSHOT_CACHE_SIZE); a warm process reads a historical submission's
+fields without any field query. The current snapshot of each template is
+memoized against the template's updated_at, which every field and rule
+change bumps (see signals.py). Changes made with QuerySet.update() don't,
+so publish the template after those.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+_current = {}  # template id -> (updated_at, content hash)
+
+
+class Snapshot:
+    """A snapshot's definition, with its fields as (unsaved) model instances for the pipeline."""
+
+    def __init__(self, content_hash, definition):
+        self.content_hash = content_hash
+        self.definition = definition
+
+    @cached_property
+    def fields(self):
+        from .models import FormField, FormValidationRule
+
+        template_id = self.definition['template']['id']
+        fields = []
+        for data in self.definition['fields']:
+            data = dict(data)
+            rules = [
+                FormValidationRule(field_id=data['id'], **rule)
+                for rule in data.pop('validation_rules', [])
+            ]
+            field = FormField(form_template_id=template_id, **data)
+            # Serve field.validation_rules.all() from the snapshot, as prefetch_related would
+            queryset = FormValidationRule.objects.none()
+            queryset._result_cache = rules
+            queryset._prefetch_done = True
+            field._prefetched_objects_cache = {'validation_rules': queryset}
+            fields.append(field)
+        return fields
+
+
+class SnapshotCache:
+    """Snapshots by content hash, least recently used evicted beyond `max_size`."""
+
+    def __init__(self):
+        self.snapshots = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, content_hash):
+        with self.lock:
+            snapshot = self.snapshots.get(content_hash)
+            if snapshot is not None:
+                self.snapshots.move_to_end(content_hash)
+            return snapshot
+
+    def add(self, snapshot):
+        max_size = getattr(settings, 'FORMS_SNAPSHOT_CACHE_SIZE', 256)
+        with self.lock:
+            self.snapshots[snapshot.content_hash] = snapshot
+            self.snapshots.move_to_end(snapshot.content_hash)
+            while len(self.snapshots) > max_size:
+                self.snapshots.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.snapshots.clear()
+
+
+cache = SnapshotCache()
+
+
+def build_definition(form_template):
+    """The template, its fields and their rules as stored in a snapshot."""
+    from .serializers import FormFieldSerializer
+
+    fields = form_template.fields.prefetch_related('validation_rules')
+    return {
+        'template': {
+            'id': form_template.id,
+            'name': form_template.name,
+            'description': form_template.description,
+            'configuration': form_template.configuration,
+        },
+        'fields': FormFieldSerializer(fields, many=True).data,
+    }
+
+
+def content_hash(definition):
+    encoded = json.dumps(definition, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def publish(form_template):
+    """Freeze the template as it is now. Returns (snapshot, created)."""
+    from .models import FormTemplateSnapshot
+
+    # Round trip through JSON so the definition matches what is read back later
+    definition = json.loads(json.dumps(build_definition(form_template), cls=DjangoJSONEncoder))
+    digest = content_hash(definition)
+    _, created = FormTemplateSnapshot.objects.get_or_create(
+        content_hash=digest, defaults={'form_template': form_template, 'definition': definition},
+    )
+    snapshot = Snapshot(digest, definition)
+    memo = (form_template.updated_at, digest)
+    # Kept only once committed, so nothing refers to a rolled back snapshot
+    transaction.on_commit(lambda: (cache.add(snapshot), _current.__setitem__(form_template.id, memo)))
+    return snapshot, created
+
+
+def current_hash(form_template):
+    """Content hash of the template's current snapshot, publishing one if it changed."""
+    memo = _current.get(form_template.id)
+    if memo is not None and memo[0] == form_template.updated_at:
+        return memo[1]
+    return publish(form_template)[0].content_hash
+
+
+def get(content_hash):
+    """The Snapshot with this hash, or None."""
+    if content_hash is None:
+        return None
+    snapshot = cache.get(content_hash)
+    if snapshot is None:
+        from .models import FormTemplateSnapshot
+
+        definition = (
+            FormTemplateSnapshot.objects.filter(content_hash=content_hash)
+            .values_list('definition', flat=True).first()
+        )
+        if definition is None:
+            return None
+        snapshot = Snapshot(content_hash, definition)
+        cache.add(snapshot)
+    return snapshot
+
+
+def reset():
+    """Forget cached snapshots (tests)."""
+    cache.clear()
+    _current.clear()
@@ -0,0 +1,137 @@
+"""
+Built-in submission pipeline stages.
+
+These run for every template unless the template's configuration lists its
+own `pipeline`. Extra stages can be registered from any installed app with
+`forms.pipeline.register_stage`.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .pipeline import StageError, register_stage
+
+
+def _is_blank(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _check_rule(rule, value):
+    """Return True when `value` satisfies a FormValidationRule."""
+    if rule.rule_type == 'custom':
+        # Custom rules are evaluated by template-specific stages.
+        return True
+    if rule.rule_type in ('min_length', 'max_length'):
+        length = len(str(value))
+        limit = int(rule.rule_value)
+        return length >= limit if rule.rule_type == 'min_length' else length <= limit
+    if rule.rule_type in ('min_value', 'max_value'):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return False
+        limit = float(rule.rule_value)
+        return number >= limit if rule.rule_type == 'min_value' else number <= limit
+    if rule.rule_type == 'pattern':
+        return re.fullmatch(rule.rule_value, str(value)) is not None
+    return True
+
+
+@register_stage('validation')
+def validate_submission(context):
+    """Check required fields and active validation rules."""
+    errors = {}
+    for field in context.fields:
+        value = context.form_data.get(field.field_name)
+        if _is_blank(value):
+            if field.is_required and field.field_type != 'file':
+                errors.setdefault(field.field_name, []).append('This field is required.')
+            continue
+        for rule in field.validation_rules.all():
+            if rule.is_active and not _check_rule(rule, value):
+                errors.setdefault(field.field_name, []).append(rule.error_message)
+
+    if errors:
+        raise StageError('Submission failed validation', details=errors)
+    return {'validated_fields': len(context.fields)}
+
+
+@register_stage('enrichment', depends_on=['validation'])
+def enrich_submission(context):
+    """Derive normalized values (emails, phone numbers, numbers) for downstream systems."""
+    normalized = {}
+    for field in context.fields:
+        value = context.form_data.get(field.field_name)
+        if _is_blank(value):
+            continue
+        if field.field_type == 'email':
+            normalized[field.field_name] = str(value).strip().lower()
+        elif field.field_type == 'phone':
+            digits = re.sub(r'[^\d+]', '', str(value))
+            normalized[field.field_name] = digits
+        elif field.field_type == 'number':
+            try:
+                normalized[field.field_name] = float(value)
+            except (TypeError, ValueError):
+                pass
+
+    answered = sum(
+        1 for field in context.fields
+        if not _is_blank(context.form_data.get(field.field_name))
+    )
+    return {
+        'normalized': normalized,
+        'answered_fields': answered,
+        'total_fields': len(context.fields),
+    }
+
+
+@register_stage('document_checks')
+def check_documents(context):
+    """Make sure every uploaded file is present in storage with the recorded size."""
+    problems = []
+    for form_file in context.files:
+        storage = form_file.file.storage
+        name = form_file.file.name
+        if not storage.exists(name):
+            problems.append({'file_id': form_file.id, 'error': 'missing from storage'})
+            continue
+        size = storage.size(name)
+        if size != form_file.file_size:
+            problems.append({
+                'file_id': form_file.id,
+                'error': f'size mismatch (stored {size}, recorded {form_file.file_size})',
+            })
+
+    required_uploads = [
+        field.field_name for field in context.fields
+        if field.field_type == 'file' and field.is_required
+    ]
+    if required_uploads and not context.files:
+        problems.append({'error': f"missing required uploads: {', '.join(required_uploads)}"})
+
+    if problems:
+        raise StageError('Document checks failed', details=problems)
+    return {
+        'file_count': len(context.files),
+        'total_bytes': sum(form_file.file_size for form_file in context.files),
+        'extensions': sorted({
+            os.path.splitext(form_file.original_filename)[1].lower().lstrip('.')
+            for form_file in context.files
+        }),
+    }
+
+
+@register_stage('export_hooks', depends_on=['validation', 'enrichment', 'document_checks'], memoize=False)
+def run_export_hooks(context):
+    """
+    Call the export hooks listed in FORMS_PIPELINE_EXPORT_HOOKS.
+    Each hook is a dotted path to a callable taking the StageContext.
+    """
+    results = {}
+    for path in getattr(settings, 'FORMS_PIPELINE_EXPORT_HOOKS', []):
+        hook = import_string(path)
+        results[path] = hook(context)
+    return results
@@ -1,8 +1,14 @@
-from celery import shared_task
+from celery import shared_task, chord, group
+from celery.signals import worker_shutdown
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
-from .models import FormSubmission, NotificationLog
+from django.utils import timezone
+from django.core.files.base import ContentFile
+from .models import FormSubmission, FormFile, NotificationLog, IdempotencyRecord
+from .pipeline import run_pipeline
+from . import derivatives, drafts, events, partitions
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -85,51 +91,214 @@ def send_form_submission_notification(self, submission_id):
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
 
 
+@shared_task(bind=True, max_retries=2)
+def generate_file_derivatives(self, file_id):
+    """
+    Generate the thumbnail, first-page preview, extracted text and metadata
+    of an uploaded file. Runs on the documents queue so CPU-heavy rendering
+    never competes with notifications.
+    """
+    try:
+        form_file = FormFile.objects.get(id=file_id)
+    except FormFile.DoesNotExist:
+        logger.error(f"File {file_id} not found")
+        return f"File {file_id} not found"
+    
+    try:
+        result = derivatives.generate(form_file)
+    except Exception as exc:
+        logger.error(f"Error generating derivatives for file {file_id}: {str(exc)}")
+        if self.request.retries >= self.max_retries:
+            form_file.derivatives_status = 'failed'
+            form_file.save(update_fields=['derivatives_status'])
+            return f"Derivatives failed for file {file_id}"
+        raise self.retry(exc=exc, countdown=30 * (2 ** self.request.retries))
+    
+    if result is None:
+        form_file.derivatives_status = 'unsupported'
+        form_file.save(update_fields=['derivatives_status'])
+        return f"No derivatives for file {file_id}"
+    
+    base_name = os.path.splitext(os.path.basename(form_file.file.name))[0]
+    if result['thumbnail']:
+        form_file.thumbnail.save(f"{base_name}_thumb.jpg", ContentFile(result['thumbnail']), save=False)
+    if result['preview']:
+        form_file.preview.save(f"{base_name}_preview.jpg", ContentFile(result['preview']), save=False)
+    form_file.extracted_text = result['text']
+    form_file.metadata = result['metadata']
+    form_file.derivatives_status = 'ready'
+    form_file.save(update_fields=['thumbnail', 'preview', 'extracted_text', 'metadata', 'derivatives_status'])
+    
+    logger.info(f"Derivatives generated for file {file_id}")
+    return f"Derivatives generated for file {file_id}"
+
+
+@worker_shutdown.connect
+def shutdown_derivative_pool(**kwargs):
+    """Stop the derivative process pool together with the worker."""
+    derivatives.shutdown_process_pool()
+
+
 @shared_task
 def cleanup_old_notifications():
     """
     Cleanup old notification logs to keep the database clean.
     This can be run as a periodic task.
     """
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
-    # Delete notification logs older than 30 days
-    cutoff_date = datetime.now() - timedelta(days=30)
-    deleted_count = NotificationLog.objects.filter(
-        created_at__lt=cutoff_date
-    ).delete()[0]
+    # Whole monthly partitions are dropped (see partitions.py); what is left
+    # past FORMS_NOTIFICATION_RETENTION_DAYS is deleted in batches
+    cutoff_date = timezone.now() - timedelta(days=getattr(settings, 'FORMS_NOTIFICATION_RETENTION_DAYS', 30))
+    for name in partitions.drop_before(NotificationLog, cutoff_date):
+        logger.info(f"Dropped notification log partition {name}")
+    deleted_count = partitions.delete_in_batches(NotificationLog.objects.filter(created_at__lt=cutoff_date))
     
     logger.info(f"Cleaned up {deleted_count} old notification logs")
     return f"Cleaned up {deleted_count} old notification logs"
 
 
 @shared_task
-def process_form_submission(submission_id):
+def maintain_partitions():
+    """Create upcoming monthly partitions and detach expired ones (PostgreSQL, when enabled)."""
+    if not getattr(settings, 'FORMS_PARTITIONING_ENABLED', False) or not partitions.supported():
+        return "Partitioning is not enabled"
+    changes = partitions.maintain()
+    return f"Partition maintenance: {', '.join(changes) or 'nothing to do'}"
+
+
+@shared_task
+def cleanup_idempotency_records():
+    """Delete idempotency records whose replay window has passed."""
+    deleted_count = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+    logger.info(f"Cleaned up {deleted_count} expired idempotency records")
+    return f"Cleaned up {deleted_count} expired idempotency records"
+
+
+@shared_task
+def cleanup_submission_events():
+    """Delete changes feed events older than FORMS_CHANGES_RETENTION_DAYS."""
+    from datetime import timedelta
+    
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'FORMS_CHANGES_RETENTION_DAYS', 30))
+    deleted_count = events.delete_before(cutoff)
+    logger.info(f"Cleaned up {deleted_count} submission events")
+    return f"Cleaned up {deleted_count} submission events"
+
+
+@shared_task
+def cleanup_stale_drafts():
+    """Delete drafts nobody has touched for FORMS_DRAFT_TTL_DAYS."""
+    from datetime import timedelta
+    
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'FORMS_DRAFT_TTL_DAYS', 30))
+    deleted_count = drafts.delete_stale_drafts(cutoff)
+    logger.info(f"Cleaned up {deleted_count} stale drafts")
+    return f"Cleaned up {deleted_count} stale drafts"
+
+
+def _run_submission_pipeline(submission_id):
     """
-    Process a form submission (e.g., validate data, trigger business logic).
-    This can be extended based on specific business requirements.
+    Run the pipeline for one submission and store the report on it.
+    Returns (status, report) where status is 'processed', 'failed' or 'missing'.
     """
     try:
-        submission = FormSubmission.objects.get(id=submission_id)
-        
-        # Add any business logic here
-        # For example:
-        # - Validate form data against business rules
-        # - Update related systems
-        # - Generate reports
-        # - Send additional notifications
-        
+        submission = FormSubmission.objects.select_related('form_template').get(id=submission_id)
+    except FormSubmission.DoesNotExist:
+        logger.error(f"Submission {submission_id} not found")
+        return 'missing', None
+    
+    report = run_pipeline(submission)
+    
+    was_processed = submission.is_processed
+    submission.processing_report = report
+    update_fields = ['processing_report']
+    if report['succeeded']:
         # Mark as processed
         submission.is_processed = True
-        submission.save()
+        submission.processed_at = timezone.now()
+        update_fields += ['is_processed', 'processed_at']
+    submission.save(update_fields=update_fields)
+    
+    if report['succeeded'] and not was_processed:
+        events.record(events.event(submission, 'processed', processed_at=submission.processed_at.isoformat()))
+    if report['succeeded']:
+        logger.info(f"Submission {submission_id} processed successfully in {report['duration_ms']}ms")
+        return 'processed', report
+    
+    failed = [name for name, entry in report['stages'].items() if entry['status'] != 'ok']
+    logger.warning(f"Submission {submission_id} failed pipeline stages: {', '.join(failed)}")
+    return 'failed', report
+
+
+@shared_task
+def process_form_submission(submission_id):
+    """
+    Process a form submission through the pipeline registered for its template
+    (validation, enrichment, document checks, export hooks, ...).
+    The stage report, including per-stage timings, is stored on the submission.
+    """
+    try:
+        status, report = _run_submission_pipeline(submission_id)
         
-        logger.info(f"Submission {submission_id} processed successfully")
+        if status == 'missing':
+            return f"Submission {submission_id} not found"
+        if status == 'failed':
+            return f"Submission {submission_id} failed processing"
         return f"Submission {submission_id} processed"
         
-    except FormSubmission.DoesNotExist:
-        logger.error(f"Submission {submission_id} not found")
-        return f"Submission {submission_id} not found"
-        
     except Exception as exc:
         logger.error(f"Error processing submission {submission_id}: {str(exc)}")
         raise exc
+
+
+@shared_task
+def process_submission_chunk(submission_ids):
+    """
+    Process a chunk of submissions on one worker.
+    Returns a small summary so the batch callback doesn't need to query.
+    """
+    summary = {'processed': 0, 'failed': 0, 'missing': 0}
+    for submission_id in submission_ids:
+        try:
+            status, _ = _run_submission_pipeline(submission_id)
+        except Exception as exc:
+            logger.error(f"Error processing submission {submission_id}: {str(exc)}")
+            status = 'failed'
+        summary[status] += 1
+    return summary
+
+
+@shared_task
+def summarize_processing_batch(chunk_summaries):
+    """Chord callback aggregating the chunk summaries of a batch."""
+    totals = {'processed': 0, 'failed': 0, 'missing': 0}
+    for summary in chunk_summaries:
+        for key in totals:
+            totals[key] += summary.get(key, 0)
+    logger.info(
+        f"Processed batch: {totals['processed']} ok, {totals['failed']} failed, "
+        f"{totals['missing']} missing"
+    )
+    return totals
+
+
+def process_submissions_batch(submission_ids, chunk_size=None):
+    """
+    Fan a large batch of submissions out across workers.
+    Submissions are split into chunks, each chunk runs as its own task in a
+    Celery group, and a chord callback aggregates the results.
+    """
+    chunk_size = chunk_size or getattr(settings, 'FORMS_PIPELINE_BATCH_CHUNK_SIZE', 100)
+    submission_ids = list(submission_ids)
+    chunks = [
+        submission_ids[i:i + chunk_size]
+        for i in range(0, len(submission_ids), chunk_size)
+    ]
+    if not chunks:
+        return None
+    if len(chunks) == 1:
+        return process_submission_chunk.delay(chunks[0])
+    return chord(
+        group(process_submission_chunk.s(chunk) for chunk in chunks)
+    )(summarize_processing_batch.s())
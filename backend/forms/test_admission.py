@@ -0,0 +1,60 @@
+"""
+Tests for admission control on public submits
+"""
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from . import admission
+from .models import FormTemplate, FormSubmission
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+@mock.patch('forms.views.queue_submission_tasks')
+class AdmissionControlTest(TestCase):
+    """Test load shedding on write latency, in-flight submissions and queue depth"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        self.url = f'/api/public/{self.form.id}/submit/'
+        self.controller = admission.AdmissionController()
+        patcher = mock.patch.object(admission, 'controller', self.controller)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def submit(self):
+        return self.client.post(self.url, {'form_data': {}}, content_type='application/json')
+
+    def test_slow_writes_shed_load(self, queue_tasks):
+        """Slow recent writes answer 503 with Retry-After until they leave the window"""
+        now = admission.time.monotonic()
+        self.controller.writes.append((now, 2.0))
+        self.controller.writes_total = 2.0
+        response = self.submit()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(int(response['Retry-After']), range(5, 11))
+        self.assertFalse(FormSubmission.objects.exists())
+
+        with mock.patch('forms.admission.time.monotonic', return_value=now + 11):
+            self.assertEqual(self.submit().status_code, 201)
+
+    def test_writes_are_measured(self, queue_tasks):
+        """Admitted submissions record their write time and leave no request in flight"""
+        self.assertEqual(self.submit().status_code, 201)
+        self.assertEqual(len(self.controller.writes), 1)
+        self.assertEqual(self.controller.in_flight, 0)
+
+    @override_settings(FORMS_ADMISSION_MAX_IN_FLIGHT=2)
+    def test_in_flight_limit(self, queue_tasks):
+        """Submissions beyond the in-flight limit are refused"""
+        self.controller.in_flight = 2
+        self.assertEqual(self.submit().status_code, 503)
+
+    @override_settings(FORMS_ADMISSION_MAX_QUEUE_DEPTH=100)
+    def test_queue_depth(self, queue_tasks):
+        """A deep task queue sheds load; an unreachable broker doesn't"""
+        with mock.patch('forms.admission.queue_depth', return_value=500):
+            self.assertEqual(self.submit().status_code, 503)
+        self.controller.depth_checked = float('-inf')
+        with mock.patch('forms.admission.queue_depth', side_effect=OSError('refused')):
+            self.assertEqual(self.submit().status_code, 201)
@@ -1,8 +1,11 @@
 """
 API tests for FormFlow backend
 """
+import io
 import tempfile
 import os
+import zipfile
+from unittest import mock
 from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -256,3 +259,178 @@ class AuthenticationAPITest(APITestCase):
         headers = {'Authorization': f'Bearer {access}'}
         response = self.client.post(url, data, format='json', headers=headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FormFileDownloadAPITest(APITestCase):
+    """Test ranged and conditional file downloads"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        form = FormTemplate.objects.create(name='Test Form', created_by=self.user)
+        submission = FormSubmission.objects.create(form_template=form, submitted_by='John Doe')
+        self.content = bytes(range(256)) * 40
+        self.form_file = FormFile.objects.create(
+            submission=submission,
+            field_name='document',
+            file=SimpleUploadedFile('bundle.pdf', self.content),
+            original_filename='bundle.pdf',
+            file_size=len(self.content)
+        )
+        self.url = f'/api/files/{self.form_file.id}/download/'
+    
+    def test_full_download(self):
+        """Test downloading the whole file with a strong ETag"""
+        response = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.form_file.refresh_from_db()
+        self.assertEqual(response['ETag'], f'"{self.form_file.sha256}"')
+    
+    def test_range_request(self):
+        """Test a byte range returns 206 with only that slice"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+    
+    def test_suffix_range_request(self):
+        """Test a suffix range returns the tail of the file"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+    
+    def test_unsatisfiable_range(self):
+        """Test a range past the end returns 416"""
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+    
+    def test_if_none_match(self):
+        """Test a matching ETag returns 304"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_stale_if_range_returns_full_file(self):
+        """Test a range with an outdated If-Range validator returns the full file"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_if_range_date_must_equal_last_modified(self):
+        """Test an If-Range date only honours the range when it is the exact Last-Modified"""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    @override_settings(FORMS_FILE_SERVE_MODE='x-accel')
+    def test_x_accel_offload(self):
+        """Test nginx offload mode returns the internal redirect only"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.form_file.file.name}')
+        self.assertEqual(response.content, b'')
+    
+    def test_download_requires_authentication(self):
+        """Test anonymous users can't download files"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FilesZipAPITest(APITestCase):
+    """Test streamed ZIP downloads of submission files"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=self.user)
+        self.submission = FormSubmission.objects.create(form_template=self.form, submitted_by='John Doe')
+        self.other = FormSubmission.objects.create(form_template=self.form, submitted_by='Jane Doe')
+        self.pdf = os.urandom(300 * 1024)
+        self.add_file(self.submission, 'id.pdf', self.pdf)
+        self.add_file(self.submission, 'notes.txt', b'hello ' * 1000)
+        self.add_file(self.other, 'id.pdf', b'%PDF other')
+    
+    def add_file(self, submission, name, content):
+        return FormFile.objects.create(
+            submission=submission,
+            field_name='document',
+            file=SimpleUploadedFile(name, content),
+            original_filename=name,
+            file_size=len(content)
+        )
+    
+    def read_zip(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        return chunks, zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+    
+    def test_submission_zip(self):
+        """Test one submission's files are archived with a manifest"""
+        chunks, archive = self.read_zip(self.client.get(f'/api/submissions/{self.submission.id}/files_zip/'))
+        names = archive.namelist()
+        self.assertEqual(names, [
+            f'submission_{self.submission.id}/id.pdf',
+            f'submission_{self.submission.id}/notes.txt',
+            'manifest.csv',
+        ])
+        self.assertEqual(archive.read(names[0]), self.pdf)
+        # Already-compressed types are stored, text is deflated
+        self.assertEqual(archive.getinfo(names[0]).compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo(names[1]).compress_type, zipfile.ZIP_DEFLATED)
+        # Streamed in bounded chunks rather than one buffer
+        self.assertGreater(len(chunks), 3)
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 128 * 1024)
+    
+    def test_form_zip(self):
+        """Test all submissions of a form are archived"""
+        _, archive = self.read_zip(self.client.get(f'/api/submissions/files_zip/?form_template={self.form.id}'))
+        self.assertEqual(len(archive.namelist()), 4)
+        manifest = archive.read('manifest.csv').decode()
+        self.assertIn('Jane Doe', manifest)
+    
+    def test_manifest_spooled_to_disk(self):
+        """Test a manifest past the spool size is copied into the archive intact"""
+        with mock.patch('forms.file_serving.MANIFEST_SPOOL_SIZE', 10):
+            _, archive = self.read_zip(self.client.get(f'/api/submissions/files_zip/?form_template={self.form.id}'))
+        rows = archive.read('manifest.csv').decode().splitlines()
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(rows[-1].endswith(',ok'))
+    
+    def test_bulk_zip_filters(self):
+        """Test ids and date filters narrow the archive"""
+        url = f'/api/submissions/files_zip/?ids={self.other.id}&submitted_after=2000-01-01'
+        _, archive = self.read_zip(self.client.get(url))
+        self.assertEqual(archive.namelist(), [f'submission_{self.other.id}/id.pdf', 'manifest.csv'])
+        
+        url = f'/api/submissions/files_zip/?form_template={self.form.id}&submitted_before=2000-01-01'
+        _, archive = self.read_zip(self.client.get(url))
+        self.assertEqual(archive.namelist(), ['manifest.csv'])
+    
+    def test_bulk_zip_requires_filter(self):
+        """Test the bulk archive refuses to export everything"""
+        response = self.client.get('/api/submissions/files_zip/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_zip_requires_authentication(self):
+        """Test anonymous users can't download archives"""
+        self.client.force_authenticate(user=None)
+        response = self.client.get(f'/api/submissions/files_zip/?form_template={self.form.id}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
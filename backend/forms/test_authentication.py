@@ -0,0 +1,52 @@
+"""
+Tests for cached JWT authentication
+"""
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'auth-cache-tests'}})
+class CachedJWTAuthenticationTest(TestCase):
+    """Test the user cache, its invalidation and token revocation"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        self.refresh = RefreshToken.for_user(self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {self.refresh.access_token}'}
+
+    def test_repeat_requests_skip_user_query(self):
+        """Only the first request loads the user; the session is never read"""
+        url = '/api/auth/profile/'
+        self.client.force_login(self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, **self.auth).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.json()['username'], 'admin')
+
+    def test_deactivation_invalidates(self):
+        """A deactivated user is rejected on their next request"""
+        url = '/api/auth/profile/'
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        """Logging out blacklists the refresh token and revokes the access token"""
+        response = self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/profile/', **self.auth).status_code, 401)
+        response = self.client.post('/api/auth/refresh/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_bearer_does_not_fall_back_to_session(self):
+        """A bad token is rejected even with a logged-in session"""
+        self.client.force_login(self.user)
+        response = self.client.get('/api/auth/profile/', HTTP_AUTHORIZATION='Bearer not.a.token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
@@ -0,0 +1,52 @@
+"""
+Tests for the benchmark suite
+"""
+import shutil
+import tempfile
+from unittest import mock
+from django.test import TestCase, override_settings
+from . import benchmarks
+from .models import FormTemplate, FormField, FormSubmission, FormFile, FormValidationRule
+
+MEDIA_ROOT = tempfile.mkdtemp()
+TINY = {'field_counts': [5, 12], 'submissions': 30, 'by_form_submissions': 10, 'files': 2}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BenchmarkSuiteTest(TestCase):
+    """Test seeding, timing and baseline comparison"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_creates_dataset(self):
+        """Templates get fields with rules and conditional logic, plus submissions and files"""
+        ids = benchmarks.seed(TINY)
+        self.assertTrue(benchmarks.is_seeded(TINY))
+        self.assertEqual(ids['submission_count'], 40)
+
+        largest = FormTemplate.objects.get(id=ids['largest_template_id'])
+        self.assertEqual(largest.fields.count(), 12)
+        self.assertTrue(FormValidationRule.objects.filter(field__form_template=largest).exists())
+        self.assertTrue(FormField.objects.filter(form_template=largest).exclude(conditional_logic={}).exists())
+
+        submission = FormSubmission.objects.filter(form_template_id=ids['by_form_template_id']).first()
+        self.assertEqual(len(submission.form_data), 12)
+        self.assertEqual(FormFile.objects.count(), 2)
+
+    @mock.patch('forms.views.queue_submission_tasks')
+    def test_run_every_benchmark(self, queue_tasks):
+        """Every registered benchmark runs against the seeded data"""
+        context = benchmarks.BenchmarkContext(benchmarks.seed(TINY))
+        for bench in benchmarks.BENCHMARKS:
+            result = benchmarks.run_benchmark(bench, context, iterations=1, warmup=0)
+            self.assertEqual(result['iterations'], 1, bench.name)
+            self.assertGreater(result['ops_per_sec'], 0, bench.name)
+
+    def test_compare_flags_regressions(self):
+        """Only benchmarks slower than the threshold are reported"""
+        baseline = {'fast': {'p50_ms': 10.0}, 'slow': {'p50_ms': 10.0}}
+        results = {'fast': {'p50_ms': 11.0}, 'slow': {'p50_ms': 20.0}, 'new': {'p50_ms': 5.0}}
+        self.assertEqual(benchmarks.compare(results, baseline, 0.25), [('slow', 10.0, 20.0, 2.0)])
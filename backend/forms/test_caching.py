@@ -0,0 +1,166 @@
+"""
+Tests for the public form response cache
+"""
+import threading
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from . import caching
+from .models import FormTemplate, FormField, FormValidationRule, FormSubmission
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'public-form-cache-tests'}})
+class PublicFormCacheTest(TestCase):
+    """Test caching, invalidation and headers of the public endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        self.field = FormField.objects.create(
+            form_template=self.form,
+            field_name='email',
+            field_type='email',
+            label='Email',
+            order=0
+        )
+
+    def test_repeat_requests_are_served_from_cache(self):
+        """The second list and detail requests don't touch the database"""
+        for url in ('/api/public/', f'/api/public/{self.form.id}/'):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.json(), second.json())
+
+    def test_cache_headers(self):
+        """Responses are cacheable by CDNs and don't vary on cookies"""
+        response = self.client.get('/api/public/')
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=300', response['Cache-Control'])
+        vary = response['Vary']
+        self.assertIn('Accept', vary)
+        self.assertIn('Accept-Encoding', vary)
+        self.assertNotIn('Cookie', vary)
+
+    def test_field_and_rule_changes_invalidate(self):
+        """Saving a field or deleting a rule refreshes the cached responses"""
+        url = f'/api/public/{self.form.id}/'
+        self.client.get(url)
+
+        generation = caching.get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.field.label = 'Work email'
+            self.field.save()
+            # Not before the change commits, or old rows could be cached under the new generation
+            self.assertEqual(caching.get_generation(), generation)
+        self.assertEqual(self.client.get(url).json()['fields'][0]['label'], 'Work email')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = FormValidationRule.objects.create(
+                field=self.field, rule_type='max_length', rule_value='50', error_message='Too long'
+            )
+        self.assertEqual(len(self.client.get(url).json()['fields'][0]['validation_rules']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.delete()
+        self.assertEqual(self.client.get(url).json()['fields'][0]['validation_rules'], [])
+
+    def test_deactivated_template_is_not_served(self):
+        """A template leaving the public list stops being served from the cache"""
+        url = f'/api/public/{self.form.id}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.is_active = False
+            self.form.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get('/api/public/').json()['count'], 0)
+
+    def test_single_flight(self):
+        """Concurrent misses for one key run the computation once"""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value', True
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(caching.get_or_compute('key', slow_compute, 60)))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(caching.get_or_compute('key', slow_compute, 60)))
+        second.start()
+        release.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('value', False), ('value', True)])
+
+
+class ConditionalGetTest(TestCase):
+    """Test ETag / Last-Modified on template detail endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=self.user)
+        self.field = FormField.objects.create(
+            form_template=self.form, field_name='email', field_type='email', label='Email', order=0
+        )
+
+    def test_unchanged_template_is_not_modified(self):
+        """A matching If-None-Match or If-Modified-Since answers 304"""
+        self.client.force_login(self.user)
+        for url in (f'/api/forms/{self.form.id}/', f'/api/public/{self.form.id}/',
+                    f'/api/forms/{self.form.id}/public_form/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+            )
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_not_modified_skips_the_work(self):
+        """A 304 for the admin detail costs one query"""
+        self.client.force_login(self.user)
+        url = f'/api/forms/{self.form.id}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(3):  # session, user, validators
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Field edits, rule changes and new submissions change the ETag"""
+        self.client.force_login(self.user)
+        url = f'/api/forms/{self.form.id}/'
+        etags = [self.client.get(url)['ETag']]
+
+        self.field.label = 'Work email'
+        self.field.save()
+        etags.append(self.client.get(url)['ETag'])
+        FormValidationRule.objects.create(field=self.field, rule_type='max_length', rule_value='5',
+                                          error_message='Too long')
+        etags.append(self.client.get(url)['ETag'])
+        FormSubmission.objects.create(form_template=self.form, form_data={})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+
+        # Representations differ by query string
+        self.assertNotEqual(self.client.get(f'{url}?fields=id')['ETag'], etags[-1])
+
+    def test_public_not_modified_keeps_cache_headers(self):
+        """Public 304s carry the public Cache-Control"""
+        url = f'/api/public/{self.form.id}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertEqual(response['ETag'], etag)
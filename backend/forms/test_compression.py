@@ -0,0 +1,83 @@
+"""
+Tests for response compression
+"""
+import gzip
+import json
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import StreamingHttpResponse, HttpResponse
+from django.test import TestCase, RequestFactory
+from . import compression
+from .middleware import CompressionMiddleware
+from .models import FormTemplate, FormField
+
+
+class CompressionTest(TestCase):
+    """Test encoding negotiation and compressed responses"""
+
+    def setUp(self):
+        # Public responses cached by other tests' templates with the same ids;
+        # their generation bumps wait for a commit that never comes
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def middleware(self, response):
+        return CompressionMiddleware(lambda request: response)
+
+    def test_negotiation(self):
+        """q-values pick the encoding; server order breaks ties; q=0 refuses"""
+        encoders = [compression.GzipEncoder()]
+        self.assertEqual(compression.negotiate('gzip, deflate, br', encoders).name, 'gzip')
+        self.assertEqual(compression.negotiate('*;q=0.5', encoders).name, 'gzip')
+        self.assertIsNone(compression.negotiate('gzip;q=0, identity', encoders))
+        self.assertIsNone(compression.negotiate('', encoders))
+
+        class Fake:
+            def __init__(self, name):
+                self.name = name
+        preferred = [Fake('zstd'), Fake('br'), Fake('gzip')]
+        self.assertEqual(compression.negotiate('gzip, br, zstd', preferred).name, 'zstd')
+        self.assertEqual(compression.negotiate('gzip;q=1, br;q=0.5', preferred).name, 'gzip')
+
+    def test_api_response_is_gzipped(self):
+        """Large JSON responses are compressed, small ones and unaccepting clients aren't"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = FormTemplate.objects.create(name='Form', created_by=user)
+        for order in range(50):
+            FormField.objects.create(form_template=form, field_name=f'field_{order}', field_type='text',
+                                     label=f'Field {order}', order=order)
+
+        response = self.client.get(f'/api/public/{form.id}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['fields']), 50)
+
+        plain = self.client.get(f'/api/public/{form.id}/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        small = self.client.get('/api/public/?fields=id', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_streaming_response(self):
+        """Streaming text is compressed as it streams"""
+        chunks = [f'{{"row": {index}}}\n'.encode() * 50 for index in range(20)]
+        response = StreamingHttpResponse(iter(chunks), content_type='application/x-ndjson')
+        request = self.factory.get('/export', HTTP_ACCEPT_ENCODING='gzip')
+        compressed = self.middleware(response)(request)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(compressed.streaming_content)), b''.join(chunks))
+
+    def test_skipped_responses(self):
+        """Archives, range-capable files, event streams and excluded paths pass through"""
+        body = b'x' * 5000
+        request = self.factory.get('/api/files/1/download/', HTTP_ACCEPT_ENCODING='gzip')
+        for response in (
+            HttpResponse(body, content_type='application/zip'),
+            HttpResponse(body, content_type='text/event-stream'),
+            HttpResponse(body, content_type='text/plain', headers={'Accept-Ranges': 'bytes'}),
+        ):
+            self.assertFalse(self.middleware(response)(request).has_header('Content-Encoding'))
+
+        login = self.factory.post('/api/auth/login/', HTTP_ACCEPT_ENCODING='gzip')
+        response = HttpResponse(body, content_type='application/json')
+        self.assertFalse(self.middleware(response)(login).has_header('Content-Encoding'))
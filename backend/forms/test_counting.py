@@ -0,0 +1,78 @@
+"""
+Tests for approximate row counts and estimated-count pagination
+"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from . import counting
+from .models import FormTemplate, FormSubmission
+
+
+@override_settings(FORMS_EXACT_COUNT_LIMIT=10, FORMS_COUNT_SAMPLE_SIZE=20)
+class CountingTest(TestCase):
+    """Test when counts are exact and how they are estimated"""
+
+    def setUp(self):
+        counting.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.forms = [FormTemplate.objects.create(name=f'Form {i}', created_by=self.user) for i in range(2)]
+        # 30 submissions to the first form, 10 to the second, newest last
+        FormSubmission.objects.bulk_create(
+            [FormSubmission(form_template=self.forms[0], form_data={}) for _ in range(30)]
+            + [FormSubmission(form_template=self.forms[1], form_data={}) for _ in range(10)]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        counting.reset()
+
+    def test_selective_filter_is_exact(self):
+        """At most the limit of matching rows are counted exactly"""
+        self.assertEqual(counting.count(FormSubmission.objects.filter(form_template=self.forms[1])), (10, False))
+
+    def test_unfiltered_large_table_is_estimated(self):
+        """A large table isn't counted; the estimate is reused"""
+        self.assertEqual(counting.count(FormSubmission.objects.all()), (40, True))  # the span of ids
+        with self.assertNumQueries(0):
+            self.assertEqual(counting.count(FormSubmission.objects.all()), (40, True))
+        with override_settings(FORMS_EXACT_COUNT_LIMIT=100):
+            self.assertEqual(counting.count(FormSubmission.objects.all()), (40, False))
+
+    def test_unselective_filter_is_sampled(self):
+        """Past the limit, the share of recent rows matching scales the table estimate"""
+        # The 20 most recent rows hold the second form's 10 and 10 of the first's
+        number, is_estimate = counting.count(FormSubmission.objects.filter(form_template=self.forms[0]))
+        self.assertTrue(is_estimate)
+        self.assertEqual(number, 20)
+
+    def test_api_reports_estimate(self):
+        """Paginated responses say whether the count is an estimate, and end at the last row"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '100 1' WHERE tbl = 'forms_formsubmission'")
+        response = self.client.get('/api/submissions/', {'page': 2}).json()
+        self.assertEqual((response['count'], response['count_is_estimate']), (100, True))
+        self.assertEqual(len(response['results']), 20)
+        self.assertIsNone(response['next'])
+        response = self.client.get('/api/submissions/', {'page': 3}).json()
+        self.assertEqual(response['results'], [])
+        self.assertIsNone(response['next'])
+
+        response = self.client.get('/api/forms/').json()
+        self.assertEqual((response['count'], response['count_is_estimate']), (2, False))
+
+    def test_api_reaches_rows_past_a_low_estimate(self):
+        """Rows added since the estimate are still paged through"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '30 1' WHERE tbl = 'forms_formsubmission'")
+        FormSubmission.objects.bulk_create([FormSubmission(form_template=self.forms[1], form_data={}) for _ in range(20)])
+        response = self.client.get('/api/submissions/', {'page': 2}).json()
+        self.assertEqual(len(response['results']), 20)
+        self.assertIsNotNone(response['next'])
+        response = self.client.get('/api/submissions/', {'page': 3}).json()
+        self.assertEqual(len(response['results']), 20)
+        self.assertEqual((response['count'], response['count_is_estimate']), (60, True))
+        self.assertIsNone(response['next'])
@@ -0,0 +1,78 @@
+"""
+Tests for the synthetic data generator
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from . import datagen
+from .models import FormTemplate, FormField, FormSubmission, FormFile
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DataGeneratorTest(TestCase):
+    """Test template, submission and file generation"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='loadtest', password='testpass123')
+
+    def test_templates_have_fields_in_range(self):
+        """Each template gets between min and max fields"""
+        templates = datagen.create_templates(self.user, 3, 4, 8, seed=1)
+        self.assertEqual(len(templates), 3)
+        for template, specs in templates:
+            self.assertTrue(4 <= template.fields.count() <= 8)
+            self.assertEqual(len(specs), template.fields.count())
+
+    def test_submissions_have_typed_data_and_spread_timestamps(self):
+        """form_data matches field types and submitted_at covers the requested period"""
+        templates = datagen.create_templates(self.user, 2, 9, 9)
+        plan = datagen.SubmissionPlan(templates, 250, days=30, seed=3)
+        self.assertEqual(datagen.generate_submissions(plan, batch_size=100), 250)
+        self.assertEqual(FormSubmission.objects.count(), 250)
+
+        submission = FormSubmission.objects.filter(form_template=templates[0][0]).first()
+        fields = dict(FormField.objects.filter(form_template=templates[0][0]).values_list('field_name', 'field_type'))
+        self.assertEqual(set(submission.form_data), set(fields))
+        for name, field_type in fields.items():
+            if field_type == 'number':
+                self.assertIsInstance(submission.form_data[name], int)
+            if field_type == 'email':
+                self.assertIn('@', submission.form_data[name])
+
+        oldest = FormSubmission.objects.order_by('submitted_at').first().submitted_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=7))
+        self.assertGreater(oldest, timezone.now() - timedelta(days=31))
+        # auto_now_add is restored after generation
+        self.assertTrue(FormSubmission._meta.get_field('submitted_at').auto_now_add)
+
+    def test_rows_are_deterministic(self):
+        """The same seed and chunk produce the same rows"""
+        templates = datagen.create_templates(self.user, 2, 3, 3)
+        first = datagen.SubmissionPlan(templates, 10, seed=5)
+        second = datagen.SubmissionPlan(templates, 10, seed=5)
+        second.end = first.end
+        self.assertEqual(first.rows(0, 10), second.rows(0, 10))
+
+    def test_command(self):
+        """generate_data creates templates, submissions and files"""
+        out = StringIO()
+        call_command('generate_data', '--templates=2', '--min-fields=3', '--max-fields=5',
+                     '--submissions=120', '--files=10', '--batch-size=50', stdout=out)
+        self.assertEqual(FormTemplate.objects.count(), 2)
+        self.assertEqual(FormSubmission.objects.count(), 120)
+        self.assertEqual(FormFile.objects.count(), 10)
+        form_file = FormFile.objects.first()
+        self.assertTrue(form_file.file.storage.exists(form_file.file.name))
+        self.assertIn('Generated 120 submissions and 10 files', out.getvalue())
@@ -0,0 +1,147 @@
+"""
+Tests for uploaded document derivatives
+"""
+import io
+import shutil
+import tempfile
+import zipfile
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from .derivatives import build_derivatives, generate, shutdown_process_pool
+from .models import FormTemplate, FormSubmission, FormFile
+from .serializers import FormFileSerializer
+from .tasks import generate_file_derivatives
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_png(width=800, height=600):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 128)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def make_docx(paragraphs):
+    ns = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p>' for text in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+        archive.writestr(
+            'docProps/app.xml',
+            '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            '<Pages>3</Pages></Properties>'
+        )
+    return buffer.getvalue()
+
+
+MINIMAL_PDF = (
+    b'%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+    b'2 0 obj << /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >> endobj\n'
+    b'3 0 obj << /Type /Page /Parent 2 0 R >> endobj\n'
+    b'4 0 obj << /Type /Page /Parent 2 0 R >> endobj\ntrailer << /Root 1 0 R >>\n%%EOF'
+)
+
+
+class BuildDerivativesTest(TestCase):
+    """Test derivative generation for each supported type"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = f'{self.tmpdir}/{name}'
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        return path
+
+    def test_image_thumbnail_and_metadata(self):
+        """Images get downscaled JPEG thumbnails and their dimensions recorded"""
+        result = build_derivatives(self.write('scan.png', make_png()), 'png')
+        self.assertEqual(result['metadata']['width'], 800)
+        self.assertEqual(result['metadata']['height'], 600)
+        with Image.open(io.BytesIO(result['thumbnail'])) as thumbnail:
+            self.assertEqual(thumbnail.format, 'JPEG')
+            self.assertEqual(max(thumbnail.size), 256)
+        self.assertLess(len(result['thumbnail']), len(result['preview']))
+
+    def test_docx_text_extraction(self):
+        """Word documents have their paragraph text and page count extracted"""
+        result = build_derivatives(self.write('letter.docx', make_docx(['Hello', 'World'])), 'docx')
+        self.assertEqual(result['text'], 'Hello\nWorld')
+        self.assertEqual(result['metadata']['page_count'], 3)
+
+    def test_pdf_page_count(self):
+        """PDF page count is available even without a PDF library"""
+        result = build_derivatives(self.write('bundle.pdf', MINIMAL_PDF), 'pdf')
+        self.assertEqual(result['metadata']['page_count'], 2)
+
+    def test_text_is_truncated(self):
+        """Extracted text is capped at the configured limit"""
+        result = build_derivatives(self.write('notes.txt', b'a' * 50), 'txt', text_limit=10)
+        self.assertEqual(result['text'], 'a' * 10)
+
+    def test_unsupported_type(self):
+        """Legacy .doc files have no derivatives"""
+        self.assertIsNone(build_derivatives(self.write('old.doc', b'\xd0\xcf'), 'doc'))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FORMS_DERIVATIVE_USE_PROCESS_POOL=False)
+class DerivativeTaskTest(TestCase):
+    """Test the derivative task and serializer output"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        self.submission = FormSubmission.objects.create(form_template=form, submitted_by='John Doe')
+
+    def create_file(self, name, content):
+        return FormFile.objects.create(
+            submission=self.submission,
+            field_name='document',
+            file=SimpleUploadedFile(name, content),
+            original_filename=name,
+            file_size=len(content)
+        )
+
+    def test_task_stores_derivatives(self):
+        """The task saves the thumbnail, preview and metadata"""
+        form_file = self.create_file('scan.png', make_png())
+        generate_file_derivatives(form_file.id)
+        form_file.refresh_from_db()
+
+        self.assertEqual(form_file.derivatives_status, 'ready')
+        self.assertTrue(form_file.thumbnail.name.endswith('_thumb.jpg'))
+        self.assertTrue(form_file.preview.name.endswith('_preview.jpg'))
+        self.assertEqual(form_file.metadata['width'], 800)
+
+        data = FormFileSerializer(form_file).data
+        self.assertEqual(data['thumbnail'], form_file.thumbnail.url)
+        self.assertEqual(data['derivatives_status'], 'ready')
+
+    def test_task_marks_unsupported_files(self):
+        """Files without derivatives are flagged instead of retried"""
+        form_file = self.create_file('old.doc', b'\xd0\xcf\x11\xe0')
+        generate_file_derivatives(form_file.id)
+        form_file.refresh_from_db()
+        self.assertEqual(form_file.derivatives_status, 'unsupported')
+        self.assertIsNone(FormFileSerializer(form_file).data['thumbnail'])
+
+    def test_generate_in_process_pool(self):
+        """Generation can be handed to the process pool"""
+        form_file = self.create_file('notes.txt', b'hello world')
+        try:
+            result = generate(form_file, use_pool=True)
+        finally:
+            shutdown_process_pool()
+        self.assertEqual(result['text'], 'hello world')
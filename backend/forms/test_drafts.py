@@ -0,0 +1,126 @@
+"""
+Tests for draft submissions
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from . import drafts
+from .models import FormTemplate, FormDraft, FormSubmission, FormFile
+from .tasks import cleanup_stale_drafts
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+@mock.patch('forms.views.queue_submission_tasks')
+class FormDraftTest(TestCase):
+    """Test autosave patches, file uploads and finalizing"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='KYC', created_by=user)
+
+    def create_draft(self, form_data=None):
+        response = self.client.post(f'/api/public/{self.form.id}/drafts/', {'form_data': form_data or {}},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def patch(self, draft_id, body, **headers):
+        return self.client.patch(f'/api/drafts/{draft_id}/', body,
+                                 content_type='application/merge-patch+json', **headers)
+
+    def test_merge_patch(self, queue_tasks):
+        """RFC 7396: nulls remove keys, objects merge, other values replace"""
+        target = {'a': 1, 'b': {'c': 1, 'd': 2}, 'e': [1]}
+        patch = {'a': None, 'b': {'c': None, 'x': 3}, 'e': [2], 'f': 'new'}
+        self.assertEqual(drafts.merge_patch(target, patch), {'b': {'d': 2, 'x': 3}, 'e': [2], 'f': 'new'})
+
+    def test_patches_merge_changed_keys(self, queue_tasks):
+        """Each autosave merges its keys and returns only the new version"""
+        draft_id = self.create_draft({'name': 'Ann', 'address': {'city': 'Gulu', 'street': 'Main'}})
+        response = self.patch(draft_id, {'form_data': {'address': {'city': 'Kampala'}, 'name': None}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertNotIn('form_data', response.json())
+        self.patch(draft_id, {'form_data': {'phone': '+256700000000'}, 'submitted_by': 'Ann'})
+
+        draft = self.client.get(f'/api/drafts/{draft_id}/')
+        self.assertEqual(draft['ETag'], '"3"')
+        self.assertEqual(draft.json()['form_data'], {
+            'address': {'city': 'Kampala', 'street': 'Main'}, 'phone': '+256700000000'
+        })
+        self.assertEqual(draft.json()['submitted_by'], 'Ann')
+
+    def test_conditional_patch(self, queue_tasks):
+        """If-Match with an old version fails with 412"""
+        draft_id = self.create_draft()
+        self.assertEqual(self.patch(draft_id, {'form_data': {'a': 1}}, HTTP_IF_MATCH='"1"').status_code, 200)
+        self.assertEqual(self.patch(draft_id, {'form_data': {'a': 2}}, HTTP_IF_MATCH='"1"').status_code, 412)
+        self.assertEqual(FormDraft.objects.get(pk=draft_id).form_data, {'a': 1})
+
+    def test_invalid_patches(self, queue_tasks):
+        """Non-object answers and read-only fields are refused; unknown drafts are 404"""
+        draft_id = self.create_draft()
+        self.assertEqual(self.patch(draft_id, {'form_data': [1]}).status_code, 400)
+        self.assertEqual(self.patch(draft_id, {'version': 9}).status_code, 400)
+        self.assertEqual(self.patch('00000000-0000-0000-0000-000000000000', {}).status_code, 404)
+        self.assertEqual(self.patch('not-a-uuid', {}).status_code, 404)
+
+    def test_finalize_moves_files(self, queue_tasks):
+        """Finalizing creates one submission that reuses the uploaded files"""
+        draft_id = self.create_draft({'name': 'Ann'})
+        upload = SimpleUploadedFile('id.pdf', b'%PDF-1.4 id', content_type='application/pdf')
+        response = self.client.post(f'/api/drafts/{draft_id}/files/', {'files': [upload]})
+        self.assertEqual(response.status_code, 201)
+        stored_name = FormDraft.objects.get(pk=draft_id).files.get().file.name
+
+        response = self.client.post(f'/api/drafts/{draft_id}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        submission = FormSubmission.objects.get(id=response.json()['submission_id'])
+        self.assertEqual(submission.form_data, {'name': 'Ann'})
+        form_file = FormFile.objects.get(submission=submission)
+        self.assertEqual(form_file.file.name, stored_name)
+        self.assertTrue(default_storage.exists(stored_name))
+        queue_tasks.assert_called_once_with(submission)
+
+        # Finalizing again returns the same submission; the draft is closed
+        again = self.client.post(f'/api/drafts/{draft_id}/finalize/')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['submission_id'], submission.id)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(self.patch(draft_id, {'form_data': {'a': 1}}).status_code, 409)
+
+    def test_finalize_race_returns_winner(self, queue_tasks):
+        """A finalize that loses the claim rolls back and returns the winner's submission"""
+        draft_id = self.create_draft({'name': 'Ann'})
+        stale = FormDraft.objects.get(pk=draft_id)  # read before the other finalize committed
+        winner = FormSubmission.objects.create(form_template=self.form, form_data={'name': 'Ann'})
+        FormDraft.objects.filter(pk=draft_id).update(submission=winner)
+        lookup = mock.Mock(**{'get.return_value': stale})
+        with mock.patch.object(FormDraft.objects, 'select_related', return_value=lookup):
+            submission, created = drafts.finalize(draft_id)
+        self.assertEqual((submission, created), (winner, False))
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_cleanup_deletes_stale_drafts(self, queue_tasks):
+        """Abandoned drafts are deleted with their uploaded files"""
+        draft_id = self.create_draft()
+        self.client.post(f'/api/drafts/{draft_id}/files/',
+                         {'files': [SimpleUploadedFile('a.txt', b'abc', content_type='text/plain')]})
+        stored_name = FormDraft.objects.get(pk=draft_id).files.get().file.name
+        FormDraft.objects.update(updated_at=timezone.now() - timedelta(days=31))
+        cleanup_stale_drafts()
+        self.assertFalse(FormDraft.objects.exists())
+        self.assertFalse(default_storage.exists(stored_name))
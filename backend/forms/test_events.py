@@ -0,0 +1,98 @@
+"""
+Tests for the submissions changes feed
+"""
+import json
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .models import FormTemplate, SubmissionEvent
+from .tasks import cleanup_submission_events, _run_submission_pipeline
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+@mock.patch('forms.views.queue_submission_tasks')
+class ChangesFeedTest(TestCase):
+    """Test recording submission events and reading them as NDJSON"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Onboarding', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def submit(self):
+        response = self.client.post(f'/api/public/{self.form.id}/submit/', {'form_data': {'name': 'Ann'}},
+                                    format='json')
+        return response.json()['submission_id']
+
+    def changes(self, **params):
+        response = self.client.get('/api/submissions/changes/', params)
+        if response.status_code != 200:
+            return response, []
+        body = b''.join(response.streaming_content).decode()
+        return response, [json.loads(line) for line in body.splitlines()]
+
+    def test_feed_returns_events_after_cursor(self, queue_tasks):
+        """Created and processed events come back in sequence order"""
+        first = self.submit()
+        second = self.submit()
+        self.client.post(f'/api/submissions/{first}/mark_processed/')
+        self.client.post(f'/api/submissions/{first}/mark_processed/')  # already processed: no event
+
+        response, lines = self.changes()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([(line['type'], line['submission']) for line in lines],
+                         [('created', first), ('created', second), ('processed', first)])
+        self.assertEqual(lines[0]['form_template'], self.form.id)
+
+        _, later = self.changes(since=lines[1]['seq'])
+        self.assertEqual([line['type'] for line in later], ['processed'])
+        _, limited = self.changes(limit=1)
+        self.assertEqual(len(limited), 1)
+
+    def test_pipeline_records_processed(self, queue_tasks):
+        """A successful pipeline run records one processed event"""
+        submission_id = self.submit()
+        _run_submission_pipeline(submission_id)
+        _run_submission_pipeline(submission_id)
+        kinds = list(SubmissionEvent.objects.filter(submission_id=submission_id).values_list('kind', flat=True))
+        self.assertEqual(kinds, ['created', 'processed'])
+
+    def test_long_poll_returns_when_nothing_new(self, queue_tasks):
+        """wait bounds how long an empty poll blocks"""
+        with mock.patch('forms.events.time.sleep') as sleep, \
+                mock.patch('forms.events.time.monotonic', side_effect=[0, 0.1, 5]):
+            response, lines = self.changes(wait=1)
+        self.assertEqual(lines, [])
+        sleep.assert_called_once()
+
+    def test_expired_cursor(self, queue_tasks):
+        """Cursors older than the retained log get 410"""
+        for _ in range(3):
+            self.submit()
+        SubmissionEvent.objects.update(created_at=timezone.now() - timedelta(days=60))
+        latest = self.submit()
+        cleanup_submission_events()
+        self.assertEqual(list(SubmissionEvent.objects.values_list('submission_id', flat=True)), [latest])
+
+        response, _ = self.changes(since=1)
+        self.assertEqual(response.status_code, 410)
+        response, lines = self.changes(since=3)
+        self.assertEqual(response.status_code, 200)
+
+    def test_requires_authentication(self, queue_tasks):
+        self.client.force_authenticate(user=None)
+        response, _ = self.changes()
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_parameters(self, queue_tasks):
+        response, _ = self.changes(since='abc')
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.changes(limit=0)
+        self.assertEqual(response.status_code, 400)
+        for wait in ('nan', 'inf', '-1'):
+            response, _ = self.changes(wait=wait)
+            self.assertEqual(response.status_code, 400)
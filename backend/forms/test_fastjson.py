@@ -0,0 +1,74 @@
+"""
+Tests for the orjson renderer, parser and JSON model field
+"""
+import io
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipIf
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from . import fastjson
+from .models import FormTemplate, FormSubmission
+
+
+@skipIf(fastjson.orjson is None, 'orjson is not installed')
+class FastJSONTest(TestCase):
+    """Test orjson-backed (de)serialization and its stdlib fallback"""
+
+    def test_renderer_matches_drf(self):
+        """Rendered output parses to what DRF's own renderer produces"""
+        data = {
+            'when': datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'amount': Decimal('1.50'),
+            'nested': [{'name': 'Amina', 'ok': True, 'none': None}],
+            'big': 2 ** 70,
+            1: 'non-string key',
+        }
+        fast = fastjson.ORJSONRenderer().render(data)
+        self.assertEqual(json.loads(fast), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(json.loads(fast)['when'], '2024-01-02T03:04:05.678901Z')
+
+    def test_parser(self):
+        """UTF-8 bodies parse with orjson; invalid JSON is a ParseError"""
+        parser = fastjson.ORJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"name": "Zoë"}'.encode())), {'name': 'Zoë'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"name": NaN}'))
+        latin1 = parser.parse(io.BytesIO('{"name": "Zoë"}'.encode('latin-1')), parser_context={'encoding': 'latin-1'})
+        self.assertEqual(latin1, {'name': 'Zoë'})
+
+    def test_json_columns_round_trip(self):
+        """form_data and configuration written and read through orjson"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = FormTemplate.objects.create(name='Form', created_by=user, configuration={'theme': 'dark'})
+        data = {'name': 'Zoë', 'count': 3, 'tags': ['a', 'b'], 'nested': {'ok': True}}
+        submission = FormSubmission.objects.create(form_template=form, form_data=data)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT form_data FROM forms_formsubmission WHERE id = %s', [submission.id])
+            self.assertEqual(json.loads(cursor.fetchone()[0]), data)
+        self.assertEqual(FormSubmission.objects.get(id=submission.id).form_data, data)
+        self.assertEqual(FormSubmission.objects.filter(form_data__name='Zoë').count(), 1)
+        self.assertEqual(FormTemplate.objects.get(id=form.id).configuration, {'theme': 'dark'})
+
+    @override_settings(FORMS_ORJSON_ENABLED=False)
+    def test_disabled_uses_stdlib(self):
+        """With the setting off the renderer defers to DRF's JSONRenderer"""
+        data = {'name': 'Zoë'}
+        self.assertEqual(fastjson.ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_responses(self):
+        """Endpoints render and parse through the configured classes"""
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_login(user)
+        response = self.client.post('/api/forms/', {'name': 'Form', 'fields': [
+            {'field_name': 'email', 'field_type': 'email', 'label': 'Email', 'configuration': {'x': 1}}
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        template = FormTemplate.objects.get(name='Form')
+        detail = self.client.get(f'/api/forms/{template.id}/').json()
+        self.assertEqual(detail['fields'][0]['configuration'], {'x': 1})
@@ -0,0 +1,92 @@
+"""
+Tests for batched field editing
+"""
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from .models import FormTemplate, FormField, FormValidationRule
+
+
+class FieldChangesTest(TestCase):
+    """Test creating, updating, deleting and reordering fields in one request"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Onboarding', created_by=self.user)
+        self.name = FormField.objects.create(form_template=self.form, field_name='name', field_type='text',
+                                             label='Name', order=0)
+        self.email = FormField.objects.create(form_template=self.form, field_name='email', field_type='email',
+                                              label='Email', order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/forms/{self.form.id}/field-changes/'
+
+    def apply(self, operations):
+        return self.client.post(self.url, {'operations': operations}, format='json')
+
+    def test_apply_batch(self):
+        """Operations apply in order and the response lists the fields"""
+        FormValidationRule.objects.create(field=self.email, rule_type='min_length', rule_value='3',
+                                          error_message='Too short')
+        response = self.apply([
+            {'op': 'create', 'field': {'field_name': 'phone', 'field_type': 'phone', 'label': 'Phone'}},
+            {'op': 'update', 'id': self.name.id, 'field': {'label': 'Full name', 'is_required': True}},
+            {'op': 'delete', 'id': self.email.id},
+            {'op': 'create', 'field': {'field_name': 'email', 'field_type': 'email', 'label': 'Work email'}},
+            {'op': 'reorder', 'fields': ['email', 'phone', 'name']},
+        ])
+        self.assertEqual(response.status_code, 200)
+        fields = response.json()['fields']
+        self.assertEqual([field['field_name'] for field in fields], ['email', 'phone', 'name'])
+        self.assertEqual(fields[2]['label'], 'Full name')
+        self.assertTrue(fields[2]['is_required'])
+        self.assertFalse(FormValidationRule.objects.exists())
+
+    def test_invalid_batch_changes_nothing(self):
+        """Any invalid operation rejects the whole batch"""
+        response = self.apply([
+            {'op': 'update', 'id': self.name.id, 'field': {'label': 'Full name'}},
+            {'op': 'create', 'field': {'field_name': 'email', 'field_type': 'email', 'label': 'Again'}},
+            {'op': 'delete', 'id': 999},
+            {'op': 'rename'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()['operations']), ['1', '2', '3'])
+        self.name.refresh_from_db()
+        self.assertEqual(self.name.label, 'Name')
+
+    def test_swap_names(self):
+        """Two fields can trade names in one batch"""
+        response = self.apply([
+            {'op': 'update', 'id': self.name.id, 'field': {'field_name': 'email'}},
+            {'op': 'update', 'id': self.email.id, 'field': {'field_name': 'name'}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.name.refresh_from_db()
+        self.assertEqual(self.name.field_name, 'email')
+
+    def test_large_template_query_count(self):
+        """Saving 200 fields and deleting 100 with rules takes a fixed number of queries"""
+        old = FormField.objects.bulk_create([
+            FormField(form_template=self.form, field_name=f'old_{i}', field_type='text', label=f'Old {i}', order=2 + i)
+            for i in range(100)
+        ])
+        FormValidationRule.objects.bulk_create([
+            FormValidationRule(field=field, rule_type='min_length', rule_value='1', error_message='Too short')
+            for field in old
+        ])
+        operations = [{'op': 'delete', 'id': field.id} for field in old]
+        operations += [
+            {'op': 'create', 'field': {'field_name': f'field_{i}', 'field_type': 'text', 'label': f'Field {i}'}}
+            for i in range(200)
+        ]
+        operations.append({'op': 'reorder', 'fields': [f'field_{i}' for i in reversed(range(200))] + ['name']})
+        operations.append({'op': 'update', 'id': self.email.id, 'field': {'label': 'Work email'}})
+        # Template and fields, rule and field deletes, one update, three
+        # insert batches (SQLite's parameter limit), template timestamp, the
+        # response, two savepoints
+        with self.assertNumQueries(13):
+            response = self.apply(operations)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['fields'][0]['field_name'], 'field_199')
+        self.assertFalse(FormValidationRule.objects.filter(field__in=old).exists())
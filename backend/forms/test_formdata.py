@@ -0,0 +1,81 @@
+"""
+Tests for compact form_data storage
+"""
+from io import StringIO
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from rest_framework.test import APIClient
+from . import fastjson, formdata
+from .models import FormTemplate, FormField, FormDataSchema, FormSubmission
+
+
+def stored(submission):
+    """form_data as it is in the database, bypassing the field's decoding"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT form_data FROM forms_formsubmission WHERE id = %s', [submission.pk])
+        return fastjson.loads(cursor.fetchone()[0])
+
+
+@override_settings(FORMS_COMPACT_FORM_DATA=True)
+class CompactFormDataTest(TestCase):
+    """Test encoding, decoding and converting stored answers"""
+
+    def setUp(self):
+        formdata.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Onboarding', created_by=self.user)
+        for order, name in enumerate(['name', 'email', 'age']):
+            FormField.objects.create(form_template=self.form, field_name=name, field_type='text',
+                                     label=name.title(), order=order)
+
+    def tearDown(self):
+        formdata.reset()
+
+    def test_round_trip(self):
+        """Values are stored by position; missing keys and extras survive"""
+        data = {'name': 'Ann', 'age': None, 'nickname': 'A'}
+        submission = FormSubmission.objects.create(form_template=self.form, form_data=data)
+
+        schema = FormDataSchema.objects.get(form_template=self.form)
+        self.assertEqual(schema.field_names, ['name', 'email', 'age'])
+        self.assertEqual(stored(submission), ['#fd1', schema.pk, 'Ann', None, None, {'m': [1], 'x': {'nickname': 'A'}}])
+        formdata.reset()
+        self.assertEqual(FormSubmission.objects.get(pk=submission.pk).form_data, data)
+
+    def test_schema_versions(self):
+        """Changing the fields records a new schema; older rows still decode"""
+        old = FormSubmission.objects.create(form_template=self.form, form_data={'name': 'Ann', 'email': 'a@x.io', 'age': 30})
+        FormField.objects.filter(form_template=self.form, field_name='age').delete()
+        formdata.reset()
+        new = FormSubmission.objects.create(form_template=self.form, form_data={'name': 'Bo', 'email': 'b@x.io'})
+
+        versions = list(FormDataSchema.objects.filter(form_template=self.form).values_list('version', flat=True))
+        self.assertEqual(sorted(versions), [1, 2])
+        self.assertEqual(len(stored(new)), 4)
+        self.assertEqual(FormSubmission.objects.get(pk=old.pk).form_data['age'], 30)
+        self.assertEqual(FormSubmission.objects.get(pk=new.pk).form_data, {'name': 'Bo', 'email': 'b@x.io'})
+
+    def test_api_reads_encoded_rows(self):
+        """Encoded rows are served as plain objects"""
+        submission = FormSubmission.objects.create(form_template=self.form, form_data={'name': 'Ann', 'email': 'a@x.io', 'age': 30})
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(f'/api/submissions/{submission.pk}/')
+        self.assertEqual(response.json()['form_data'], {'name': 'Ann', 'email': 'a@x.io', 'age': 30})
+
+    def test_command_converts_rows(self):
+        """encode_form_data encodes plain rows and --decode restores them"""
+        with override_settings(FORMS_COMPACT_FORM_DATA=False):
+            submission = FormSubmission.objects.create(form_template=self.form, form_data={'name': 'Ann', 'email': 'a@x.io'})
+        self.assertEqual(stored(submission), {'name': 'Ann', 'email': 'a@x.io'})
+
+        output = StringIO()
+        call_command('encode_form_data', stdout=output)
+        self.assertIn('Rewrote 1 rows', output.getvalue())
+        self.assertTrue(formdata.is_encoded(stored(submission)))
+        self.assertEqual(FormSubmission.objects.get(pk=submission.pk).form_data, {'name': 'Ann', 'email': 'a@x.io'})
+
+        call_command('encode_form_data', decode=True, stdout=StringIO())
+        self.assertEqual(stored(submission), {'name': 'Ann', 'email': 'a@x.io'})
@@ -0,0 +1,105 @@
+"""
+Tests for Idempotency-Key handling on submission endpoints
+"""
+import threading
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from . import idempotency
+from .models import FormTemplate, FormSubmission, IdempotencyRecord
+from .tasks import cleanup_idempotency_records
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+@mock.patch('forms.views.queue_submission_tasks')
+class IdempotencyKeyTest(TestCase):
+    """Test replays, key reuse and expiry"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        self.url = f'/api/public/{self.form.id}/submit/'
+
+    def submit(self, key, form_data=None):
+        return self.client.post(self.url, {'form_data': form_data or {'name': 'Ann'}},
+                                content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self, queue_tasks):
+        """A retried submit returns the stored response without doing the work again"""
+        first = self.submit('abc')
+        second = self.submit('abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(FormSubmission.objects.count(), 1)
+        self.assertEqual(queue_tasks.call_count, 1)
+
+        # Other keys and requests without a key aren't affected
+        self.submit('def')
+        self.client.post(self.url, {'form_data': {}}, content_type='application/json')
+        self.assertEqual(FormSubmission.objects.count(), 3)
+
+    def test_key_reused_for_different_request(self, queue_tasks):
+        self.submit('abc')
+        self.assertEqual(self.submit('abc', {'name': 'Bob'}).status_code, 422)
+
+    def test_create_endpoint(self, queue_tasks):
+        """POST /api/submissions/ replays too"""
+        payload = {'form_template': self.form.id, 'form_data': {'name': 'Ann'}}
+        for _ in range(2):
+            response = self.client.post('/api/submissions/', payload, content_type='application/json',
+                                        HTTP_IDEMPOTENCY_KEY='xyz')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(FormSubmission.objects.count(), 1)
+
+    def test_expired_and_abandoned_keys_run_again(self, queue_tasks):
+        """Expired records and locks of dead requests are taken over; cleanup deletes expired rows"""
+        self.submit('abc')
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self.submit('abc'))
+        self.assertEqual(FormSubmission.objects.count(), 2)
+
+        IdempotencyRecord.objects.create(
+            scope=f'public-submit:{self.form.id}', key='dead', fingerprint='x',
+            locked_until=timezone.now() - timedelta(seconds=1), expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self.submit('dead').status_code, 201)
+
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        cleanup_idempotency_records()
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    @override_settings(FORMS_IDEMPOTENCY_WAIT=0.1)
+    def test_in_progress_duplicate_gets_conflict(self, queue_tasks):
+        """A duplicate that outwaits the lock gets 409 with Retry-After"""
+        record, claimed = idempotency.acquire(f'public-submit:{self.form.id}', 'abc', 'x')
+        self.assertTrue(claimed)
+        with mock.patch('forms.idempotency.request_fingerprint', return_value='x'):
+            response = self.submit('abc')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+class ConcurrentIdempotencyTest(TransactionTestCase):
+    """Test that concurrent duplicates wait for the first request"""
+
+    def test_concurrent_duplicate_waits(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        scope = f'public-submit:{form.id}'
+        record, _ = idempotency.acquire(scope, 'abc', 'x')
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(idempotency.acquire(scope, 'abc', 'x')))
+        waiter.start()
+        record.status_code = 201
+        record.response_data = {'submission_id': 1}
+        record.locked_until = None
+        record.save()
+        waiter.join()
+        replayed, claimed = results[0]
+        self.assertFalse(claimed)
+        self.assertEqual(replayed.response_data, {'submission_id': 1})
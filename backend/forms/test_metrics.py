@@ -0,0 +1,171 @@
+"""
+Tests for request/task metrics and the /metrics endpoint
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from types import SimpleNamespace
+from unittest import mock
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from . import metrics
+from .models import FormTemplate
+
+
+def value(totals, name, **labels):
+    return totals.get(metrics._key(name, labels))
+
+
+class MetricsMiddlewareTest(TestCase):
+    """Test per-route request metrics"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=user)
+
+    def test_request_latency_and_queries_are_recorded(self):
+        """Requests are labelled by URL name with their latency and query count"""
+        labels = {'method': 'GET', 'route': 'public-list', 'status': 200}
+        before = value(metrics.snapshot(), 'forms_http_request_duration_seconds', **labels)
+        before_count = sum(before[:-1]) if before else 0
+
+        self.client.get('/api/public/')
+
+        totals = metrics.snapshot()
+        histogram = value(totals, 'forms_http_request_duration_seconds', **labels)
+        self.assertEqual(sum(histogram[:-1]), before_count + 1)
+        queries = value(totals, 'forms_http_db_queries', route='public-list')
+        self.assertGreater(queries[-1], 0)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    @mock.patch('forms.views.queue_submission_tasks')
+    def test_upload_bytes_are_counted(self, queue_tasks):
+        """Multipart submissions count their body size"""
+        before = value(metrics.snapshot(), 'forms_http_upload_bytes_total', route='public-submit') or 0
+        self.client.post(f'/api/public/{self.form.id}/submit/', {
+            'submitted_by': 'John Doe',
+            'files': SimpleUploadedFile('notes.txt', b'x' * 2048),
+        })
+        after = value(metrics.snapshot(), 'forms_http_upload_bytes_total', route='public-submit')
+        self.assertGreater(after - before, 2048)
+
+    def test_cache_lookups_are_attributed_to_the_request(self):
+        """record_cache counts per cache and per route of the current request"""
+        with metrics.track_request_cache() as lookups:
+            metrics.record_cache('templates', hit=True)
+            metrics.record_cache('templates', hit=False)
+        self.assertEqual(lookups, {'hit': 1, 'miss': 1})
+        self.assertIsNotNone(value(metrics.snapshot(), 'forms_cache_requests_total', cache='templates', result='hit'))
+
+    @override_settings(FORMS_METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        """The endpoint serves Prometheus text and honours the optional token"""
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+        self.client.get('/api/public/')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE forms_http_request_duration_seconds histogram', body)
+        self.assertIn('forms_http_request_duration_seconds_bucket{method="GET",route="public-list",status="200",le="+Inf"}', body)
+
+    @override_settings(FORMS_METRICS_TOKEN='')
+    def test_metrics_without_token_are_staff_only(self):
+        """Without a token the endpoint isn't public outside DEBUG"""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class MetricsAggregationTest(SimpleTestCase):
+    """Test shard merging, exposition and task hooks"""
+
+    def test_histogram_exposition_is_cumulative(self):
+        """Bucket counts are rendered cumulatively with _sum and _count"""
+        metric = metrics.METRICS['forms_http_db_queries']
+        counts = [0] * (len(metric.buckets) + 2)
+        counts[0], counts[2], counts[len(metric.buckets)] = 2, 1, 1
+        counts[-1] = 500
+        body = metrics.render_prometheus({('forms_http_db_queries', (('route', 'x'),)): counts})
+        self.assertIn('forms_http_db_queries_bucket{route="x",le="1"} 2', body)
+        self.assertIn('forms_http_db_queries_bucket{route="x",le="5"} 3', body)
+        self.assertIn('forms_http_db_queries_bucket{route="x",le="+Inf"} 4', body)
+        self.assertIn('forms_http_db_queries_count{route="x"} 4', body)
+
+    def test_finished_threads_are_retired(self):
+        """Samples from finished threads survive without keeping their shard"""
+        def work():
+            for _ in range(10):
+                metrics.inc('forms_cache_requests_total', cache='thread-test', result='hit')
+
+        before = value(metrics.snapshot(), 'forms_cache_requests_total', cache='thread-test', result='hit') or 0
+        live_shards = len(metrics._shards.live)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = value(metrics.snapshot(), 'forms_cache_requests_total', cache='thread-test', result='hit')
+        self.assertEqual(after - before, 40)
+        self.assertEqual(len(metrics._shards.live), live_shards)
+
+    def test_process_files_are_merged(self):
+        """With a metrics directory, totals of other processes are added in"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        other = [['forms_cache_requests_total', [['cache', 'file-test'], ['result', 'miss']], 5]]
+        with open(os.path.join(directory, 'metrics_1_other.json'), 'w') as handle:
+            json.dump(other, handle)
+
+        with override_settings(FORMS_METRICS_DIR=directory):
+            metrics.inc('forms_cache_requests_total', 2, cache='file-test', result='miss')
+            metrics.flush()
+            totals = metrics.collect()
+            own_files = [name for name in os.listdir(directory) if name != 'metrics_1_other.json']
+
+        self.assertEqual(len(own_files), 1)
+        local = value(metrics.snapshot(), 'forms_cache_requests_total', cache='file-test', result='miss')
+        self.assertEqual(value(totals, 'forms_cache_requests_total', cache='file-test', result='miss'), local + 5)
+
+    def test_exited_process_files_are_folded(self):
+        """Files of exited processes on this host go into the archive, counted once"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        dead = os.path.join(directory, f'metrics_{socket.gethostname()}_{exited.pid}_token.json')
+        with open(dead, 'w') as handle:
+            json.dump([['forms_cache_requests_total', [['cache', 'fold-test'], ['result', 'miss']], 3]], handle)
+
+        with override_settings(FORMS_METRICS_DIR=directory):
+            for _ in range(2):
+                totals = metrics.collect()
+                self.assertEqual(value(totals, 'forms_cache_requests_total', cache='fold-test', result='miss'), 3)
+        self.assertFalse(os.path.exists(dead))
+        self.assertIn('archive.json', os.listdir(directory))
+
+    def test_task_wait_and_run_time(self):
+        """Task hooks split queue wait from run time using the publish header"""
+        headers = {}
+        metrics.stamp_publish_time(headers=headers)
+        request = SimpleNamespace(delivery_info={'routing_key': 'notifications'}, is_eager=False)
+        setattr(request, metrics.PUBLISHED_AT_HEADER, headers[metrics.PUBLISHED_AT_HEADER] - 2)
+        task = SimpleNamespace(name='forms.tasks.example', request=request)
+
+        metrics.start_task_timer(task_id='abc', task=task)
+        metrics.stop_task_timer(task_id='abc', task=task, state='SUCCESS')
+
+        totals = metrics.snapshot()
+        wait = value(totals, 'forms_task_queue_wait_seconds', task='forms.tasks.example', queue='notifications')
+        self.assertGreaterEqual(wait[-1], 2)
+        run = value(totals, 'forms_task_run_seconds', task='forms.tasks.example', state='SUCCESS')
+        self.assertEqual(sum(run[:-1]), 1)
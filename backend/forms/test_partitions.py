@@ -0,0 +1,71 @@
+"""
+Tests for monthly partitions and retention
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.utils import timezone
+from . import partitions
+from .models import FormTemplate, FormSubmission, NotificationLog
+from .tasks import cleanup_old_notifications, maintain_partitions
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class PartitionPlanTest(SimpleTestCase):
+    """Test which monthly partitions are created and expired"""
+
+    def test_upcoming_months_cross_the_year(self):
+        """Months ahead start at the first instant of each month in UTC"""
+        self.assertEqual(partitions.upcoming_months(utc(2025, 11, 17, 9, 30), 2),
+                         [utc(2025, 11, 1), utc(2025, 12, 1), utc(2026, 1, 1)])
+        self.assertEqual(partitions.partition_name('forms_formsubmission', utc(2026, 1, 1)),
+                         'forms_formsubmission_p202601')
+
+    def test_expired_partitions(self):
+        """Only partitions ending by the cutoff expire; the default partition never does"""
+        found = [
+            partitions.Partition('t_p_legacy', partitions.upper_bound("FOR VALUES FROM (MINVALUE) TO ('2025-10-01 00:00:00+00')")),
+            partitions.Partition('t_p202510', partitions.upper_bound("FOR VALUES FROM ('2025-10-01 00:00:00+00') TO ('2025-11-01 00:00:00+00')")),
+            partitions.Partition('t_default', partitions.upper_bound('DEFAULT')),
+        ]
+        self.assertEqual(found[1].upper, utc(2025, 11, 1))
+        self.assertEqual([p.name for p in partitions.expired(found, utc(2025, 10, 20))], ['t_p_legacy'])
+        self.assertEqual([p.name for p in partitions.expired(found, utc(2026, 1, 1))], ['t_p_legacy', 't_p202510'])
+
+
+class RetentionTest(TestCase):
+    """Test retention on a database without partitions"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        form = FormTemplate.objects.create(name='Onboarding', created_by=user)
+        submission = FormSubmission.objects.create(form_template=form, form_data={})
+        NotificationLog.objects.bulk_create([NotificationLog(submission=submission) for _ in range(5)])
+        old = NotificationLog.objects.order_by('pk')[:3].values_list('pk', flat=True)
+        NotificationLog.objects.filter(pk__in=list(old)).update(created_at=timezone.now() - timedelta(days=40))
+
+    @override_settings(FORMS_RETENTION_DELETE_BATCH=2)
+    def test_old_notifications_deleted_in_batches(self):
+        """Logs past the retention go, a batch per transaction"""
+        with CaptureQueriesContext(connection) as queries:
+            cleanup_old_notifications()
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertEqual(NotificationLog.objects.count(), 2)
+
+    def test_partitioning_needs_postgresql(self):
+        """The command and task explain themselves on SQLite"""
+        out = StringIO()
+        call_command('partitions', stdout=out)
+        self.assertIn('needs PostgreSQL', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('partitions', '--convert')
+        with override_settings(FORMS_PARTITIONING_ENABLED=True):
+            self.assertEqual(maintain_partitions(), 'Partitioning is not enabled')
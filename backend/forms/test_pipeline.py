@@ -0,0 +1,122 @@
+"""
+Tests for the submission processing pipeline
+"""
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from .models import FormTemplate, FormField, FormSubmission, FormValidationRule
+from .pipeline import Stage, registry, register_stage, topological_levels, run_pipeline
+from .tasks import process_form_submission, process_submissions_batch
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PipelineTest(TestCase):
+    """Test pipeline stage selection, execution and reporting"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='KYC Form', created_by=self.user)
+        self.email_field = FormField.objects.create(
+            form_template=self.form,
+            field_name='email',
+            field_type='email',
+            label='Email',
+            is_required=True,
+            order=0
+        )
+        FormValidationRule.objects.create(
+            field=self.email_field,
+            rule_type='max_length',
+            rule_value='30',
+            error_message='Email is too long'
+        )
+        self.submission = FormSubmission.objects.create(
+            form_template=self.form,
+            submitted_by='John Doe',
+            form_data={'email': ' John@Example.com '}
+        )
+
+    def test_topological_levels_group_independent_stages(self):
+        """Stages without mutual dependencies share a level"""
+        stages = [
+            Stage('a', None),
+            Stage('b', None),
+            Stage('c', None, depends_on=['a', 'b']),
+        ]
+        levels = topological_levels(stages)
+        self.assertEqual([[s.name for s in level] for level in levels], [['a', 'b'], ['c']])
+
+    def test_topological_levels_reject_cycles(self):
+        """Cyclic dependencies are reported"""
+        with self.assertRaises(ValueError):
+            topological_levels([Stage('a', None, depends_on=['b']), Stage('b', None, depends_on=['a'])])
+
+    def test_pipeline_records_stage_timings(self):
+        """A successful run marks the submission processed and stores timings"""
+        process_form_submission(self.submission.id)
+        self.submission.refresh_from_db()
+
+        self.assertTrue(self.submission.is_processed)
+        self.assertIsNotNone(self.submission.processed_at)
+        stages = self.submission.processing_report['stages']
+        self.assertEqual(set(stages), {'validation', 'enrichment', 'document_checks', 'export_hooks'})
+        for entry in stages.values():
+            self.assertEqual(entry['status'], 'ok')
+            self.assertIn('duration_ms', entry)
+        outputs = self.submission.processing_report['outputs']
+        self.assertEqual(outputs['enrichment']['normalized']['email'], 'john@example.com')
+
+    def test_validation_failure_skips_dependents(self):
+        """Failing validation skips dependent stages and leaves the submission unprocessed"""
+        self.submission.form_data = {'email': 'x' * 40}
+        self.submission.save()
+
+        process_form_submission(self.submission.id)
+        self.submission.refresh_from_db()
+
+        self.assertFalse(self.submission.is_processed)
+        stages = self.submission.processing_report['stages']
+        self.assertEqual(stages['validation']['status'], 'failed')
+        self.assertEqual(stages['validation']['details'], {'email': ['Email is too long']})
+        self.assertEqual(stages['enrichment']['status'], 'skipped')
+        self.assertEqual(stages['document_checks']['status'], 'ok')
+
+    def test_stage_outputs_are_memoized(self):
+        """A second run over unchanged data reuses memoized outputs"""
+        run_pipeline(self.submission)
+        report = run_pipeline(self.submission)
+        self.assertTrue(report['stages']['validation']['cached'])
+        self.assertFalse(report['stages']['export_hooks']['cached'])
+
+    def test_template_specific_stage(self):
+        """Stages registered for a template only run for that template"""
+        calls = []
+
+        @register_stage('kyc_only', templates=['KYC Form'])
+        def kyc_only(context):
+            calls.append(context.submission_id)
+            return {}
+
+        other = FormTemplate.objects.create(name='Other Form', created_by=self.user)
+        try:
+            self.assertIn('kyc_only', [s.name for s in registry.stages_for(self.form)])
+            self.assertNotIn('kyc_only', [s.name for s in registry.stages_for(other)])
+            run_pipeline(self.submission)
+            self.assertEqual(calls, [self.submission.id])
+        finally:
+            registry.unregister('kyc_only')
+
+    def test_configured_pipeline_includes_dependencies(self):
+        """Listing stages in the template configuration pulls in their dependencies"""
+        self.form.configuration = {'pipeline': ['enrichment']}
+        self.form.save()
+        names = {stage.name for stage in registry.stages_for(self.form)}
+        self.assertEqual(names, {'validation', 'enrichment'})
+
+    def test_batch_fans_out_with_chord(self):
+        """Large batches are chunked into a chord of chunk tasks"""
+        with mock.patch('forms.tasks.chord') as chord_mock:
+            process_submissions_batch(range(250), chunk_size=100)
+        header = list(chord_mock.call_args[0][0].tasks)
+        self.assertEqual(len(header), 3)
+        self.assertEqual(header[2].args[0], list(range(200, 250)))
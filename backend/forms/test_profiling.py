@@ -0,0 +1,67 @@
+"""
+Tests for on-demand request profiling
+"""
+import marshal
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+from .models import FormTemplate, RequestProfile
+
+
+class ProfilerMiddlewareTest(TestCase):
+    """Test profile triggers, storage and admin download"""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        FormTemplate.objects.create(name='Test Form', created_by=self.staff)
+
+    def bearer(self, user):
+        return f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    def test_staff_header_profiles_request(self):
+        """A staff JWT with X-Profile stores a profile including ORM calls"""
+        response = self.client.get('/api/forms/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.bearer(self.staff))
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get(id=response['X-Profile-Id'])
+        self.assertEqual(profile.trigger, 'header')
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.view_name, 'formtemplate-list')
+        self.assertGreater(profile.query_count, 0)
+        self.assertIn('serializer', profile.summary.lower())
+        functions = marshal.loads(bytes(profile.stats))
+        self.assertTrue(any(filename.endswith('django/db/models/query.py') for filename, _, _ in functions))
+
+    def test_header_is_ignored_for_non_staff(self):
+        """Regular users and anonymous clients can't trigger profiling"""
+        self.client.get('/api/forms/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.bearer(self.user))
+        response = self.client.get('/api/forms/', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(FORMS_PROFILE_SAMPLE_RATE=1.0, FORMS_PROFILE_SAMPLE_PATHS=[r'^/api/forms/$'], FORMS_PROFILE_KEEP=2)
+    def test_sampling_matches_paths_and_prunes(self):
+        """Sampled profiles are limited to configured paths and old ones are pruned"""
+        for _ in range(3):
+            self.client.get('/api/forms/')
+        self.client.get('/api/public/')
+
+        profiles = RequestProfile.objects.all()
+        self.assertEqual(profiles.count(), 2)
+        self.assertEqual({profile.trigger for profile in profiles}, {'sampled'})
+        self.assertEqual({profile.path for profile in profiles}, {'/api/forms/'})
+
+    def test_admin_download(self):
+        """Staff with admin access can download the .prof file"""
+        self.staff.is_superuser = True
+        self.staff.save()
+        response = self.client.get('/api/forms/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=self.bearer(self.staff))
+        profile_id = response['X-Profile-Id']
+
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(f'/admin/forms/requestprofile/{profile_id}/change/'), '.prof')
+        response = self.client.get(f'/admin/forms/requestprofile/{profile_id}/download/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'profile_{profile_id}.prof', response['Content-Disposition'])
+        self.assertIsInstance(marshal.loads(response.content), dict)
@@ -0,0 +1,109 @@
+"""
+Tests for live submission event streams
+"""
+import asyncio
+from unittest import mock
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from . import pubsub
+from .models import FormTemplate
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0, FORMS_PUBSUB_REDIS_URL='',
+                   FORMS_STREAM_HEARTBEAT=0.05, FORMS_STREAM_MAX_SECONDS=5)
+@mock.patch('forms.views.queue_submission_tasks')
+class SubmissionStreamTest(TestCase):
+    """Test pushing submission events to open streams"""
+
+    def setUp(self):
+        pubsub.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Onboarding', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        pubsub.reset()
+
+    def submit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/public/{self.form.id}/submit/', {'form_data': {'name': 'Ann'}},
+                                        format='json')
+        return response.json()['submission_id']
+
+    def open_stream(self, **headers):
+        response = self.client.get('/api/submissions/stream/', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = iter(response.streaming_content)
+        self.assertEqual(next(stream), pubsub.RETRY_FRAME)
+        return response, stream
+
+    def test_events_reach_every_open_stream(self, queue_tasks):
+        """One published event is delivered to all open streams, without queries"""
+        first, first_stream = self.open_stream()
+        second, second_stream = self.open_stream()
+        submission_id = self.submit()
+        with self.assertNumQueries(0):
+            for stream in (first_stream, second_stream):
+                frame = next(stream).decode()
+                self.assertIn('event: created\n', frame)
+                self.assertIn(f'"submission":{submission_id}', frame)
+        self.assertEqual(next(first_stream), pubsub.HEARTBEAT_FRAME)
+        first.close()
+        second.close()
+        self.assertFalse(pubsub.get_broker().subscriptions)
+
+    def test_reconnect_replays_missed_events(self, queue_tasks):
+        """Last-Event-ID replays the events after it, then continues live"""
+        missed = [self.submit(), self.submit()]
+        response, stream = self.open_stream(HTTP_LAST_EVENT_ID='0')
+        replayed = [next(stream).decode() for _ in missed]
+        self.assertEqual([f'"submission":{pk}' in frame for pk, frame in zip(missed, replayed)], [True, True])
+        live = self.submit()
+        self.assertIn(f'"submission":{live}', next(stream).decode())
+        response.close()
+
+    @override_settings(FORMS_STREAM_BACKFILL=1)
+    def test_reconnect_too_far_behind_resyncs(self, queue_tasks):
+        """A client that missed more than the backfill limit is told to reload"""
+        self.submit()
+        self.submit()
+        response, stream = self.open_stream(HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(next(stream), pubsub.RESYNC_FRAME)
+        response.close()
+
+    def test_failed_backfill_unsubscribes(self, queue_tasks):
+        """A stream whose backfill query fails doesn't leave its subscription behind"""
+        with mock.patch('forms.views.events.stream_backlog', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.client.get('/api/submissions/stream/', HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(pubsub.get_broker().subscriptions, set())
+
+    def test_stream_requires_authentication(self, queue_tasks):
+        """Anonymous clients can't open a stream"""
+        self.assertEqual(APIClient().get('/api/submissions/stream/').status_code, 401)
+        self.assertEqual(self.client.get('/api/submissions/stream/?since=x').status_code, 400)
+
+    def test_async_reader(self, queue_tasks):
+        """Streams served on an event loop wake up on events from other threads"""
+        broker = pubsub.get_broker()
+
+        async def read():
+            subscription = broker.subscribe()
+            stream = pubsub.aframes(subscription, [], 0)
+            frames = stream.__aiter__()
+            self.assertEqual(await frames.__anext__(), pubsub.RETRY_FRAME)
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, lambda: loop.run_in_executor(
+                None, broker.publish, [pubsub.message(7, 'processed', 3, 1)]
+            ))
+            frame = await frames.__anext__()
+            stream.close()  # what the response does when the client goes away
+            return frame
+
+        frame = asyncio.run(read())
+        self.assertTrue(frame.startswith(b'id: 7\nevent: processed\n'))
+        self.assertFalse(broker.subscriptions)
@@ -0,0 +1,91 @@
+"""
+Tests for template snapshots
+"""
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from . import snapshots
+from .models import FormTemplate, FormField, FormValidationRule, FormTemplateSnapshot, FormSubmission
+from .pipeline import run_pipeline
+
+
+@override_settings(FORMS_THROTTLE_ENABLED=False, FORMS_ADMISSION_MAX_QUEUE_DEPTH=0)
+@mock.patch('forms.views.queue_submission_tasks')
+class TemplateSnapshotTest(TestCase):
+    """Test publishing, recording and reading template snapshots"""
+
+    def setUp(self):
+        snapshots.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Onboarding', created_by=self.user)
+        self.email = FormField.objects.create(form_template=self.form, field_name='email', field_type='email',
+                                              label='Email', is_required=True)
+        FormValidationRule.objects.create(field=self.email, rule_type='min_length', rule_value='5',
+                                          error_message='Too short')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        snapshots.reset()
+
+    def submit(self, form_data):
+        response = self.client.post(f'/api/public/{self.form.id}/submit/', {'form_data': form_data}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return FormSubmission.objects.get(pk=response.json()['submission_id'])
+
+    def test_publish_is_content_addressed(self, queue_tasks):
+        """Publishing an unchanged template returns the same snapshot"""
+        response = self.client.post(f'/api/forms/{self.form.id}/publish/')
+        self.assertEqual(response.status_code, 201)
+        digest = response.json()['snapshot']
+        again = self.client.post(f'/api/forms/{self.form.id}/publish/')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['snapshot'], digest)
+
+        self.email.label = 'Work email'
+        self.email.save()
+        changed = self.client.post(f'/api/forms/{self.form.id}/publish/')
+        self.assertEqual(changed.status_code, 201)
+        self.assertNotEqual(changed.json()['snapshot'], digest)
+        self.assertEqual(FormTemplateSnapshot.objects.filter(form_template=self.form).count(), 2)
+
+    def test_submission_keeps_its_snapshot(self, queue_tasks):
+        """Old submissions render with the fields they were answered with"""
+        old = self.submit({'email': 'ann@example.com'})
+        self.email.label = 'Work email'
+        self.email.save()
+        new = self.submit({'email': 'bo@example.com'})
+        self.assertNotEqual(old.snapshot_id, new.snapshot_id)
+
+        snapshots.reset()
+        self.client.get(f'/api/submissions/{old.pk}/?expand=template_snapshot')  # warm the cache
+        with self.assertNumQueries(2):  # submission and its files; no field queries
+            response = self.client.get(f'/api/submissions/{old.pk}/?expand=template_snapshot')
+        snapshot = response.json()['template_snapshot']
+        self.assertEqual(response.json()['snapshot'], old.snapshot_id)
+        self.assertEqual(snapshot['fields'][0]['label'], 'Email')
+        self.assertEqual(snapshot['fields'][0]['validation_rules'][0]['rule_value'], '5')
+
+    def test_unchanged_template_reuses_snapshot(self, queue_tasks):
+        """Submitting again doesn't query fields while the template is unchanged"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit({'email': 'ann@example.com'})
+        # Template (view and serializer), the insert, its changes feed event,
+        # and the test reading the submission back
+        with self.assertNumQueries(5):
+            self.submit({'email': 'bo@example.com'})
+
+    def test_pipeline_uses_snapshot_fields(self, queue_tasks):
+        """Processing validates against the snapshot, not the current fields"""
+        submission = self.submit({'email': 'ann@example.com'})
+        FormField.objects.create(form_template=self.form, field_name='phone', field_type='phone',
+                                 label='Phone', is_required=True)
+        report = run_pipeline(submission)
+        self.assertEqual(report['stages']['validation']['status'], 'ok')
+
+    def test_delete_template(self, queue_tasks):
+        """Deleting a template removes its submissions and snapshots"""
+        self.submit({'email': 'ann@example.com'})
+        self.form.delete()
+        self.assertFalse(FormTemplateSnapshot.objects.exists())
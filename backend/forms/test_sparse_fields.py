@@ -0,0 +1,84 @@
+"""
+Tests for summary list representations and sparse fieldsets
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from .models import FormTemplate, FormField, FormSubmission, FormFile, FormValidationRule
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'sparse-fields-tests'}})
+class SparseFieldsetsTest(APITestCase):
+    """Test summary serializers and ?fields= / ?expand="""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.forms = []
+        for index in range(3):
+            form = FormTemplate.objects.create(name=f'Form {index}', created_by=self.user)
+            for order in range(4):
+                field = FormField.objects.create(form_template=form, field_name=f'field_{order}',
+                                                 field_type='text', label=f'Field {order}', order=order)
+                FormValidationRule.objects.create(field=field, rule_type='max_length', rule_value='10',
+                                                  error_message='Too long')
+            self.forms.append(form)
+        self.submission = FormSubmission.objects.create(
+            form_template=self.forms[0], submitted_by='Jane', form_data={'field_0': 'x' * 500}
+        )
+        FormFile.objects.create(submission=self.submission, field_name='doc', file='form_uploads/doc.pdf',
+                                original_filename='doc.pdf', file_size=10)
+
+    def test_template_list_is_a_summary(self):
+        """Lists carry counts instead of the nested fields tree, in a fixed number of queries"""
+        with self.assertNumQueries(2):  # count + page
+            response = self.client.get('/api/forms/')
+        row = next(row for row in response.data['results'] if row['id'] == self.forms[0].id)
+        self.assertNotIn('fields', row)
+        self.assertNotIn('configuration', row)
+        self.assertEqual(row['field_count'], 4)
+        self.assertEqual(row['submission_count'], 1)
+
+        detail = self.client.get(f'/api/forms/{self.forms[0].id}/')
+        self.assertEqual(len(detail.data['fields']), 4)
+
+    def test_expand_restores_nested_fields(self):
+        """?expand=fields prefetches the tree instead of querying per row"""
+        with self.assertNumQueries(4):  # count + page + fields + rules
+            response = self.client.get('/api/forms/?expand=fields')
+        for row in response.data['results']:
+            self.assertEqual(len(row['fields']), 4)
+            self.assertEqual(len(row['fields'][0]['validation_rules']), 1)
+
+    def test_fields_parameter(self):
+        """?fields= keeps only the named fields, on lists and details"""
+        response = self.client.get('/api/forms/?fields=id,name')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        detail = self.client.get(f'/api/forms/{self.forms[0].id}/?fields=id,fields')
+        self.assertEqual(set(detail.data), {'id', 'fields'})
+
+    def test_submission_list_is_a_summary(self):
+        """Submission lists leave out form_data and files unless expanded"""
+        for url in ('/api/submissions/', f'/api/submissions/by_form/?form_template={self.forms[0].id}'):
+            response = self.client.get(url)
+            rows = response.data['results'] if 'results' in response.data else response.data
+            self.assertNotIn('form_data', rows[0])
+            self.assertNotIn('files', rows[0])
+            self.assertEqual(rows[0]['file_count'], 1)
+            self.assertEqual(rows[0]['form_template_name'], 'Form 0')
+
+        response = self.client.get('/api/submissions/?expand=form_data,files')
+        row = response.data['results'][0]
+        self.assertEqual(row['form_data'], {'field_0': 'x' * 500})
+        self.assertEqual(row['files'][0]['original_filename'], 'doc.pdf')
+
+    def test_public_list_is_a_summary(self):
+        """The public list is compact; the detail still has everything to render the form"""
+        row = self.client.get('/api/public/').json()['results'][0]
+        self.assertNotIn('fields', row)
+        self.assertEqual(row['field_count'], 4)
+        detail = self.client.get(f'/api/public/{row["id"]}/').json()
+        self.assertEqual(len(detail['fields']), 4)
@@ -0,0 +1,77 @@
+"""
+Tests for Celery task routing and worker configuration
+"""
+import json
+from io import StringIO
+from types import SimpleNamespace
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from onboarding_system.celery import app, apply_queue_prefetch_multiplier
+
+
+class TaskRoutingTest(SimpleTestCase):
+    """Test that tasks land on their dedicated queues"""
+
+    def route(self, task_name):
+        return app.amqp.router.route({}, task_name)
+
+    def test_notifications_are_routed_separately(self):
+        """Notifications, processing and cleanup use different queues"""
+        notification = self.route('forms.tasks.send_form_submission_notification')
+        processing = self.route('forms.tasks.process_form_submission')
+        cleanup = self.route('forms.tasks.cleanup_old_notifications')
+        self.assertEqual(notification['queue'].name, 'notifications')
+        self.assertEqual(processing['queue'].name, 'processing')
+        self.assertEqual(cleanup['queue'].name, 'maintenance')
+
+    def test_urgent_tasks_run_first(self):
+        """Notifications, then single submissions, then batch chunks, then cleanup"""
+        priorities = [self.route(name)['priority'] for name in (
+            'forms.tasks.send_form_submission_notification',
+            'forms.tasks.process_form_submission',
+            'forms.tasks.process_submission_chunk',
+            'forms.tasks.cleanup_old_notifications',
+        )]
+        # The Redis transport delivers the lowest priority first, RabbitMQ the highest
+        in_order = sorted(set(priorities), reverse=not app.conf.broker_url.startswith('redis'))
+        self.assertEqual(priorities, in_order)
+
+    def test_cleanup_is_scheduled(self):
+        """The cleanup task is on the beat schedule"""
+        tasks = [entry['task'] for entry in app.conf.beat_schedule.values()]
+        self.assertIn('forms.tasks.cleanup_old_notifications', tasks)
+
+    def test_prefetch_multiplier_follows_consumed_queue(self):
+        """A worker consuming only the maintenance queue prefetches one task"""
+        queues = app.amqp.queues
+        worker = SimpleNamespace(
+            app=SimpleNamespace(
+                conf=app.conf,
+                amqp=SimpleNamespace(queues=SimpleNamespace(
+                    consume_from={'maintenance': queues['maintenance']},
+                )),
+            ),
+            prefetch_multiplier=app.conf.worker_prefetch_multiplier,
+        )
+        apply_queue_prefetch_multiplier(sender=worker)
+        self.assertEqual(worker.prefetch_multiplier, 1)
+
+        worker.app.amqp.queues.consume_from = {'notifications': queues['notifications']}
+        worker.prefetch_multiplier = app.conf.worker_prefetch_multiplier
+        apply_queue_prefetch_multiplier(sender=worker)
+        self.assertEqual(worker.prefetch_multiplier, 4)
+
+
+class QueueBenchmarkCommandTest(SimpleTestCase):
+    """Test the in-memory queue benchmark"""
+
+    def test_routed_latency_is_bounded(self):
+        """Routed notifications don't wait behind the cleanup run"""
+        out = StringIO()
+        call_command(
+            'benchmark_queues', '--cleanup-tasks=5', '--cleanup-seconds=0.1',
+            '--notifications=5', '--interval=0.01', '--json', stdout=out,
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['routed']['processed'], 5)
+        self.assertLess(results['routed']['max_ms'], results['shared']['max_ms'])
@@ -0,0 +1,59 @@
+"""
+Tests for public submit rate limiting
+"""
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from . import throttling
+from .models import FormTemplate
+
+
+@override_settings(FORMS_THROTTLE_REDIS_URL='', FORMS_ADMISSION_MAX_QUEUE_DEPTH=0,
+                   FORMS_SUBMIT_THROTTLE_RATES={'ip': '3/min', 'form': '5/min'})
+@mock.patch('forms.views.queue_submission_tasks')
+class SubmitRateThrottleTest(TestCase):
+    """Test the per-IP and per-form token buckets"""
+
+    def setUp(self):
+        throttling.reset_store()
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        self.form = FormTemplate.objects.create(name='Test Form', created_by=user)
+        self.url = f'/api/public/{self.form.id}/submit/'
+
+    def tearDown(self):
+        throttling.reset_store()
+
+    def submit(self, ip):
+        return self.client.post(self.url, {'form_data': {}}, content_type='application/json', REMOTE_ADDR=ip)
+
+    def test_ip_limit(self, queue_tasks):
+        """An IP gets its burst, then 429 with Retry-After; other IPs are unaffected"""
+        for _ in range(3):
+            self.assertEqual(self.submit('10.0.0.1').status_code, 201)
+        response = self.submit('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 19)
+        self.assertEqual(self.submit('10.0.0.2').status_code, 201)
+
+    def test_forwarded_for_is_not_trusted(self, queue_tasks):
+        """A new X-Forwarded-For per request doesn't get a new bucket"""
+        statuses = [
+            self.client.post(self.url, {'form_data': {}}, content_type='application/json',
+                             REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}').status_code
+            for index in range(4)
+        ]
+        self.assertEqual(statuses, [201] * 3 + [429])
+
+    def test_form_limit(self, queue_tasks):
+        """The form's bucket caps submissions across IPs"""
+        statuses = [self.submit(f'10.0.1.{index}').status_code for index in range(6)]
+        self.assertEqual(statuses, [201] * 5 + [429])
+
+    def test_refill(self, queue_tasks):
+        """Tokens come back at the configured rate"""
+        buckets = throttling.MemoryBuckets()
+        with mock.patch('forms.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual([buckets.take('k', 2, 1.0)[0] for _ in range(3)], [True, True, False])
+        with mock.patch('forms.throttling.time.monotonic', return_value=101.0):
+            self.assertTrue(buckets.take('k', 2, 1.0)[0])
+            self.assertFalse(buckets.take('k', 2, 1.0)[0])
@@ -0,0 +1,178 @@
+"""
+Token-bucket rate limiting for the public submit endpoint.
+
+Each client IP and each form has a bucket holding up to `n` tokens for a
+rate of `n/period`, refilled continuously; a submission takes one token from
+the IP's bucket, then one from the form's. A client can burst up to `n`
+submissions and then sustain the rate, while one noisy IP can't drain the
+bucket every client of a form shares.
+
+Buckets live in Redis (FORMS_THROTTLE_REDIS_URL, defaulting to
+REDIS_CACHE_URL) so all workers share them; each update is a single Lua
+script run, timed by the Redis clock. Without Redis, or while it is
+unreachable, buckets are kept in process memory: limits then apply per
+process, but submissions are never refused because the limiter is down.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+REDIS_TIMEOUT = 0.1  # seconds; a slow limiter must not become the bottleneck
+REDIS_RETRY_INTERVAL = 30  # seconds on the in-memory fallback before trying Redis again
+
+# KEYS[1] bucket; ARGV capacity, refill rate (tokens/s).
+# Returns {allowed, tokens left} with tokens as a string to keep the fraction.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate):
+    """'20/min' -> (capacity 20, refill 20/60 tokens per second); None disables."""
+    if not rate:
+        return None
+    count, _, period = rate.partition('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip().lower()]
+
+
+class MemoryBuckets:
+    """Token buckets in process memory, least recently used evicted beyond `max_keys`."""
+
+    def __init__(self, max_keys=10_000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Take a token; returns (allowed, tokens left)."""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class RedisBuckets:
+    """Token buckets in Redis, shared by every worker."""
+
+    def __init__(self, url):
+        client = redis.Redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        allowed, tokens = self.script(keys=[key], args=[capacity, rate])
+        return bool(allowed), float(tokens)
+
+
+class BucketStore:
+    """Redis buckets with the in-memory fallback."""
+
+    def __init__(self):
+        self.memory = MemoryBuckets(getattr(settings, 'FORMS_THROTTLE_MEMORY_MAX_KEYS', 10_000))
+        url = getattr(settings, 'FORMS_THROTTLE_REDIS_URL', '')
+        self.redis = RedisBuckets(url) if url and redis is not None else None
+        self.redis_down_until = 0.0
+
+    def take(self, key, capacity, rate):
+        if self.redis is not None and time.monotonic() >= self.redis_down_until:
+            try:
+                return self.redis.take(key, capacity, rate)
+            except redis.RedisError as exc:
+                logger.warning(f"Rate limiter falling back to memory for {REDIS_RETRY_INTERVAL}s: {exc}")
+                self.redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        return self.memory.take(key, capacity, rate)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BucketStore()
+    return _store
+
+
+def reset_store():
+    """Forget all in-memory buckets and re-read the settings (tests)."""
+    global _store
+    _store = None
+
+
+class SubmitRateThrottle(BaseThrottle):
+    """
+    Per-IP and per-form token buckets for form submissions; rates come from
+    FORMS_SUBMIT_THROTTLE_RATES. Over the limit, DRF answers 429 with a
+    Retry-After of the time until the next token. The IP is DRF's get_ident,
+    which only takes X-Forwarded-For from the NUM_PROXIES trusted proxies.
+    """
+    scopes = ('ip', 'form')
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_keys(self, request, view):
+        return {
+            'ip': self.get_ident(request),
+            'form': view.kwargs.get(view.lookup_url_kwarg or view.lookup_field),
+        }
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'FORMS_THROTTLE_ENABLED', True):
+            return True
+        rates = getattr(settings, 'FORMS_SUBMIT_THROTTLE_RATES', {})
+        keys = self.get_keys(request, view)
+        store = get_store()
+        for scope in self.scopes:
+            rate = parse_rate(rates.get(scope))
+            if rate is None or keys[scope] is None:
+                continue
+            capacity, refill = rate
+            allowed, tokens = store.take(f'forms:throttle:submit:{scope}:{keys[scope]}', capacity, refill)
+            if not allowed:
+                self.retry_after = (1 - tokens) / refill
+                metrics.inc('forms_submissions_rejected_total', reason=f'rate_{scope}')
+                return False
+        return True
+
+    def wait(self):
+        return self.retry_after
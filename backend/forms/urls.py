@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     FormTemplateViewSet, FormFieldViewSet, FormSubmissionViewSet,
-    NotificationLogViewSet, PublicFormViewSet
+    NotificationLogViewSet, PublicFormViewSet, FormFileViewSet, FormDraftViewSet, metrics_view
 )
 from .auth_views import (
     login_view, register_view, refresh_token_view, 
@@ -14,8 +14,10 @@ router = DefaultRouter()
 router.register(r'forms', FormTemplateViewSet)
 router.register(r'fields', FormFieldViewSet)
 router.register(r'submissions', FormSubmissionViewSet)
+router.register(r'files', FormFileViewSet)
 router.register(r'notifications', NotificationLogViewSet)
 router.register(r'public', PublicFormViewSet, basename='public')
+router.register(r'drafts', FormDraftViewSet)
 
 urlpatterns = [
     path('api/', include(router.urls)),
@@ -26,4 +28,7 @@ urlpatterns = [
     path('api/auth/refresh/', refresh_token_view, name='refresh'),
     path('api/auth/logout/', logout_view, name='logout'),
     path('api/auth/profile/', user_profile_view, name='profile'),
+
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,17 +1,58 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.parsers import FormParser, MultiPartParser
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError
 from django.db.models import Q
-from .models import FormTemplate, FormField, FormSubmission, FormFile, NotificationLog
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+from django.utils.http import parse_etags
+from datetime import datetime, time
+from .models import FormTemplate, FormField, FormSubmission, FormFile, NotificationLog, FormDraft
 from .serializers import (
     FormTemplateSerializer, FormFieldSerializer, FormSubmissionSerializer,
     FormSubmissionCreateSerializer, FormTemplateCreateSerializer,
-    NotificationLogSerializer
+    NotificationLogSerializer, FormFileSerializer,
+    FormTemplateSummarySerializer, FormSubmissionSummarySerializer, FormDraftSerializer,
+    FormDraftFileSerializer, count_subquery
 )
-from .tasks import send_form_submission_notification
+from .fastjson import ORJSONParser, ORJSONRenderer
+from .file_serving import PassthroughRenderer, serve_form_file, stream_files_zip
+from .tasks import send_form_submission_notification, generate_file_derivatives
+from .throttling import SubmitRateThrottle
+from . import admission, caching, conditional, drafts, events, field_changes, idempotency, metrics, pubsub, snapshots
 import json
+import math
+
+# File actions stream raw bodies; errors (404, 400) still render as JSON
+FILE_RENDERERS = [ORJSONRenderer, PassthroughRenderer]
+
+
+def parse_datetime_param(value):
+    """Parse an ISO datetime or date query parameter into an aware datetime."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def queue_submission_tasks(submission):
+    """Kick off the background work that follows a new submission."""
+    send_form_submission_notification.delay(submission.id)
+    for form_file in submission.files.all():
+        generate_file_derivatives.delay(form_file.id)
 
 
 class FormTemplateViewSet(viewsets.ModelViewSet):
@@ -25,14 +66,40 @@ class FormTemplateViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'create':
             return FormTemplateCreateSerializer
+        if self.action == 'list':
+            return FormTemplateSummarySerializer
         return FormTemplateSerializer
     
     def get_queryset(self):
+        queryset = self.queryset
         # Filter by active status if requested
         is_active = self.request.query_params.get('is_active')
         if is_active is not None:
-            return self.queryset.filter(is_active=is_active.lower() == 'true')
-        return self.queryset
+            queryset = queryset.filter(is_active=is_active.lower() == 'true')
+        if self.action == 'list':
+            return FormTemplateSummarySerializer.prepare_queryset(queryset, self.request)
+        if self.action == 'retrieve':
+            return queryset.select_related('created_by').prefetch_related('fields__validation_rules')
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Template detail; 304 while the template and its submission count are unchanged."""
+        state = conditional.object_state(
+            self.queryset.annotate(submission_count=count_subquery(FormSubmission, 'form_template')),
+            kwargs['pk'], 'updated_at', 'submission_count'
+        )
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+        updated_at, submission_count = state
+        
+        def view():
+            instance = self.get_object()
+            instance.submission_count = submission_count
+            return Response(self.get_serializer(instance).data)
+        
+        # The count is part of the representation, so it's part of the ETag
+        etag = conditional.make_etag(request, kwargs['pk'], updated_at.isoformat(), submission_count)
+        return conditional.conditional_response(request, etag, updated_at, view)
     
     @action(detail=True, methods=['post'])
     def add_field(self, request, pk=None):
@@ -45,20 +112,52 @@ class FormTemplateViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], url_path='field-changes')
+    def apply_field_changes(self, request, pk=None):
+        """
+        Create, update, delete and reorder many fields at once, all or nothing
+        (see field_changes.py). Returns the template's fields afterwards.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        try:
+            fields = field_changes.apply(pk, operations)
+        except (FormTemplate.DoesNotExist, ValueError):
+            raise Http404
+        return Response({'fields': FormFieldSerializer(fields, many=True).data})
+    
+    @action(detail=True, methods=['post'])
+    def publish(self, request, pk=None):
+        """Freeze the template's current fields into a snapshot for new submissions."""
+        form_template = self.get_object()
+        snapshot, created = snapshots.publish(form_template)
+        return Response({'snapshot': snapshot.content_hash, 'created': created},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['get'])
     def submissions(self, request, pk=None):
         """Get all submissions for a specific form template."""
         form_template = self.get_object()
-        submissions = form_template.submissions.all()
-        serializer = FormSubmissionSerializer(submissions, many=True)
+        submissions = FormSubmissionSummarySerializer.prepare_queryset(form_template.submissions.all(), request)
+        serializer = FormSubmissionSummarySerializer(submissions, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def public_form(self, request, pk=None):
         """Public endpoint for clients to view form template (no auth required)."""
-        form_template = get_object_or_404(FormTemplate, pk=pk, is_active=True)
-        serializer = FormTemplateSerializer(form_template)
-        return Response(serializer.data)
+        state = conditional.object_state(FormTemplate.objects.filter(is_active=True), pk, 'updated_at')
+        if state is None:
+            raise Http404
+        
+        def view():
+            form_template = get_object_or_404(
+                FormTemplate.objects.prefetch_related('fields__validation_rules'), pk=pk, is_active=True
+            )
+            serializer = FormTemplateSerializer(form_template, context=self.get_serializer_context())
+            return Response(serializer.data)
+        
+        updated_at, = state
+        etag = conditional.make_etag(request, pk, updated_at.isoformat())
+        return conditional.conditional_response(request, etag, updated_at, view)
 
 
 class FormFieldViewSet(viewsets.ModelViewSet):
@@ -83,25 +182,46 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
     queryset = FormSubmission.objects.all()
     permission_classes = [AllowAny]  # Allow public submissions
     
+    # Actions listing many submissions use the compact representation
+    summary_actions = ('list', 'by_form')
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return FormSubmissionCreateSerializer
+        if self.action in self.summary_actions:
+            return FormSubmissionSummarySerializer
         return FormSubmissionSerializer
     
     def get_queryset(self):
         # Admins can see all submissions, others see only their own
-        if self.request.user.is_authenticated:
-            return self.queryset
-        return self.queryset.none()  # Public users can't list submissions
+        if not self.request.user.is_authenticated:
+            return self.queryset.none()  # Public users can't list submissions
+        
+        queryset = self.queryset
+        # Full-text-ish search over text extracted from uploaded documents
+        document_text = self.request.query_params.get('document_text')
+        if document_text:
+            queryset = queryset.filter(files__extracted_text__icontains=document_text).distinct()
+        if self.action in self.summary_actions:
+            return FormSubmissionSummarySerializer.prepare_queryset(queryset, self.request)
+        if self.action == 'retrieve':
+            return queryset.select_related('form_template').prefetch_related('files')
+        return queryset
     
     def create(self, request, *args, **kwargs):
         """Create a new form submission and trigger notification."""
+        owner = request.user.pk if request.user.is_authenticated else 'anonymous'
+        return idempotency.idempotent_response(
+            request, f'submissions-create:{owner}', lambda: self._create(request)
+        )
+    
+    def _create(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             submission = serializer.save()
             
-            # Trigger async notification
-            send_form_submission_notification.delay(submission.id)
+            # Trigger async notification and document derivatives
+            queue_submission_tasks(submission)
             
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -118,15 +238,162 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(submissions, many=True)
         return Response(serializer.data)
     
+    def _files_zip_response(self, submissions, filename):
+        files = (
+            FormFile.objects.filter(submission__in=submissions)
+            .select_related('submission')
+            .order_by('submission_id', 'id')
+            .iterator(chunk_size=500)
+        )
+        response = StreamingHttpResponse(stream_files_zip(files), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'private, no-store'
+        return response
+    
+    @action(detail=True, methods=['get'], url_path='files_zip', url_name='files-zip',
+            permission_classes=[IsAuthenticated], renderer_classes=FILE_RENDERERS)
+    def files_zip(self, request, pk=None):
+        """Download all files of one submission as a streamed ZIP."""
+        submission = self.get_object()
+        return self._files_zip_response(
+            FormSubmission.objects.filter(pk=submission.pk),
+            f'submission-{submission.pk}-files.zip'
+        )
+    
+    @action(detail=False, methods=['get'], url_path='files_zip', url_name='bulk-files-zip',
+            permission_classes=[IsAuthenticated], renderer_classes=FILE_RENDERERS)
+    def bulk_files_zip(self, request):
+        """
+        Download the files of many submissions as one streamed ZIP.
+        Filter by `form_template`, `ids` (comma separated) and
+        `submitted_after` / `submitted_before` (ISO date or datetime).
+        """
+        form_template_id = request.query_params.get('form_template')
+        ids = request.query_params.get('ids')
+        if not form_template_id and not ids:
+            return Response({'error': 'form_template or ids parameter is required'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        submissions = self.get_queryset()
+        if form_template_id:
+            submissions = submissions.filter(form_template_id=form_template_id)
+        if ids:
+            try:
+                submissions = submissions.filter(id__in=[int(value) for value in ids.split(',') if value])
+            except ValueError:
+                return Response({'error': 'ids must be a comma separated list of integers'},
+                              status=status.HTTP_400_BAD_REQUEST)
+        for param, lookup in (('submitted_after', 'submitted_at__gte'), ('submitted_before', 'submitted_at__lt')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_datetime_param(value)
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    return Response({'error': f'{param} must be an ISO date or datetime'},
+                                  status=status.HTTP_400_BAD_REQUEST)
+                submissions = submissions.filter(**{lookup: parsed})
+        
+        name = f'form-{form_template_id}-files.zip' if form_template_id else 'submission-files.zip'
+        return self._files_zip_response(submissions, name)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], renderer_classes=FILE_RENDERERS)
+    def changes(self, request):
+        """
+        Submission events after sequence number `since`, as NDJSON (see
+        events.py). `limit` caps the batch; `wait` long-polls for up to that
+        many seconds when nothing is new yet.
+        """
+        max_batch = getattr(settings, 'FORMS_CHANGES_MAX_BATCH', 10_000)
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', 1_000))
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response({'error': 'since and limit must be integers, wait a number of seconds'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        # nan would pass `wait < 0` and never time out
+        if since < 0 or not 0 < limit <= max_batch or not (math.isfinite(wait) and wait >= 0):
+            return Response({'error': f'since must be >= 0, limit between 1 and {max_batch}, wait a finite number >= 0'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        try:
+            events.check_cursor(since)
+        except events.CursorExpired:
+            return Response({'error': 'Events after this sequence number were deleted; resync from /api/submissions/'},
+                          status=status.HTTP_410_GONE)
+        if wait:
+            events.wait_for(since, min(wait, getattr(settings, 'FORMS_CHANGES_MAX_WAIT', 25)))
+        response = StreamingHttpResponse(events.ndjson(since, limit), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], renderer_classes=FILE_RENDERERS)
+    def stream(self, request):
+        """
+        Server-sent events for submissions as they are created and processed
+        (see pubsub.py). A reconnecting client's Last-Event-ID (or `since`)
+        replays what it missed first.
+        """
+        since = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return Response({'error': 'Last-Event-ID and since must be integers'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        subscription = pubsub.get_broker().subscribe()
+        backlog = []
+        if since is not None:
+            # Subscribed first so nothing committed meanwhile falls in between
+            try:
+                backlog = events.stream_backlog(since, getattr(settings, 'FORMS_STREAM_BACKFILL', 1000))
+            except Exception:
+                subscription.close()
+                raise
+            if backlog is None:
+                backlog = [pubsub.RESYNC_FRAME]
+            else:
+                since = max([since, *(seq for seq, _ in backlog)])
+                backlog = [body for _, body in backlog]
+        frames = pubsub.aframes if isinstance(request._request, ASGIRequest) else pubsub.frames
+        response = StreamingHttpResponse(frames(subscription, backlog, since or 0), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache, no-store'
+        response['X-Accel-Buffering'] = 'no'  # keep nginx from holding events back
+        return response
+
     @action(detail=True, methods=['post'])
     def mark_processed(self, request, pk=None):
         """Mark a submission as processed."""
         submission = self.get_object()
+        was_processed = submission.is_processed
         submission.is_processed = True
         submission.save()
+        if not was_processed:
+            events.record(events.event(submission, 'processed'))
         return Response({'status': 'processed'})
 
 
+class FormFileViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for uploaded files and their downloads.
+    Files hold client documents, so unlike the demo endpoints this requires authentication.
+    """
+    queryset = FormFile.objects.all()
+    serializer_class = FormFileSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        submission_id = self.request.query_params.get('submission')
+        if submission_id:
+            return self.queryset.filter(submission_id=submission_id)
+        return self.queryset
+    
+    @action(detail=True, methods=['get', 'head'], renderer_classes=FILE_RENDERERS)
+    def download(self, request, pk=None):
+        """Download the file, with Range and conditional request support."""
+        return serve_form_file(request, self.get_object())
+
+
 class NotificationLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing notification logs.
@@ -150,10 +417,61 @@ class PublicFormViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = FormTemplate.objects.filter(is_active=True)
     serializer_class = FormTemplateSerializer
     permission_classes = [AllowAny]
+    # Responses are the same for everyone; skipping authentication keeps the
+    # session untouched, so no `Vary: Cookie` defeats shared caches
+    authentication_classes = []
     
-    @action(detail=True, methods=['post'])
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return FormTemplateSummarySerializer
+        return FormTemplateSerializer
+    
+    def get_queryset(self):
+        if self.action == 'list':
+            return FormTemplateSummarySerializer.prepare_queryset(self.queryset, self.request)
+        if self.action == 'retrieve':
+            return self.queryset.select_related('created_by').prefetch_related('fields__validation_rules')
+        return self.queryset
+    
+    def list(self, request, *args, **kwargs):
+        return caching.cached_public_response(request, lambda: super(PublicFormViewSet, self).list(request, *args, **kwargs))
+    
+    def retrieve(self, request, *args, **kwargs):
+        def view():
+            return caching.cached_public_response(request, lambda: super(PublicFormViewSet, self).retrieve(request, *args, **kwargs))
+        
+        pk = kwargs['pk']
+        state = caching.cached_value(
+            'public', f'state:{pk}', lambda: conditional.object_state(self.queryset, pk, 'updated_at')
+        )
+        if state is None:
+            return view()
+        # submission_count isn't part of the ETag here: like the response
+        # cache, public clients may see it lag until the template changes
+        updated_at, = state
+        etag = conditional.make_etag(request, pk, updated_at.isoformat())
+        return conditional.conditional_response(
+            request, etag, updated_at, view, cache_headers=caching.add_public_cache_headers
+        )
+    
+    @action(detail=True, methods=['post'], throttle_classes=[SubmitRateThrottle])
     def submit(self, request, pk=None):
         """Submit a form (public endpoint)."""
+        # Shed load before the body is parsed or the database touched
+        with admission.controller.admit():
+            return idempotency.idempotent_response(request, f'public-submit:{pk}', lambda: self._submit(request))
+    
+    @action(detail=True, methods=['post'], url_path='drafts', throttle_classes=[SubmitRateThrottle])
+    def create_draft(self, request, pk=None):
+        """Start a draft submission, optionally with the first answers."""
+        form_template = self.get_object()
+        serializer = FormDraftSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        draft = serializer.save(form_template=form_template)
+        return Response(FormDraftSerializer(draft).data, status=status.HTTP_201_CREATED,
+                        headers={'ETag': draft_etag(draft.version)})
+    
+    def _submit(self, request):
         form_template = self.get_object()
         
         # Prepare submission data
@@ -166,14 +484,114 @@ class PublicFormViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = FormSubmissionCreateSerializer(data=submission_data)
         if serializer.is_valid():
-            submission = serializer.save()
+            with admission.controller.timed_write():
+                submission = serializer.save()
             
-            # Trigger async notification
-            send_form_submission_notification.delay(submission.id)
+            # Trigger async notification and document derivatives
+            queue_submission_tasks(submission)
             
             return Response({
                 'message': 'Form submitted successfully',
                 'submission_id': submission.id
             }, status=status.HTTP_201_CREATED)
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def draft_etag(version):
+    return f'"{version}"'
+
+
+class FormDraftViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Draft submissions, addressed by their UUID (see drafts.py). Created
+    through /api/public/{id}/drafts/; autosaved with PATCH merge patches
+    carrying only the changed answers.
+    """
+    queryset = FormDraft.objects.all()
+    serializer_class = FormDraftSerializer
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    parser_classes = [drafts.MergePatchParser, ORJSONParser]
+    
+    def get_queryset(self):
+        if self.action == 'retrieve':
+            return self.queryset.prefetch_related('files')
+        return self.queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = draft_etag(response.data['version'])
+        return response
+    
+    def partial_update(self, request, pk=None):
+        """
+        Save changed answers. The body is a merge patch of the draft:
+        `{"form_data": {"city": "Kampala", "old_answer": null}}`. The response
+        only carries the new version, not the whole draft.
+        """
+        form_data_patch, changes = drafts.parse_patch(request.data)
+        expected_version = None
+        if_match = request.headers.get('If-Match')
+        if if_match and if_match.strip() != '*':
+            try:
+                expected_version = int(parse_etags(if_match)[0].removeprefix('W/').strip('"'))
+            except (IndexError, ValueError):
+                return Response({'error': 'If-Match must be an ETag of this draft'},
+                                status=status.HTTP_412_PRECONDITION_FAILED)
+        try:
+            version, updated_at = drafts.apply_patch(pk, form_data_patch, changes, expected_version)
+        except (FormDraft.DoesNotExist, ValidationError):
+            raise Http404
+        except drafts.DraftFinalized:
+            return Response({'error': 'Draft was already submitted'}, status=status.HTTP_409_CONFLICT)
+        except drafts.VersionMismatch:
+            return Response({'error': 'Draft was changed by another request'},
+                            status=status.HTTP_412_PRECONDITION_FAILED)
+        return Response({'id': pk, 'version': version, 'updated_at': updated_at},
+                        headers={'ETag': draft_etag(version)})
+    
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def files(self, request, pk=None):
+        """Upload files to a draft; they become the submission's files on finalize."""
+        draft = self.get_object()
+        try:
+            draft_files = drafts.add_files(draft, request.FILES.getlist('files'))
+        except drafts.DraftFinalized:
+            return Response({'error': 'Draft was already submitted'}, status=status.HTTP_409_CONFLICT)
+        return Response(FormDraftFileSerializer(draft_files, many=True).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """Submit the draft. Repeating it returns the same submission."""
+        with admission.controller.admit():
+            try:
+                with admission.controller.timed_write():
+                    submission, created = drafts.finalize(pk)
+            except (FormDraft.DoesNotExist, ValidationError):
+                raise Http404
+        if not created:
+            return Response({'message': 'Form already submitted', 'submission_id': submission.id})
+        
+        queue_submission_tasks(submission)
+        return Response({
+            'message': 'Form submitted successfully',
+            'submission_id': submission.id
+        }, status=status.HTTP_201_CREATED)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Plain Django view so scrapes skip JWT auth;
+    set FORMS_METRICS_TOKEN to require `Authorization: Bearer <token>`.
+    Without a token only staff sessions may read it, unless DEBUG is on.
+    """
+    token = getattr(settings, 'FORMS_METRICS_TOKEN', '')
+    if token:
+        supplied = request.META.get('HTTP_AUTHORIZATION', '')
+        if not constant_time_compare(supplied, f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'onboarding_system.settings')
@@ -14,6 +15,25 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_init.connect
+def apply_queue_prefetch_multiplier(sender=None, **kwargs):
+    """
+    Pick the prefetch multiplier for the queues this worker consumes.
+    Celery only has a per-worker setting, so with one worker per queue
+    (`-Q notifications`) this gives each queue its own prefetch depth.
+    An explicit --prefetch-multiplier on the command line wins.
+    """
+    from django.conf import settings
+    
+    multipliers = getattr(settings, 'FORMS_QUEUE_PREFETCH_MULTIPLIERS', {})
+    if not multipliers or sender.prefetch_multiplier != sender.app.conf.worker_prefetch_multiplier:
+        return
+    consumed = sender.app.amqp.queues.consume_from or sender.app.amqp.queues
+    values = [multipliers[name] for name in consumed if name in multipliers]
+    if values:
+        sender.prefetch_multiplier = min(values)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
+from celery.schedules import crontab
+from kombu import Queue
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,17 +43,21 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'forms',
 ]
 
 MIDDLEWARE = [
+    'forms.middleware.MetricsMiddleware',
+    'forms.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'forms.middleware.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -149,21 +155,39 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-profile',
+    'idempotency-key',
 ]
+CORS_EXPOSE_HEADERS = ['Retry-After', 'Idempotent-Replayed']
 
 CORS_ALLOW_CREDENTIALS = True
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # Tokens first; the session is only consulted for requests without an
+    # Authorization header (see forms/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'forms.authentication.CachedJWTAuthentication',
+        'forms.authentication.BrowserSessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'forms.fastjson.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'forms.fastjson.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'forms.counting.EstimatedCountPagination',
     'PAGE_SIZE': 20,
+    # Reverse proxies in front of the app. Throttles key clients on the
+    # X-Forwarded-For hop the outermost of them appended; with 0, on the
+    # connection's address, since clients can send any X-Forwarded-For
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
 # JWT Settings
@@ -196,6 +220,22 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Cache
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
@@ -204,6 +244,242 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Queue topology: slow SMTP notifications, submission processing and bulk
+# maintenance each get their own queue so a cleanup run can't delay emails.
+# Run one worker per queue, e.g. `celery -A onboarding_system worker -Q notifications`.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+
+# Priorities below are written as urgency, 9 most urgent. RabbitMQ delivers
+# the highest priority first; the Redis transport pops the lowest first, so
+# there they are inverted.
+_redis_broker = CELERY_BROKER_URL.startswith(('redis://', 'rediss://'))
+
+
+def _task_priority(urgency):
+    return 9 - urgency if _redis_broker else urgency
+
+
+CELERY_TASK_QUEUES = (
+    Queue('notifications', routing_key='notifications', queue_arguments={'x-max-priority': 10}),
+    Queue('processing', routing_key='processing', queue_arguments={'x-max-priority': 10}),
+    Queue('maintenance', routing_key='maintenance', queue_arguments={'x-max-priority': 10}),
+    Queue('documents', routing_key='documents', queue_arguments={'x-max-priority': 10}),
+    Queue('default', routing_key='default'),
+)
+CELERY_TASK_ROUTES = {
+    'forms.tasks.send_form_submission_notification': {'queue': 'notifications', 'priority': _task_priority(9)},
+    'forms.tasks.process_form_submission': {'queue': 'processing', 'priority': _task_priority(6)},
+    'forms.tasks.process_submission_chunk': {'queue': 'processing', 'priority': _task_priority(3)},
+    'forms.tasks.summarize_processing_batch': {'queue': 'processing', 'priority': _task_priority(3)},
+    'forms.tasks.cleanup_old_notifications': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    'forms.tasks.cleanup_idempotency_records': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    'forms.tasks.cleanup_stale_drafts': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    'forms.tasks.cleanup_submission_events': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    'forms.tasks.maintain_partitions': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    'forms.tasks.generate_file_derivatives': {'queue': 'documents', 'priority': _task_priority(4)},
+}
+CELERY_TASK_QUEUE_MAX_PRIORITY = 10
+CELERY_TASK_DEFAULT_PRIORITY = _task_priority(5)
+# Redis emulates priorities with one list per priority step
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+    'visibility_timeout': 60 * 60,
+}
+
+# Acknowledge after the task ran so a crashed worker's task is redelivered
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+
+# Prefetch multiplier per queue, applied when a worker starts (see celery.py).
+# Long tasks prefetch one at a time so they don't hoard messages.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+FORMS_QUEUE_PREFETCH_MULTIPLIERS = {
+    'notifications': 4,
+    'processing': 2,
+    'maintenance': 1,
+    'documents': 1,
+    'default': 4,
+}
+
+# Per-worker rate limits (the SMTP provider throttles us anyway)
+CELERY_TASK_ANNOTATIONS = {
+    'forms.tasks.send_form_submission_notification': {
+        'rate_limit': config('NOTIFICATION_RATE_LIMIT', default='120/m'),
+    },
+    'forms.tasks.cleanup_old_notifications': {'rate_limit': '1/m'},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-old-notifications': {
+        'task': 'forms.tasks.cleanup_old_notifications',
+        'schedule': crontab(hour=3, minute=0),
+        'options': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    },
+    'cleanup-idempotency-records': {
+        'task': 'forms.tasks.cleanup_idempotency_records',
+        'schedule': crontab(minute=15),
+        'options': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    },
+    'cleanup-stale-drafts': {
+        'task': 'forms.tasks.cleanup_stale_drafts',
+        'schedule': crontab(hour=3, minute=30),
+        'options': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    },
+    'cleanup-submission-events': {
+        'task': 'forms.tasks.cleanup_submission_events',
+        'schedule': crontab(hour=3, minute=45),
+        'options': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    },
+    'maintain-partitions': {
+        'task': 'forms.tasks.maintain_partitions',
+        'schedule': crontab(hour=2, minute=45),
+        'options': {'queue': 'maintenance', 'priority': _task_priority(0)},
+    },
+}
+
+# Submission processing pipeline
+FORMS_PIPELINE_MAX_WORKERS = config('FORMS_PIPELINE_MAX_WORKERS', default=4, cast=int)
+FORMS_PIPELINE_MEMO_TIMEOUT = 60 * 60  # seconds stage outputs stay memoized
+FORMS_PIPELINE_BATCH_CHUNK_SIZE = 100  # submissions per task when fanning out a batch
+FORMS_PIPELINE_EXPORT_HOOKS = []  # dotted paths to callables taking a StageContext
+
+# How /api/files/{id}/download/ sends file bodies:
+#   'django'     - FileResponse (os.sendfile under gunicorn/uWSGI), Range handled in Django
+#   'x-accel'    - nginx X-Accel-Redirect to FORMS_X_ACCEL_PREFIX (an `internal` location aliasing MEDIA_ROOT)
+#   'x-sendfile' - Apache mod_xsendfile / lighttpd X-Sendfile with the absolute path
+FORMS_FILE_SERVE_MODE = config('FORMS_FILE_SERVE_MODE', default='django')
+FORMS_X_ACCEL_PREFIX = '/protected-media/'
+
+# Uploaded document derivatives (thumbnails, previews, extracted text).
+# The documents worker should use a threads/solo pool so it can hand the
+# rendering to its own process pool: `-Q documents --pool=threads`.
+# PDF text and page previews use the optional pypdf / pypdfium2 packages.
+FORMS_DERIVATIVE_USE_PROCESS_POOL = True
+FORMS_DERIVATIVE_WORKERS = config('FORMS_DERIVATIVE_WORKERS', default=2, cast=int)
+FORMS_DERIVATIVE_TIMEOUT = 120  # seconds
+FORMS_THUMBNAIL_SIZE = 256  # px, longest side
+FORMS_PREVIEW_SIZE = 1024  # px, longest side
+FORMS_DERIVATIVE_TEXT_LIMIT = 100_000  # characters of extracted text kept
+
+# Request/task metrics served at /metrics in Prometheus format.
+# With several worker processes, point FORMS_METRICS_DIR at a directory shared
+# by all of them (cleared on deploy); each process writes its totals there.
+FORMS_METRICS_ENABLED = config('FORMS_METRICS_ENABLED', default=True, cast=bool)
+FORMS_METRICS_DIR = config('FORMS_METRICS_DIR', default='')
+FORMS_METRICS_FLUSH_INTERVAL = 5  # seconds between writes of a process's metrics file
+FORMS_METRICS_TOKEN = config('FORMS_METRICS_TOKEN', default='')  # without one, staff sessions only (any client with DEBUG)
+
+# Request profiling (see forms/profiling.py). Staff can always profile a
+# request with `X-Profile: 1`; sampling is off unless a rate is set.
+FORMS_PROFILE_ENABLED = config('FORMS_PROFILE_ENABLED', default=True, cast=bool)
+FORMS_PROFILE_SAMPLE_RATE = config('FORMS_PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+FORMS_PROFILE_SAMPLE_PATHS = [
+    r'^/api/public/\d+/submit/$',
+    r'^/api/forms/$',
+]
+FORMS_PROFILE_KEEP = 200  # most recent profiles kept
+
+# Public form response cache (see forms/caching.py). Invalidation relies on a
+# generation counter in the cache, so multi-process deployments need a shared
+# backend: set REDIS_CACHE_URL (e.g. redis://localhost:6379/1).
+FORMS_PUBLIC_CACHE_ENABLED = True
+FORMS_PUBLIC_CACHE_TIMEOUT = 60 * 60  # seconds a cached response is kept server-side
+FORMS_PUBLIC_CACHE_MAX_AGE = 60  # browser cache lifetime
+FORMS_PUBLIC_CACHE_S_MAXAGE = 300  # CDN/shared cache lifetime
+FORMS_PUBLIC_CACHE_STALE_WHILE_REVALIDATE = 30
+FORMS_CACHE_LOCK_TIMEOUT = 10  # seconds other requests wait for a recomputation
+
+# Response compression (see forms/compression.py). br and zstd are used when
+# the brotli / zstandard packages are installed; the first acceptable
+# encoding in this order wins ties.
+FORMS_COMPRESSION_ENABLED = config('FORMS_COMPRESSION_ENABLED', default=True, cast=bool)
+FORMS_COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+FORMS_COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies aren't worth it
+FORMS_COMPRESSION_EXCLUDE_PATHS = [
+    r'^/api/auth/',  # token responses; compressing secrets next to reflected input invites BREACH
+]
+
+# Authenticated users are read from the cache for this many seconds between
+# database loads; saves, deletes and token blacklisting drop the entry
+FORMS_AUTH_USER_CACHE_TIMEOUT = config('FORMS_AUTH_USER_CACHE_TIMEOUT', default=300, cast=int)
+
+# Public submit rate limits (see forms/throttling.py): token buckets per
+# client IP and per form; `n/period` allows bursts of n. Buckets are shared
+# through Redis when a URL is set, otherwise kept per process.
+FORMS_THROTTLE_ENABLED = config('FORMS_THROTTLE_ENABLED', default=True, cast=bool)
+FORMS_THROTTLE_REDIS_URL = config('FORMS_THROTTLE_REDIS_URL', default=REDIS_CACHE_URL)
+FORMS_SUBMIT_THROTTLE_RATES = {
+    'ip': config('FORMS_SUBMIT_RATE_IP', default='20/min'),
+    'form': config('FORMS_SUBMIT_RATE_FORM', default='600/min'),
+}
+
+# Admission control for public submits (see forms/admission.py): over any
+# threshold, submissions get 503 + Retry-After instead of queueing up.
+# 0 disables a check.
+FORMS_ADMISSION_ENABLED = config('FORMS_ADMISSION_ENABLED', default=True, cast=bool)
+FORMS_ADMISSION_MAX_WRITE_LATENCY = 0.5  # seconds, mean submission save time over the window
+FORMS_ADMISSION_WINDOW = 10  # seconds of write latency samples considered
+FORMS_ADMISSION_MAX_IN_FLIGHT = 16  # concurrent submissions per process
+FORMS_ADMISSION_MAX_QUEUE_DEPTH = 10_000  # messages waiting in FORMS_ADMISSION_QUEUES
+FORMS_ADMISSION_QUEUES = ['notifications', 'documents']
+FORMS_ADMISSION_QUEUE_CHECK_INTERVAL = 5  # seconds between broker samples
+FORMS_ADMISSION_RETRY_AFTER = 5  # seconds; clients are told 1-2x this
+
+# Idempotency-Key handling on submission endpoints (see forms/idempotency.py)
+FORMS_IDEMPOTENCY_ENABLED = True
+FORMS_IDEMPOTENCY_TTL = 24 * 60 * 60  # seconds a response is replayed to retries
+FORMS_IDEMPOTENCY_WAIT = 10  # seconds a duplicate waits for the first request before 409
+FORMS_IDEMPOTENCY_LOCK_TIMEOUT = 120  # seconds before a crashed request's key can be reused
+
+# Draft submissions (see forms/drafts.py) untouched for this long are deleted
+FORMS_DRAFT_TTL_DAYS = 30
+
+# Changes feed of submissions (see forms/events.py)
+FORMS_CHANGES_ENABLED = True
+FORMS_CHANGES_MAX_BATCH = 10_000  # events per response
+FORMS_CHANGES_MAX_WAIT = 25  # seconds a long-poll may hold a worker
+FORMS_CHANGES_SETTLE_SECONDS = 0  # raise to ~2 on MySQL; SQLite and PostgreSQL commit ids in order
+FORMS_CHANGES_RETENTION_DAYS = 30
+
+# Live push of submission events to open admin views (see forms/pubsub.py).
+# Without a Redis URL events only reach streams served by the process that
+# recorded them, so set one whenever Celery or several web processes run.
+FORMS_STREAM_ENABLED = True
+FORMS_PUBSUB_REDIS_URL = config('FORMS_PUBSUB_REDIS_URL', default=REDIS_CACHE_URL)
+FORMS_STREAM_HEARTBEAT = 15  # seconds between keepalive comments
+FORMS_STREAM_MAX_SECONDS = 300  # a stream then ends and the client reconnects
+FORMS_STREAM_BACKFILL = 1000  # missed events replayed on reconnect before asking for a resync
+FORMS_STREAM_MAX_PENDING = 1000  # events queued for a slow client before it is disconnected
+
+# Paginated lists and admin changelists count rows exactly up to this many;
+# past it they report an estimate (see forms/counting.py)
+FORMS_EXACT_COUNT_LIMIT = 100_000
+FORMS_COUNT_SAMPLE_SIZE = 10_000  # recent rows sampled to estimate a filter's matches
+FORMS_COUNT_ESTIMATE_TTL = 60  # seconds a table's row estimate is reused
+
+# Monthly partitions of submissions and notification logs on PostgreSQL (see
+# forms/partitions.py): run `manage.py partitions --convert` once after
+# enabling; maintain_partitions then keeps months ahead ready
+FORMS_PARTITIONING_ENABLED = config('FORMS_PARTITIONING_ENABLED', default=False, cast=bool)
+FORMS_PARTITION_MONTHS_AHEAD = 3
+FORMS_SUBMISSION_RETENTION_MONTHS = None  # detach older submission partitions; None keeps everything
+FORMS_NOTIFICATION_RETENTION_DAYS = 30
+FORMS_RETENTION_DELETE_BATCH = 5_000  # rows per transaction when retention deletes instead of dropping
+
+# Template snapshots (see forms/snapshots.py) kept in memory per process
+FORMS_SNAPSHOT_CACHE_SIZE = 256
+
+# Store submission answers positionally against a per-template schema instead
+# of as objects (see forms/formdata.py); `manage.py encode_form_data` converts
+# existing rows
+FORMS_COMPACT_FORM_DATA = config('FORMS_COMPACT_FORM_DATA', default=False, cast=bool)
+
+# Encode API responses and JSON columns with orjson when it's installed
+# (see forms/fastjson.py); turn off to compare against the stdlib
+FORMS_ORJSON_ENABLED = config('FORMS_ORJSON_ENABLED', default=True, cast=bool)
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -1,7 +1,7 @@
 'use client';
 
 import React, { useState, useEffect } from 'react';
-import { FormTemplate } from '@/types';
+import { FormTemplateSummary } from '@/types';
 import { formTemplatesApi } from '@/services/api';
 import { useAuth } from '@/hooks/useAuth';
 import LoginForm from '@/components/auth/LoginForm';
@@ -11,7 +11,7 @@ import Link from 'next/link';
 
 export default function AdminPage() {
   const { user, login, logout, isLoading } = useAuth();
-  const [forms, setForms] = useState<FormTemplate[]>([]);
+  const [forms, setForms] = useState<FormTemplateSummary[]>([]);
   const [isLoadingForms, setIsLoadingForms] = useState(true);
   const [loginError, setLoginError] = useState<string>('');
   const [showFormBuilder, setShowFormBuilder] = useState(false);
@@ -68,7 +68,8 @@ export default function AdminPage() {
       console.log('Creating form with data:', formData);
       const newForm = await formTemplatesApi.create(formData);
       console.log('Form created successfully:', newForm);
-      setForms([...forms, newForm]);
+      // Reload so the new form shows up with its counts
+      await loadForms();
       setShowFormBuilder(false);
       alert('Form created successfully!');
     } catch (error) {
@@ -206,7 +207,7 @@ export default function AdminPage() {
               <div className="ml-4">
                 <p className="text-sm font-medium text-gray-600">Total Fields</p>
                 <p className="text-2xl font-semibold text-gray-900">
-                  {forms.reduce((acc, form) => acc + (form.fields?.length || 0), 0)}
+                  {forms.reduce((acc, form) => acc + form.field_count, 0)}
                 </p>
               </div>
             </div>
@@ -286,7 +287,7 @@ export default function AdminPage() {
                         </div>
                       </td>
                       <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
-                        {form.fields?.length || 0}
+                        {form.field_count}
                       </td>
                       <td className="px-6 py-4 whitespace-nowrap">
                         <span className={`inline-flex px-2 py-1 text-xs font-semibold rounded-full ${
@@ -1,7 +1,7 @@
 'use client';
 
 import React, { useState, useEffect } from 'react';
-import { FormTemplate } from '@/types';
+import { FormTemplate, FormTemplateSummary } from '@/types';
 import { publicFormsApi } from '@/services/api';
 import FormList from '@/components/client/FormList';
 import DynamicForm from '@/components/client/DynamicForm';
@@ -9,7 +9,7 @@ import { CheckCircle, ArrowLeft, Shield, Lock, Users, FileText, ArrowRight, Spar
 import Link from 'next/link';
 
 export default function HomePage() {
-  const [forms, setForms] = useState<FormTemplate[]>([]);
+  const [forms, setForms] = useState<FormTemplateSummary[]>([]);
   const [selectedForm, setSelectedForm] = useState<FormTemplate | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -31,9 +31,16 @@ export default function HomePage() {
     }
   };
 
-  const handleSelectForm = (form: FormTemplate) => {
-    setSelectedForm(form);
-    setSubmissionSuccess(false);
+  const handleSelectForm = async (form: FormTemplateSummary) => {
+    // The list is a summary; fetch the full field tree for the chosen form
+    try {
+      const template = await publicFormsApi.getById(form.id);
+      setSelectedForm(template);
+      setSubmissionSuccess(false);
+    } catch (error) {
+      console.error('Error loading form:', error);
+      alert('There was an error loading this form. Please try again.');
+    }
   };
 
   const handleSubmitForm = async (submissionData: any) => {
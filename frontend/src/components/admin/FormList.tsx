@@ -1,12 +1,12 @@
 'use client';
 
 import React, { useState } from 'react';
-import { FormTemplate } from '@/types';
+import { FormTemplateSummary } from '@/types';
 import { Eye, Edit, Trash2, Users, Calendar, FileText } from 'lucide-react';
 
 interface FormListProps {
-  forms: FormTemplate[];
-  onEdit: (form: FormTemplate) => void;
+  forms: FormTemplateSummary[];
+  onEdit: (form: FormTemplateSummary) => void;
   onDelete: (formId: number) => void;
   onViewSubmissions: (formId: number) => void;
   isLoading?: boolean;
@@ -115,7 +115,7 @@ export default function FormList({
                   
                   <div className="flex items-center space-x-4">
                     <span className="text-sm text-gray-500 bg-gray-50 px-3 py-1 rounded-lg">
-                      {form.fields.length} field{form.fields.length !== 1 ? 's' : ''}
+                      {form.field_count} field{form.field_count !== 1 ? 's' : ''}
                     </span>
                   </div>
                 </div>
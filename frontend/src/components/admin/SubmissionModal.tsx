@@ -230,7 +230,18 @@ export default function SubmissionModal({ submission, isOpen, onClose }: Submiss
                 {submission.files.map((file, index) => (
                   <div key={file.id || index} className="bg-gray-50 border border-gray-200 rounded-lg p-3 hover:bg-gray-100 transition-colors">
                     <div className="flex items-center space-x-2">
-                      <FileText className="h-5 w-5 text-blue-500 flex-shrink-0" />
+                      {file.thumbnail ? (
+                        <a href={file.preview || file.file} target="_blank" rel="noopener noreferrer" className="flex-shrink-0">
+                          <img
+                            src={file.thumbnail}
+                            alt={file.original_filename}
+                            loading="lazy"
+                            className="h-12 w-12 rounded object-cover border border-gray-200"
+                          />
+                        </a>
+                      ) : (
+                        <FileText className="h-5 w-5 text-blue-500 flex-shrink-0" />
+                      )}
                       <div className="flex-1 min-w-0">
                         <p className="text-sm font-medium text-gray-900 truncate">
                           {file.original_filename || `File ${index + 1}`}
@@ -239,6 +250,11 @@ export default function SubmissionModal({ submission, isOpen, onClose }: Submiss
                           <p className="text-xs text-gray-500">
                             {file.file_size ? `${(file.file_size / 1024).toFixed(1)} KB` : 'Size unknown'}
                           </p>
+                          {file.metadata?.page_count && (
+                            <p className="text-xs text-gray-400">
+                              {file.metadata.page_count} page{file.metadata.page_count !== 1 ? 's' : ''}
+                            </p>
+                          )}
                           <p className="text-xs text-gray-400">
                             Field: {file.field_name}
                           </p>
@@ -1,12 +1,12 @@
 'use client';
 
 import React, { useState, useMemo } from 'react';
-import { FormTemplate } from '@/types';
+import { FormTemplateSummary } from '@/types';
 import { FileText, Calendar, Users, ArrowRight, Clock, Shield, Zap, Search, Filter } from 'lucide-react';
 
 interface FormListProps {
-  forms: FormTemplate[];
-  onSelectForm: (form: FormTemplate) => void;
+  forms: FormTemplateSummary[];
+  onSelectForm: (form: FormTemplateSummary) => void;
   isLoading?: boolean;
 }
 
@@ -27,7 +27,7 @@ export default function FormList({ forms, onSelectForm, isLoading = false }: For
         case 'submissions':
           return b.submission_count - a.submission_count;
         case 'fields':
-          return b.fields.length - a.fields.length;
+          return b.field_count - a.field_count;
         case 'date':
           return new Date(b.created_at).getTime() - new Date(a.created_at).getTime();
         default:
@@ -179,7 +179,7 @@ export default function FormList({ forms, onSelectForm, isLoading = false }: For
                 </div>
                 <div className="flex items-center">
                   <FileText className="h-4 w-4 mr-1.5 text-indigo-500" />
-                  <span className="font-medium">{form.fields.length}</span>
+                  <span className="font-medium">{form.field_count}</span>
                   <span className="ml-1 text-gray-500">fields</span>
                 </div>
               </div>
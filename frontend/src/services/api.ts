@@ -1,8 +1,8 @@
 import api from '@/lib/api';
-import { FormTemplate, FormSubmission, FormSubmissionData, CreateFormTemplateData } from '@/types';
+import { FormTemplate, FormTemplateSummary, FormSubmission, FormSubmissionData, CreateFormTemplateData, SubmissionEvent } from '@/types';
 
 export const formTemplatesApi = {
-  getAll: async (): Promise<FormTemplate[]> => {
+  getAll: async (): Promise<FormTemplateSummary[]> => {
     const response = await api.get('/api/forms/');
     return response.results || response;
   },
@@ -32,14 +32,17 @@ export const formTemplatesApi = {
   },
 };
 
+// Lists are compact by default; the submission list previews data and files
+const SUBMISSION_LIST_EXPAND = 'expand=form_data,files';
+
 export const formSubmissionsApi = {
   getAll: async (): Promise<FormSubmission[]> => {
-    const response = await api.get('/api/submissions/');
+    const response = await api.get(`/api/submissions/?${SUBMISSION_LIST_EXPAND}`);
     return response.results || response;
   },
 
   getByForm: async (formId: number): Promise<FormSubmission[]> => {
-    const response = await api.get(`/api/submissions/by_form/?form_template=${formId}`);
+    const response = await api.get(`/api/submissions/by_form/?form_template=${formId}&${SUBMISSION_LIST_EXPAND}`);
     return response;
   },
 
@@ -69,10 +72,66 @@ export const formSubmissionsApi = {
   markProcessed: async (id: number): Promise<void> => {
     await api.post(`/api/submissions/${id}/mark_processed/`);
   },
+
+  // Calls onEvent as submissions are created and processed, instead of
+  // polling; onResync when too much was missed to replay and the list should
+  // be reloaded. Reconnects until the returned function is called.
+  subscribe: (onEvent: (event: SubmissionEvent) => void, onResync: () => void): (() => void) => {
+    const controller = new AbortController();
+    const baseURL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+    let lastEventId = '';
+
+    const handle = (frame: string) => {
+      let type = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('id: ')) lastEventId = line.slice(4);
+        else if (line.startsWith('event: ')) type = line.slice(7);
+        else if (line.startsWith('data: ')) data = line.slice(6);
+      }
+      if (type === 'resync') onResync();
+      else if (data) onEvent(JSON.parse(data));
+    };
+
+    const connect = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          // EventSource can't send the Authorization header, so read the stream with fetch
+          const token = localStorage.getItem('access_token');
+          const response = await fetch(`${baseURL}/api/submissions/stream/`, {
+            headers: {
+              Accept: 'text/event-stream',
+              ...(token && { Authorization: `Bearer ${token}` }),
+              ...(lastEventId && { 'Last-Event-ID': lastEventId }),
+            },
+            signal: controller.signal,
+          });
+          if (!response.ok || !response.body) throw new Error(`HTTP error! status: ${response.status}`);
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            const frames = buffer.split('\n\n');
+            buffer = frames.pop() || '';
+            frames.forEach(handle);
+          }
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          console.error('Submission stream failed:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, 3000));
+      }
+    };
+
+    connect();
+    return () => controller.abort();
+  },
 };
 
 export const publicFormsApi = {
-  getAll: async (): Promise<FormTemplate[]> => {
+  getAll: async (): Promise<FormTemplateSummary[]> => {
     const response = await api.get('/api/public/');
     return response.results || response;
   },
@@ -1,4 +1,5 @@
-export interface FormTemplate {
+// Compact shape returned by list endpoints (?expand=fields for the full tree)
+export interface FormTemplateSummary {
   id: number;
   name: string;
   description: string;
@@ -7,9 +8,13 @@ export interface FormTemplate {
   created_by_name: string;
   created_at: string;
   updated_at: string;
+  field_count: number;
+  submission_count: number;
+}
+
+export interface FormTemplate extends Omit<FormTemplateSummary, 'field_count'> {
   configuration: Record<string, any>;
   fields: FormField[];
-  submission_count: number;
 }
 
 export interface FormField {
@@ -47,6 +52,26 @@ export interface FormSubmission {
   files: FormFile[];
 }
 
+// Pushed by /api/submissions/stream/ as submissions change
+export interface SubmissionEvent {
+  seq: number;
+  type: 'created' | 'processed' | 'files_attached';
+  submission: number;
+  form_template: number;
+}
+
+// Compact shape returned by submission list endpoints
+export interface FormSubmissionSummary {
+  id: number;
+  form_template: number;
+  form_template_name: string;
+  submitted_by: string;
+  submitted_at: string;
+  is_processed: boolean;
+  processed_at: string | null;
+  file_count: number;
+}
+
 export interface FormFile {
   id: number;
   field_name: string;
@@ -54,6 +79,10 @@ export interface FormFile {
   original_filename: string;
   file_size: number;
   uploaded_at: string;
+  thumbnail: string | null;
+  preview: string | null;
+  metadata: Record<string, any>;
+  derivatives_status: 'pending' | 'ready' | 'unsupported' | 'failed';
 }
 
 export interface NotificationLog {
@@ -20,10 +20,19 @@ source venv/bin/activate
 python manage.py runserver &
 BACKEND_PID=$!
 
-# Start Celery worker
-echo "🔄 Starting Celery worker..."
-celery -A onboarding_system worker --loglevel=info &
-CELERY_PID=$!
+# Start Celery workers (one per queue so cleanup runs can't delay notifications)
+echo "🔄 Starting Celery workers..."
+celery -A onboarding_system worker -Q notifications -n notifications@%h --loglevel=info &
+CELERY_NOTIFICATIONS_PID=$!
+celery -A onboarding_system worker -Q processing,default -n processing@%h --loglevel=info &
+CELERY_PROCESSING_PID=$!
+celery -A onboarding_system worker -Q maintenance -n maintenance@%h --concurrency=1 --loglevel=info &
+CELERY_MAINTENANCE_PID=$!
+celery -A onboarding_system worker -Q documents -n documents@%h --pool=threads --concurrency=2 --loglevel=info &
+CELERY_DOCUMENTS_PID=$!
+celery -A onboarding_system beat --loglevel=info &
+CELERY_BEAT_PID=$!
+CELERY_PID="$CELERY_NOTIFICATIONS_PID $CELERY_PROCESSING_PID $CELERY_MAINTENANCE_PID $CELERY_DOCUMENTS_PID $CELERY_BEAT_PID"
 
 # Start frontend
 echo "⚛️  Starting Next.js frontend..."